@@ -2,11 +2,19 @@ import ctypes, ctypes.util
 
 from ctypes import Structure, POINTER
 
-from math import sqrt
+from math import sqrt, atan2, cos, sin, pi, nan
 
 import time
 
-from threading import Thread, Lock
+import os, socket, selectors, struct
+
+from threading import Thread, Lock, Condition
+
+from collections import deque
+
+from array import array
+
+from types import MappingProxyType
 
 
 # loading the DLL #
@@ -26,8 +34,9 @@ for name in XINPUT_DLL_NAMES:
         libXInput = ctypes.WinDLL(found)
         break
 
-if not libXInput:
-    raise IOError("XInput library was not found.")
+# without the library (e.g. on a server driving virtual or remote
+# controllers) the module still works, the XInput functions raise IOError.
+# Importing used to raise that IOError, check libXInput is None instead
 
 #/loading the DLL #
 
@@ -75,6 +84,7 @@ STICK_LEFT                      = 0x010000
 STICK_RIGHT                     = 0x020000
 TRIGGER_LEFT                    = 0x040000
 TRIGGER_RIGHT                   = 0x080000
+COMBO                           = 0x400000
 
 FILTER_PRESSED_ONLY                = 0x100000
 FILTER_RELEASED_ONLY                  = 0x200000
@@ -92,6 +102,14 @@ EVENT_BUTTON_PRESSED    = 3
 EVENT_BUTTON_RELEASED   = 4
 EVENT_TRIGGER_MOVED     = 5
 EVENT_STICK_MOVED       = 6
+EVENT_COMBO             = 7
+EVENT_GESTURE           = 8
+
+GESTURE_FLICK           = 1
+GESTURE_QUARTER_CIRCLE  = 2
+GESTURE_HALF_CIRCLE     = 3
+GESTURE_ROTATION        = 4
+GESTURE_HOLD            = 5
 
 LEFT    = 0
 RIGHT   = 1
@@ -125,23 +143,29 @@ class XINPUT_BATTERY_INFORMATION(Structure):
                 ("BatteryLevel", BYTE),
                 ]
 
-libXInput.XInputGetState.argtypes = [DWORD, POINTER(XINPUT_STATE)]
-libXInput.XInputGetState.restype = DWORD
+if libXInput:
+    libXInput.XInputGetState.argtypes = [DWORD, POINTER(XINPUT_STATE)]
+    libXInput.XInputGetState.restype = DWORD
+
+    def XInputGetState(dwUserIndex, state):
+        return libXInput.XInputGetState(dwUserIndex, ctypes.byref(state))
 
-def XInputGetState(dwUserIndex, state):
-    return libXInput.XInputGetState(dwUserIndex, ctypes.byref(state))
+    libXInput.XInputSetState.argtypes = [DWORD, POINTER(XINPUT_VIBRATION)]
+    libXInput.XInputSetState.restype = DWORD
 
-libXInput.XInputSetState.argtypes = [DWORD, POINTER(XINPUT_VIBRATION)]
-libXInput.XInputSetState.restype = DWORD
+    def XInputSetState(dwUserIndex, vibration):
+        return libXInput.XInputSetState(dwUserIndex, ctypes.byref(vibration))
 
-def XInputSetState(dwUserIndex, vibration):
-    return libXInput.XInputSetState(dwUserIndex, ctypes.byref(vibration))
+    libXInput.XInputGetBatteryInformation.argtypes = [DWORD, BYTE, POINTER(XINPUT_BATTERY_INFORMATION)]
+    libXInput.XInputGetBatteryInformation.restype = DWORD
 
-libXInput.XInputGetBatteryInformation.argtypes = [DWORD, BYTE, POINTER(XINPUT_BATTERY_INFORMATION)]
-libXInput.XInputGetBatteryInformation.restype = DWORD
+    def XInputGetBatteryInformation(dwUserIndex, devType, batteryInformation):
+        return libXInput.XInputGetBatteryInformation(dwUserIndex, devType, ctypes.byref(batteryInformation))
+else:
+    def XInputGetState(dwUserIndex, state):
+        raise IOError("XInput library was not found.")
 
-def XInputGetBatteryInformation(dwUserIndex, devType, batteryInformation):
-    return libXInput.XInputGetBatteryInformation(dwUserIndex, devType, ctypes.byref(batteryInformation))
+    XInputSetState = XInputGetBatteryInformation = XInputGetState
 #/defining XInput compatible structures #
 
 # defining file-local variables #
@@ -156,14 +180,6 @@ _battery_level_dict = {BATTERY_LEVEL_EMPTY : "EMPTY",
                        BATTERY_LEVEL_MEDIUM : "MEDIUM",
                        BATTERY_LEVEL_FULL : "FULL"}
 
-_last_states = (State(), State(), State(), State())
-
-_last_norm_values = [None, None, None, None]
-
-_connected = [False, False, False, False]
-
-_last_checked = 0
-
 _deadzones = [{DEADZONE_RIGHT_THUMB : XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE,
                DEADZONE_LEFT_THUMB : XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE,
                DEADZONE_TRIGGER : XINPUT_GAMEPAD_TRIGGER_THRESHOLD},
@@ -192,6 +208,10 @@ _button_dict = {0x0001 : "DPAD_UP",
                 0x4000 : "X",
                 0x8000 : "Y",
         }
+
+_button_ids = {name : button for button, name in _button_dict.items()}
+
+_BUTTON_MASK = 0xF3FF
 #/defining file-local variables #
 
 # defining custom classes and methods #
@@ -247,7 +267,8 @@ You shouldn't check this too frequently."""
 
 def get_state(user_index):
     """get_state(int) -> XINPUT_STATE
-Returns the raw state of the controller."""
+Returns the raw state of the controller, with the buttons remapped
+if set_remap() was called for it."""
     state = XINPUT_STATE()
     res = XInputGetState(user_index, state)
     if res == ERROR_DEVICE_NOT_CONNECTED:
@@ -258,6 +279,10 @@ Returns the raw state of the controller."""
     
     assert res == 0, "Couldn't get the state of controller [{}]. Is it disconnected?".format(user_index)
 
+    remap = _default_poller._remaps.get(user_index)
+    if remap is not None:   # in the same turbo phase as get_events()
+        state.Gamepad.wButtons = _remap_buttons(remap, state.Gamepad.wButtons, _default_poller._turbo_since, user_index, time.time())
+
     return state
 
 def get_battery_information(user_index):
@@ -307,85 +332,221 @@ You can get the required state using get_state()"""
             "Y" : bool(wButtons & 0x8000),
         }
 
+def _normalize_trigger(value, threshold):
+    """Returns the normalized value of a raw trigger value"""
+    if value > threshold:
+        return (value - threshold) / (255. - threshold)
+    return 0
+
+def _normalize_stick(X, Y, deadzone):
+    """Returns the direction (X and Y) and the normalized
+magnitude of a raw thumb stick position"""
+    mag = sqrt(X*X + Y*Y)
+
+    if mag != 0:
+        normX = X / mag
+        normY = Y / mag
+    else: # if mag == 0 the stick is centered, there is no direction
+        normX = 0
+        normY = 0
+
+    normMag = 0
+
+    if (mag > deadzone):
+        mag = min(32767, mag)
+
+        mag -= deadzone
+
+        normMag = mag / (32767. - deadzone)
+
+    return (normX, normY, normMag)
+
+class ButtonSet(int):
+    """A set of buttons, stored as the XInput button bitmask (wButtons).
+Membership tests, set operations and len() are plain integer
+operations. Iterating yields only the buttons that are in the set.
+The single buttons are available as ButtonSet.A, ButtonSet.DPAD_UP, ...
+    buttons = get_buttons(state)
+    if ButtonSet.A in buttons: ...
+    for button in buttons.pressed(previous_buttons): ..."""
+    __slots__ = ()
+
+    def __new__(cls, buttons=0):
+        if not isinstance(buttons, int):
+            mask = 0
+            for button in buttons:
+                mask |= _button_ids[button] if isinstance(button, str) else button
+            buttons = mask
+        return int.__new__(cls, buttons & _BUTTON_MASK)
+
+    def __contains__(self, button):
+        if isinstance(button, str):
+            button = _button_ids[button]
+        return bool(button) and int(self) & button == button
+
+    def __iter__(self):
+        bits = int(self)
+        while bits:
+            button = bits & -bits
+            bits ^= button
+            yield button
+
+    def __len__(self):
+        return bin(self).count("1")
+
+    def __or__(self, other):
+        return ButtonSet(int(self) | other)
+
+    def __and__(self, other):
+        return ButtonSet(int(self) & other)
+
+    def __xor__(self, other):
+        return ButtonSet(int(self) ^ other)
+
+    def __sub__(self, other):
+        return ButtonSet(int(self) & ~other)
+
+    def __invert__(self):
+        return ButtonSet(~int(self))
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def pressed(self, previous):
+        """Buttons that are in this set but weren't in <previous>"""
+        return ButtonSet(int(self) & ~previous)
+
+    def released(self, previous):
+        """Buttons that were in <previous> but aren't in this set"""
+        return ButtonSet(previous & ~int(self))
+
+    def held(self, previous):
+        """Buttons that are in this set and were in <previous>"""
+        return ButtonSet(int(self) & previous)
+
+    def names(self):
+        """Returns the names of the buttons in this set, e.g. ("A", "X")"""
+        return tuple(_button_dict[button] for button in self)
+
+    def to_dict(self):
+        """Returns the dict get_button_values() would return"""
+        buttons = int(self)
+        return {name : bool(buttons & button) for button, name in _button_dict.items()}
+
+    def __repr__(self):
+        return "ButtonSet({})".format("|".join(self.names()) or "0")
+
+for _button, _name in _button_dict.items():
+    setattr(ButtonSet, _name, ButtonSet(_button))
+del _button, _name
+
+def get_buttons(state):
+    """get_buttons(XINPUT_STATE) -> ButtonSet
+Returns the set of buttons that are currently being pressed.
+You can get the required state using get_state()"""
+    return ButtonSet(state.Gamepad.wButtons)
+
 def get_trigger_values(state):
     """get_trigger_values(XINPUT_STATE) -> (float, float)
 Returns the normalized left and right trigger values.
 You can get the required state using get_state()"""
-    LT = state.Gamepad.bLeftTrigger
-    RT = state.Gamepad.bRightTrigger
-
-    normLT = 0
-    normRT = 0
+    return (_normalize_trigger(state.Gamepad.bLeftTrigger, XINPUT_GAMEPAD_TRIGGER_THRESHOLD),
+            _normalize_trigger(state.Gamepad.bRightTrigger, XINPUT_GAMEPAD_TRIGGER_THRESHOLD))
 
-    if LT > XINPUT_GAMEPAD_TRIGGER_THRESHOLD:
-        LT -= XINPUT_GAMEPAD_TRIGGER_THRESHOLD
-        normLT = LT / (255. - XINPUT_GAMEPAD_TRIGGER_THRESHOLD)
-    else:
-        LT = 0
-
-    if RT > XINPUT_GAMEPAD_TRIGGER_THRESHOLD:
-        RT -= XINPUT_GAMEPAD_TRIGGER_THRESHOLD
-        normRT = RT / (255. - XINPUT_GAMEPAD_TRIGGER_THRESHOLD)
-    else:
-        RT = 0
-
-    return (normLT, normRT)
-
-def get_thumb_values(state):
-    """get_thumb_values(XINPUT_STATE) -> ((float, float), (float, float))
+def get_thumb_values(state, user_index=None):
+    """get_thumb_values(XINPUT_STATE[, int]) -> ((float, float), (float, float))
 Returns the normalized left and right thumb stick values,
 represented as X and Y values.
-You can get the required state using get_state()"""
-    LX = state.Gamepad.sThumbLX
-    LY = state.Gamepad.sThumbLY
-    RX = state.Gamepad.sThumbRX
-    RY = state.Gamepad.sThumbRY
-
-    magL = sqrt(LX*LX + LY*LY)
-    magR = sqrt(RX*RX + RY*RY)
-
-    if magL != 0:
-        normLX = LX / magL
-        normLY = LY / magL
-    else: # if magL == 0 the stick is centered, there is no direction
-        normLX = 0
-        normLY = 0
-    
-    if magR != 0:
-        normRX = RX / magR
-        normRY = RY / magR
-    else: # if magR == 0 the stick is centered, there is no direction
-        normRX = 0
-        normRY = 0
-
-
-    normMagL = 0
-    normMagR = 0
-
-    if (magL > XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE):
-        magL = min(32767, magL)
-
-        magL -= XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE
-
-        normMagL = magL / (32767. - XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
-    else:
-        magL = 0
-
-    if (magR > XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE):
-        magR = min(32767, magR)
-
-        magR -= XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE
-
-        normMagR = magR / (32767. - XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+You can get the required state using get_state(). With the
+<user_index> of the state, the calibration of that controller
+(see set_calibration()) is applied, like in get_events()."""
+    calibration = None if user_index is None else _default_poller._calibrations.get(user_index)
+    return _thumb_values(state, XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE, XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE, calibration)
+
+def _thumb_values(state, left_deadzone, right_deadzone, calibration=None):
+    if calibration is None:
+        normLX, normLY, normMagL = _normalize_stick(state.Gamepad.sThumbLX, state.Gamepad.sThumbLY, left_deadzone)
+        normRX, normRY, normMagR = _normalize_stick(state.Gamepad.sThumbRX, state.Gamepad.sThumbRY, right_deadzone)
     else:
-        magR = 0
+        normLX, normLY, normMagL = calibration.left.normalize(state.Gamepad.sThumbLX, state.Gamepad.sThumbLY, left_deadzone)
+        normRX, normRY, normMagR = calibration.right.normalize(state.Gamepad.sThumbRX, state.Gamepad.sThumbRY, right_deadzone)
 
     return ((normLX * normMagL, normLY * normMagL), (normRX * normMagR, normRY * normMagR))
 
-
-
-
-
+class Snapshot:
+    """An immutable copy of a controller state together with
+the deadzones and, given a <user_index>, the calibration that
+were in effect when it was taken.
+The normalized values are computed on first access and
+cached, so reading them repeatedly costs nothing extra.
+Create it using get_snapshot() or Snapshot(state)."""
+    __slots__ = ("_state", "user_index", "left_thumb_deadzone", "right_thumb_deadzone", "trigger_threshold",
+                 "calibration", "_buttons", "_triggers", "_thumbs")
+
+    def __init__(self, state, user_index=None):
+        init = object.__setattr__
+        init(self, "_state", XINPUT_STATE.from_buffer_copy(state))
+        init(self, "user_index", user_index)
+        init(self, "left_thumb_deadzone", XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+        init(self, "right_thumb_deadzone", XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+        init(self, "trigger_threshold", XINPUT_GAMEPAD_TRIGGER_THRESHOLD)
+        init(self, "calibration", None if user_index is None else _default_poller._calibrations.get(user_index))
+        init(self, "_buttons", None)
+        init(self, "_triggers", None)
+        init(self, "_thumbs", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshot objects are immutable")
+
+    @property
+    def state(self):
+        """A copy of the XINPUT_STATE, changing it doesn't change the snapshot"""
+        return XINPUT_STATE.from_buffer_copy(self._state)
+
+    @property
+    def packet_number(self):
+        return self._state.dwPacketNumber
+
+    @property
+    def button_set(self):
+        """The pressed buttons as a ButtonSet"""
+        return ButtonSet(self._state.Gamepad.wButtons)
+
+    @property
+    def buttons(self):
+        """A read-only mapping like the one returned by get_button_values()"""
+        if self._buttons is None:
+            object.__setattr__(self, "_buttons", MappingProxyType(get_button_values(self._state)))
+        return self._buttons
+
+    @property
+    def triggers(self):
+        """(LT, RT), like get_trigger_values() with this snapshot's deadzone"""
+        if self._triggers is None:
+            threshold = self.trigger_threshold
+            object.__setattr__(self, "_triggers", (_normalize_trigger(self._state.Gamepad.bLeftTrigger, threshold),
+                                                   _normalize_trigger(self._state.Gamepad.bRightTrigger, threshold)))
+        return self._triggers
+
+    @property
+    def thumbs(self):
+        """((LX, LY), (RX, RY)), like get_thumb_values() with this snapshot's deadzones and calibration"""
+        if self._thumbs is None:
+            object.__setattr__(self, "_thumbs", _thumb_values(self._state, self.left_thumb_deadzone, self.right_thumb_deadzone,
+                                                              self.calibration))
+        return self._thumbs
+
+    def __repr__(self):
+        return "Snapshot(user_index={}, packet_number={})".format(self.user_index, self.packet_number)
+
+def get_snapshot(user_index):
+    """get_snapshot(int) -> Snapshot
+Returns an immutable Snapshot of the controller's current state."""
+    return Snapshot(get_state(user_index), user_index)
 
 class Event:
     def __init__(self, user_index, type_):
@@ -394,168 +555,1330 @@ class Event:
 
     def __str__(self):
         return str(self.__dict__)
+
+def _copy_event(event):
+    copy = Event.__new__(Event)
+    copy.__dict__.update(event.__dict__)
+    return copy
         
-def get_events():
-    """get_events() -> generator
-Returns a generator that yields events for each change that
-occured since this function was last called.
-Each event has a <type> and <user_index> associated.
-The other variables vary."""
-    global _last_states, _connected, _last_checked, _button_dict, _last_norm_values
-    this_time = time.time()
-    these_states = (State(), State(), State(), State())
-    if _last_checked + 1 < this_time:
-        _last_checked = this_time
-        for i in range(4):
-            is_connected = (XInputGetState(i, these_states[i]) == 0)
-            if is_connected != _connected[i]:
-                yield Event(i, EVENT_CONNECTED if is_connected else EVENT_DISCONNECTED)
-                _connected[i] = is_connected
-    else:
-        for i in range(4):
-            was_connected = _connected[i]
-            if not was_connected:
-                continue
-            is_connected = (XInputGetState(i, these_states[i]) == 0)
+class _Source:
+    """A source has a number of <slots> and a read_state() method that
+fills an XINPUT_STATE like XInputGetState does. Sources that can
+copy all slots at once also have a read_states(states, connected)
+method, which Pollers prefer. This adds the module-like functions
+on top of that."""
+    slots = 0
+    _poller = None
+
+    def read_state(self, user_index, state):
+        raise NotImplementedError("Method not implemented. Must be implemented in the child class")
 
-            if not is_connected:
-                yield Event(i, EVENT_DISCONNECTED)
-                _connected[i] = False
+    def get_connected(self):
+        """get_connected() -> tuple of bool, one per slot"""
+        state = XINPUT_STATE()
+        return tuple(self.read_state(i, state) == ERROR_SUCCESS for i in range(self.slots))
+
+    def get_state(self, user_index):
+        """get_state(int) -> XINPUT_STATE"""
+        state = XINPUT_STATE()
+        res = self.read_state(user_index, state)
+        if res == ERROR_DEVICE_NOT_CONNECTED:
+            raise XInputNotConnectedError("Controller [{}] appears to be disconnected.".format(user_index))
+        if res == ERROR_BAD_ARGUMENTS:
+            raise XInputBadArgumentError("Controller [{}] doesn't exist. IDs range from 0 to {}.".format(user_index, self.slots - 1))
+        return state
+
+    def get_events(self):
+        """get_events() -> generator
+Like XInput.get_events(), for the slots of this source"""
+        if self._poller is None:
+            self._poller = Poller(source=self)
+        for event in self._poller.poll():
+            yield event
+
+class XInputSource(_Source):
+    """The controllers of the XInput driver, the default source of a Poller.
+It has no slots if the XInput library isn't available."""
+    slots = 4 if libXInput else 0
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int
+Fills <state> and returns ERROR_SUCCESS, or returns
+ERROR_DEVICE_NOT_CONNECTED."""
+        return XInputGetState(user_index, state)
+
+class VirtualSource(_Source):
+    """<slots> controllers that are driven from code, e.g. synthetic
+pads for load tests and bots. set_state() changes a pad and bumps
+its dwPacketNumber like the driver does."""
+    def __init__(self, slots=4):
+        self.slots = slots
+        self._states = (XINPUT_STATE * slots)()
+        self._connected = (ctypes.c_ubyte * slots)()
+        self._state_size = ctypes.sizeof(XINPUT_STATE)
+        self._states_address = ctypes.addressof(self._states)
+        self._lock = Lock()
+
+    def connect(self, user_index):
+        self._connected[user_index] = 1
+
+    def disconnect(self, user_index):
+        self._lock.acquire()
+        self._connected[user_index] = 0
+        ctypes.memset(self._states_address + user_index * self._state_size, 0, self._state_size)
+        self._lock.release()
+
+    def set_state(self, user_index, buttons=None, triggers=None, thumbs=None):
+        """Sets the raw values of a pad: <buttons> (wButtons), <triggers>
+(LT, RT) from 0 to 255 and <thumbs> ((LX, LY), (RX, RY)) from
+-32768 to 32767. Values that are None stay as they are."""
+        state = self._states[user_index]
+        pad = state.Gamepad
+        self._lock.acquire()
+        if buttons is not None:
+            pad.wButtons = buttons
+        if triggers is not None:
+            pad.bLeftTrigger, pad.bRightTrigger = triggers
+        if thumbs is not None:
+            (pad.sThumbLX, pad.sThumbLY), (pad.sThumbRX, pad.sThumbRY) = thumbs
+        state.dwPacketNumber += 1
+        self._lock.release()
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int
+Fills <state> like XInputGetState would."""
+        if not 0 <= user_index < self.slots:
+            return ERROR_BAD_ARGUMENTS
+        if not self._connected[user_index]:
+            return ERROR_DEVICE_NOT_CONNECTED
+        self._lock.acquire()
+        ctypes.memmove(ctypes.addressof(state), self._states_address + user_index * self._state_size, self._state_size)
+        self._lock.release()
+        return ERROR_SUCCESS
+
+    def read_states(self, states, connected):
+        """Copies all states and connection flags into the ctypes arrays
+<states> and <connected>. Disconnected slots are zeroed."""
+        self._lock.acquire()
+        ctypes.memmove(states, self._states, ctypes.sizeof(self._states))
+        ctypes.memmove(connected, self._connected, self.slots)
+        self._lock.release()
+
+    def get_connected(self):
+        """get_connected() -> tuple of bool, one per slot"""
+        return tuple(bool(flag) for flag in self._connected)
+
+class ControllerHub(_Source):
+    """Combines several sources into one, e.g. the XInput driver with
+VirtualSources and RemoteSources. The slots of the sources are
+numbered consecutively in the order they are given:
+    hub = ControllerHub(XInputSource(), RemoteSource(slots=256))
+    GamepadThread(handler, poller=Poller(source=hub))
+makes the remote controllers slots 4 to 259 (0 to 255 without the
+XInput library)."""
+    def __init__(self, *sources):
+        self.sources = sources
+        self._offsets = []
+        self._readers = []
+        for source in sources:
+            self._offsets.append(len(self._readers))
+            self._readers += [(source.read_state, i) for i in range(source.slots)]
+        self.slots = len(self._readers)
+        if all(hasattr(source, "read_states") for source in sources):
+            self.read_states = self.__read_states
+
+    def offset(self, source):
+        """The hub slot of the first slot of <source>"""
+        for source_, offset in zip(self.sources, self._offsets):
+            if source_ is source:
+                return offset
+        raise ValueError("source is not part of this hub")
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int"""
+        if not 0 <= user_index < self.slots:
+            return ERROR_BAD_ARGUMENTS
+        read_state, index = self._readers[user_index]
+        return read_state(index, state)
+
+    def __read_states(self, states, connected):
+        size = ctypes.sizeof(XINPUT_STATE)
+        for source, offset in zip(self.sources, self._offsets):
+            if source.slots:
+                source.read_states((XINPUT_STATE * source.slots).from_buffer(states, offset * size),
+                                   (ctypes.c_ubyte * source.slots).from_buffer(connected, offset))
+
+_xinput_source = XInputSource()
+
+class StateHistory:
+    """Records the raw states of every poll of a Poller into
+preallocated ctypes arrays:
+    history = StateHistory(120)
+    poller = Poller(history=history)
+The last <frames> polls are always available as one contiguous
+block, oldest first, without copying anything. states(n) returns
+them as a ctypes array of XINPUT_STATE (n * slots entries, frame
+by frame), which supports the buffer protocol:
+    numpy.ctypeslib.as_array(history.states()).reshape(-1, 4)
+    numpy.frombuffer(history.states(), numpy.dtype(XINPUT_STATE))
+connected(n) and timestamps(n) return matching memoryviews.
+Every frame is written twice, once into each half of a buffer twice
+the requested size, which keeps the newest <frames> frames in order."""
+    def __init__(self, frames, slots=4):
+        if frames < 1:
+            raise ValueError("frames must be at least 1")
+        self.frames = frames
+        self.slots = slots
+        self.count = 0
+        self._states = (State * (2 * frames * slots))()
+        self._connected = (ctypes.c_ubyte * (2 * frames * slots))()
+        self._timestamps = (ctypes.c_double * (2 * frames))()
+        self._states_address = ctypes.addressof(self._states)
+        self._connected_address = ctypes.addressof(self._connected)
+        self._frame_size = ctypes.sizeof(State) * slots
+
+    def __len__(self):
+        return min(self.count, self.frames)
+
+    def clear(self):
+        self.count = 0
+
+    def record(self, states, connected, timestamp):
+        """Appends one frame. <states> and <connected> are ctypes arrays
+with one entry per slot, like Poller.states and Poller.connected."""
+        index = self.count % self.frames
+        frame_size = self._frame_size
+        slots = self.slots
+        for position in (index, index + self.frames):
+            ctypes.memmove(self._states_address + position * frame_size, states, frame_size)
+            ctypes.memmove(self._connected_address + position * slots, connected, slots)
+            self._timestamps[position] = timestamp
+        self.count += 1
+
+    def __window(self, n):
+        available = len(self)
+        if n is None or n > available:
+            n = available
+        end = (self.count - 1) % self.frames + self.frames + 1 if self.count else 0
+        return end - n, n
+
+    def states(self, n=None):
+        """states([int]) -> ctypes array of XINPUT_STATE
+The states of the last <n> frames (all recorded ones by default),
+oldest first. Shares memory with the history, so it's only valid
+until <frames> more frames were recorded."""
+        start, n = self.__window(n)
+        return (State * (n * self.slots)).from_buffer(self._states, start * self._frame_size)
+
+    def connected(self, n=None):
+        """connected([int]) -> memoryview
+The connection flags matching states(<n>), one byte per slot and frame."""
+        start, n = self.__window(n)
+        return memoryview(self._connected).cast("B")[start * self.slots:(start + n) * self.slots]
+
+    def timestamps(self, n=None):
+        """timestamps([int]) -> memoryview
+The time.time() of each of the last <n> frames, as doubles."""
+        start, n = self.__window(n)
+        return memoryview(self._timestamps).cast("B").cast("d")[start:start + n]
+
+class EMAFilter:
+    """Smooths a stick with an exponential moving average: every sample
+moves the smoothed position <alpha> of the way to the raw one.
+Each instance keeps the state of one stick."""
+    __slots__ = ("alpha", "_x", "_y")
+
+    def __init__(self, alpha=0.5):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be greater than 0 and at most 1")
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self._x = None
+
+    def update(self, x, y, now):
+        """update(int, int, float) -> (float, float)
+Takes a raw position and returns the smoothed one"""
+        if self._x is None:
+            self._x = x
+            self._y = y
+        else:
+            alpha = self.alpha
+            self._x += alpha * (x - self._x)
+            self._y += alpha * (y - self._y)
+        return (self._x, self._y)
+
+class OneEuroFilter:
+    """Smooths a stick with the 1€ filter (Casiez et al.): a low pass
+whose cutoff frequency rises with the speed of the stick, so it
+removes jitter while resting and adds little lag while moving.
+<min_cutoff> (Hz) is the cutoff at rest, <beta> how fast it rises
+with the speed in stick ranges per second and <d_cutoff> (Hz) the
+cutoff used for the speed itself.
+Each instance keeps the state of one stick."""
+    __slots__ = ("min_cutoff", "beta", "d_cutoff", "_x", "_y", "_dx", "_dy", "_time")
+
+    def __init__(self, min_cutoff=1.0, beta=1.0, d_cutoff=1.0):
+        if min_cutoff <= 0 or d_cutoff <= 0 or beta < 0:
+            raise ValueError("the cutoffs must be greater than 0 and beta not negative")
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+
+    def update(self, x, y, now):
+        """update(int, int, float) -> (float, float)
+Takes a raw position and returns the smoothed one"""
+        if self._x is None:
+            self._x = x
+            self._y = y
+            self._dx = self._dy = 0.0
+            self._time = now
+            return (x, y)
+        dt = now - self._time
+        if dt <= 0:
+            return (self._x, self._y)
+        self._time = now
+
+        alpha = 1 / (1 + 1 / (2 * pi * self.d_cutoff * dt))
+        self._dx += alpha * ((x - self._x) / dt - self._dx)
+        self._dy += alpha * ((y - self._y) / dt - self._dy)
+        speed = sqrt(self._dx * self._dx + self._dy * self._dy) / 32767.
+
+        alpha = 1 / (1 + 1 / (2 * pi * (self.min_cutoff + self.beta * speed) * dt))
+        self._x += alpha * (x - self._x)
+        self._y += alpha * (y - self._y)
+        return (self._x, self._y)
+
+class MedianFilter:
+    """Smooths a stick with the median of its last three positions (per
+axis), which removes single-report spikes without any lag otherwise.
+Each instance keeps the state of one stick."""
+    __slots__ = ("_x0", "_x1", "_y0", "_y1")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._x0 = None
+
+    def update(self, x, y, now):
+        """update(int, int, float) -> (int, int)
+Takes a raw position and returns the smoothed one"""
+        a = self._x0
+        if a is None:
+            self._x0 = self._x1 = x
+            self._y0 = self._y1 = y
+            return (x, y)
+        b = self._x1
+        self._x0 = b
+        self._x1 = x
+        if a > b:
+            a, b = b, a
+        mx = a if x < a else b if x > b else x
+        a = self._y0
+        b = self._y1
+        self._y0 = b
+        self._y1 = y
+        if a > b:
+            a, b = b, a
+        my = a if y < a else b if y > b else y
+        return (mx, my)
+
+_PREDICTED_LIMITS = ((0, 255), (0, 255), (-32768, 32767), (-32768, 32767), (-32768, 32767), (-32768, 32767))
+
+class Predictor:
+    """Estimates where the triggers and sticks of every slot will be a
+few milliseconds ahead, by extrapolating their velocity and
+acceleration over the recorded states:
+    predictor = Predictor()
+    poller = Poller(predictor=predictor)
+    ...
+    state = predictor.predicted_state(0, 0.012)
+Every new state updates the estimates in constant time, no samples
+are kept. <smoothing> (0 to 1) is how much one new state changes the
+velocity and acceleration, 1 only uses the latest differences. With
+<order> 1 only the velocity is extrapolated. A slot whose state
+didn't change for <idle> seconds is resting and isn't extrapolated."""
+    def __init__(self, slots=4, smoothing=0.5, order=2, idle=0.05):
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be greater than 0 and at most 1")
+        if order not in (1, 2):
+            raise ValueError("order must be 1 or 2")
+        self.slots = slots
+        self.smoothing = smoothing
+        self.order = order
+        self.idle = idle
+        self._states = (State * slots)()
+        self._packets = [None] * slots     # None while disconnected
+        self._times = array("d", bytes(8 * slots))
+        self._motion = array("d", bytes(8 * 18 * slots))    # position, velocity and acceleration of the 6 axes per slot
+
+    def record(self, states, connected, timestamp):
+        """Takes the states of one poll. <states> and <connected> are
+ctypes arrays with one entry per slot, like Poller.states and
+Poller.connected, <timestamp> is their time.time()."""
+        motion = self._motion
+        for i in range(min(self.slots, len(states))):
+            if not connected[i]:
+                self._packets[i] = None
                 continue
-
-    for i in range(4):
-        is_connected = _connected[i]
-        if not is_connected: continue
-
-        if these_states[i].Gamepad.wButtons != _last_states[i].Gamepad.wButtons:
-            changed = these_states[i].Gamepad.wButtons ^ _last_states[i].Gamepad.wButtons
-            if changed:
-                for button in _button_dict:
-                    if changed & button:
-                        event = Event(i, EVENT_BUTTON_PRESSED if changed & button & these_states[i].Gamepad.wButtons else EVENT_BUTTON_RELEASED)
+            state = states[i]
+            pad = state.Gamepad
+            values = (pad.bLeftTrigger, pad.bRightTrigger, pad.sThumbLX, pad.sThumbLY, pad.sThumbRX, pad.sThumbRY)
+            if self._packets[i] is None:
+                base = 18 * i
+                motion[base:base + 18] = array("d", [0.0]) * 18
+                for axis, value in enumerate(values):
+                    motion[base + 3 * axis] = value
+            else:
+                if state.dwPacketNumber == self._packets[i]:
+                    last = self._states[i].Gamepad
+                    if values == (last.bLeftTrigger, last.bRightTrigger, last.sThumbLX, last.sThumbLY, last.sThumbRX, last.sThumbRY):
+                        continue    # nothing new, e.g. a poll between two reports
+                dt = timestamp - self._times[i]
+                if dt <= 0:
+                    continue
+                k = self.smoothing
+                resting = dt > self.idle
+                base = 18 * i
+                for value in values:
+                    position = motion[base]
+                    velocity = 0.0 if resting else motion[base + 1]
+                    new_velocity = (value - position) / dt
+                    motion[base] = value
+                    motion[base + 1] = velocity + k * (new_velocity - velocity)
+                    if resting:
+                        motion[base + 2] = 0.0
+                    else:
+                        acceleration = motion[base + 2]
+                        motion[base + 2] = acceleration + k * ((new_velocity - velocity) / dt - acceleration)
+                    base += 3
+            ctypes.memmove(ctypes.addressof(self._states[i]), ctypes.addressof(state), ctypes.sizeof(State))
+            self._packets[i] = state.dwPacketNumber
+            self._times[i] = timestamp
+
+    def predicted_state(self, user_index, dt, now=None):
+        """predicted_state(int, float[, float]) -> XINPUT_STATE
+The last state of <user_index> with its triggers and sticks moved to
+where they are expected <dt> seconds after <now> (time.time() by
+default). The buttons are the last ones."""
+        if dt < 0:
+            raise ValueError("dt must not be negative")
+        if self._packets[user_index] is None:
+            raise XInputNotConnectedError("Controller [{}] appears to be disconnected.".format(user_index))
+        if now is None:
+            now = time.time()
+        state = State()
+        ctypes.memmove(ctypes.addressof(state), ctypes.addressof(self._states[user_index]), ctypes.sizeof(State))
+        since = now - self._times[user_index]
+        if since > self.idle:
+            return state
+        horizon = since + dt
+        second_order = 0.5 * horizon * horizon if self.order == 2 else 0.0
+        motion = self._motion
+        base = 18 * user_index
+        predicted = []
+        for low, high in _PREDICTED_LIMITS:
+            value = round(motion[base] + motion[base + 1] * horizon + motion[base + 2] * second_order)
+            predicted.append(low if value < low else high if value > high else value)
+            base += 3
+        pad = state.Gamepad
+        pad.bLeftTrigger, pad.bRightTrigger, pad.sThumbLX, pad.sThumbLY, pad.sThumbRX, pad.sThumbRY = predicted
+        return state
+
+class StickCalibration:
+    """The center, range and deadzone of one (e.g. worn) stick, in raw
+units. Positions are moved by (<center_x>, <center_y>) and each half
+axis is stretched so that its extent from the center (<left>,
+<right>, <down> and <up>) reaches the full range. <deadzone> replaces
+the stick's global deadzone unless it is None.
+The scales are computed once, create a new one to change it."""
+    __slots__ = ("center_x", "center_y", "left", "right", "down", "up", "deadzone", "_scales")
+
+    def __init__(self, center_x=0, center_y=0, left=32768, right=32767, down=32768, up=32767, deadzone=None):
+        if min(left, right, down, up) <= 0:
+            raise ValueError("The extents must be greater than 0")
+        self.center_x = center_x
+        self.center_y = center_y
+        self.left = left
+        self.right = right
+        self.down = down
+        self.up = up
+        self.deadzone = deadzone
+        self._scales = (32768. / left, 32767. / right, 32768. / down, 32767. / up)
+
+    def normalize(self, X, Y, deadzone):
+        """Like _normalize_stick(), on the calibrated position. <deadzone>
+is used if the calibration has none."""
+        scales = self._scales
+        x = X - self.center_x
+        y = Y - self.center_y
+        x *= scales[1] if x > 0 else scales[0]
+        y *= scales[3] if y > 0 else scales[2]
+        return _normalize_stick(x, y, deadzone if self.deadzone is None else self.deadzone)
+
+    def to_dict(self):
+        return {name : getattr(self, name) for name in self.__slots__[:-1]}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+class Calibration:
+    """The StickCalibration of the <left> and <right> stick of one
+controller. See set_calibration() and AutoCalibrator."""
+    __slots__ = ("left", "right")
+
+    def __init__(self, left=None, right=None):
+        self.left = StickCalibration() if left is None else left
+        self.right = StickCalibration() if right is None else right
+
+    def to_dict(self):
+        return {"left" : self.left.to_dict(), "right" : self.right.to_dict()}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(StickCalibration.from_dict(values["left"]), StickCalibration.from_dict(values["right"]))
+
+def save_calibrations(path, calibrations):
+    """Writes a {user_index : Calibration} mapping, e.g.
+AutoCalibrator.calibrations, to the JSON file <path>"""
+    import json
+    with open(path, "w") as file:
+        json.dump({str(user_index) : calibration.to_dict() for user_index, calibration in calibrations.items()}, file, indent=4)
+
+def load_calibrations(path):
+    """load_calibrations(str) -> dict
+Reads the {user_index : Calibration} mapping written by save_calibrations()"""
+    import json
+    with open(path) as file:
+        return {int(user_index) : Calibration.from_dict(values) for user_index, values in json.load(file).items()}
+
+_CALIBRATION_FIELDS = 13    # per stick: count, mean x, mean y, M2 x, M2 y, min x, max x, min y, max y, rest x, rest y, previous x, previous y
+_FACTORY_DEADZONES = (XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE, XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+
+class AutoCalibrator:
+    """Learns the center, range and deadzone of every stick from the live
+states, for sticks that rest off-center or don't reach the full
+range. It is fed by a poller (or with record(states, connected,
+timestamp)):
+    calibrator = AutoCalibrator()
+    poller = Poller(calibrator=calibrator)
+A position counts as resting if it is within the stick's factory
+deadzone of the current center and moved less than <still> since
+the previous state. Resting positions update a running mean and
+variance (Welford's algorithm, forgetting all but the last <window>
+of them), and the extremes of each axis are tracked. That's a few
+arithmetic operations per new state and stick.
+Every <interval> seconds the statistics are folded into a
+Calibration per slot (in <calibrations>), which the poller then
+uses to normalize the sticks:
+- the center is the mean resting position (after <min_samples>),
+  at most the factory deadzone away from the middle
+- the deadzone is <sigmas> standard deviations of the resting
+  position, at least <min_deadzone> and at most <max_deadzone_scale>
+  times the factory deadzone
+- an extent is the farthest position reached in that direction,
+  once it is at least <min_extent>, the full range before that
+The resting area never depends on what was learned, so a stick that
+never rests (e.g. constant aiming) can't widen its own deadzone.
+Calibrations saved with save_calibrations() can be passed back as
+<profiles> to continue from them."""
+    def __init__(self, slots=4, interval=5.0, window=5000, min_samples=100, sigmas=4.0,
+                 min_deadzone=1000, max_deadzone_scale=1.5, min_extent=16384, still=1024, profiles=None):
+        if window < min_samples or min_samples < 2:
+            raise ValueError("window must be at least min_samples, and min_samples at least 2")
+        if max_deadzone_scale * min(_FACTORY_DEADZONES) < min_deadzone:
+            raise ValueError("max_deadzone_scale doesn't leave room for min_deadzone")
+        self.slots = slots
+        self.interval = interval
+        self.window = window
+        self.min_samples = min_samples
+        self.sigmas = sigmas
+        self.min_deadzone = min_deadzone
+        self.max_deadzone_scale = max_deadzone_scale
+        self.min_extent = min_extent
+        self.still = still
+        self.calibrations = {}
+        self.version = 0        # bumped by every fold that changed a calibration
+        self._next_fold = None
+        self._packets = [None] * slots
+        self._rest_radii = tuple(float(deadzone) ** 2 for deadzone in _FACTORY_DEADZONES)     # squared
+        self._stats = array("d", bytes(8 * 2 * _CALIBRATION_FIELDS * slots))
+        for user_index, calibration in (profiles or {}).items():
+            self.__seed(user_index, calibration)
+
+    def __seed(self, user_index, calibration):
+        stats = self._stats
+        base = 2 * _CALIBRATION_FIELDS * user_index
+        for stick, default in zip((calibration.left, calibration.right), _FACTORY_DEADZONES):
+            deadzone = default if stick.deadzone is None else stick.deadzone
+            spread = (deadzone / self.sigmas) ** 2 / 2
+            stats[base:base + _CALIBRATION_FIELDS] = array("d", (
+                self.min_samples, stick.center_x, stick.center_y, spread * self.min_samples, spread * self.min_samples,
+                stick.center_x - stick.left, stick.center_x + stick.right, stick.center_y - stick.down, stick.center_y + stick.up,
+                stick.center_x, stick.center_y, stick.center_x, stick.center_y))
+            base += _CALIBRATION_FIELDS
+        self.calibrations[user_index] = calibration
+        self.version += 1
+
+    def record(self, states, connected, timestamp):
+        """Takes the states of one poll. <states> and <connected> are
+ctypes arrays with one entry per slot, like Poller.states and
+Poller.connected, <timestamp> is their time.time()."""
+        stats = self._stats
+        window = self.window
+        forget = (window - 1) / window
+        still = self.still
+        left_radius, right_radius = self._rest_radii
+        for i in range(min(self.slots, len(states))):
+            if not connected[i]:
+                self._packets[i] = None
+                continue
+            state = states[i]
+            if state.dwPacketNumber == self._packets[i]:
+                continue
+            self._packets[i] = state.dwPacketNumber
+            pad = state.Gamepad
+            base = 2 * _CALIBRATION_FIELDS * i
+            for X, Y, rest_radius in ((pad.sThumbLX, pad.sThumbLY, left_radius), (pad.sThumbRX, pad.sThumbRY, right_radius)):
+                if X < stats[base + 5]:
+                    stats[base + 5] = X
+                elif X > stats[base + 6]:
+                    stats[base + 6] = X
+                if Y < stats[base + 7]:
+                    stats[base + 7] = Y
+                elif Y > stats[base + 8]:
+                    stats[base + 8] = Y
+                step = abs(X - stats[base + 11]) + abs(Y - stats[base + 12])
+                stats[base + 11] = X
+                stats[base + 12] = Y
+                dx = X - stats[base + 9]
+                dy = Y - stats[base + 10]
+                if dx * dx + dy * dy < rest_radius and step < still:     # resting
+                    n = stats[base]
+                    if n < window:
+                        n += 1
+                        stats[base] = n
+                    else:
+                        stats[base + 3] *= forget
+                        stats[base + 4] *= forget
+                    delta = X - stats[base + 1]
+                    stats[base + 1] += delta / n
+                    stats[base + 3] += delta * (X - stats[base + 1])
+                    delta = Y - stats[base + 2]
+                    stats[base + 2] += delta / n
+                    stats[base + 4] += delta * (Y - stats[base + 2])
+                base += _CALIBRATION_FIELDS
+
+        if self._next_fold is None:
+            self._next_fold = timestamp + self.interval
+        elif timestamp >= self._next_fold:
+            self._next_fold = timestamp + self.interval
+            self.fold()
+
+    def fold(self):
+        """Turns the statistics into <calibrations>. Called by record()
+every <interval> seconds."""
+        stats = self._stats
+        changed = False
+        for i in range(self.slots):
+            sticks = []
+            base = 2 * _CALIBRATION_FIELDS * i
+            for factory in _FACTORY_DEADZONES:
+                n = stats[base]
+                if n < self.min_samples:
+                    sticks.append(None)
+                    base += _CALIBRATION_FIELDS
+                    continue
+                center_x = stats[base + 1]
+                center_y = stats[base + 2]
+                offset = sqrt(center_x * center_x + center_y * center_y)
+                if offset > factory:
+                    center_x *= factory / offset
+                    center_y *= factory / offset
+                deadzone = max(self.min_deadzone, self.sigmas * sqrt((stats[base + 3] + stats[base + 4]) / n))
+                deadzone = min(round(deadzone), int(self.max_deadzone_scale * factory))
+                extents = []
+                for extent, full in ((center_x - stats[base + 5], 32768 + center_x), (stats[base + 6] - center_x, 32767 - center_x),
+                                     (center_y - stats[base + 7], 32768 + center_y), (stats[base + 8] - center_y, 32767 - center_y)):
+                    extents.append(round(extent if extent >= self.min_extent else full))    # not reached far enough yet
+                sticks.append(StickCalibration(round(center_x), round(center_y), *extents, deadzone=deadzone))
+                # the resting positions are looked for around the new center
+                stats[base + 9] = center_x
+                stats[base + 10] = center_y
+                base += _CALIBRATION_FIELDS
+            if sticks != [None, None]:
+                calibration = Calibration(*sticks)
+                previous = self.calibrations.get(i)
+                if previous is None or previous.to_dict() != calibration.to_dict():
+                    self.calibrations[i] = calibration
+                    changed = True
+        if changed:
+            self.version += 1
+
+class ButtonRemap:
+    """Remaps the buttons of a controller, e.g. for accessibility or per
+player preferences. <mapping> maps single BUTTON_* values to the
+buttons they press instead (any combination, 0 disables a button);
+buttons that aren't in it are kept:
+    ButtonRemap({BUTTON_A : BUTTON_B, BUTTON_B : BUTTON_A, BUTTON_BACK : 0})
+The mapping is compiled into a table from every wButtons value to
+the remapped one, so remapping costs one index per state.
+The buttons in <turbo> (after remapping) alternate between pressed
+and released <turbo_rate> times per second while they are held."""
+    def __init__(self, mapping=None, turbo=0, turbo_rate=10.0):
+        mapping = {} if mapping is None else dict(mapping)
+        for button, buttons in mapping.items():
+            if bin(button).count("1") != 1 or button & ~0xFFFF or buttons & ~0xFFFF:
+                raise ValueError("Only single buttons can be remapped, to any combination of buttons")
+        if turbo & ~0xFFFF:
+            raise ValueError("turbo must be a combination of buttons")
+        if turbo_rate <= 0:
+            raise ValueError("turbo_rate must be greater than 0")
+        self.mapping = mapping
+        self.turbo = turbo
+        self.turbo_rate = turbo_rate
+
+        # remapping is done bit by bit, so the table is built from one per byte
+        low = [_remap_value(value, mapping) for value in range(256)]
+        high = [_remap_value(value << 8, mapping) for value in range(256)]
+        self.table = table = array("H", bytes(2 * 65536))
+        for value in range(256):
+            remapped = high[value]
+            table[value << 8:(value + 1) << 8] = array("H", [remapped | byte for byte in low])
+
+def _remap_value(buttons, mapping):
+    remapped = buttons
+    for button in mapping:
+        if buttons & button:
+            remapped &= ~button
+    for button, target in mapping.items():
+        if buttons & button:
+            remapped |= target
+    return remapped
+
+def _remap_buttons(remap, buttons, turbo_since, user_index, now):
+    """Remaps a wButtons value and applies the turbo. <turbo_since> holds
+when the turbo buttons of each slot started being held."""
+    buttons = remap.table[buttons]
+    turbo = buttons & remap.turbo
+    if turbo:
+        since = turbo_since.get(user_index)
+        if since is None:
+            since = turbo_since[user_index] = now
+        if int((now - since) * 2 * remap.turbo_rate) & 1:
+            buttons &= ~turbo
+    elif turbo_since:
+        turbo_since.pop(user_index, None)
+    return buttons
+
+class _EventPool:     # the events one slot can issue in a single poll, reused by pooled Pollers
+    __slots__ = ("connection", "buttons", "triggers", "sticks")
+
+    def __init__(self, user_index):
+        self.connection = Event(user_index, EVENT_CONNECTED)
+        self.buttons = {}
+        for button, name in _button_dict.items():
+            event = Event(user_index, EVENT_BUTTON_PRESSED)
+            event.button = name
+            event.button_id = button
+            self.buttons[button] = event
+        self.triggers = []
+        self.sticks = []
+        for side in (LEFT, RIGHT):
+            event = Event(user_index, EVENT_TRIGGER_MOVED)
+            event.trigger = side
+            event.value = 0
+            self.triggers.append(event)
+            event = Event(user_index, EVENT_STICK_MOVED)
+            event.stick = side
+            event.x = event.y = event.value = 0
+            event.dir = (0.0, 0.0)
+            self.sticks.append(event)
+
+_GENERATED_DEMAND = _BUTTON_MASK | STICK_LEFT | STICK_RIGHT | TRIGGER_LEFT | TRIGGER_RIGHT
+_ANALOG_DEMAND = STICK_LEFT | STICK_RIGHT | TRIGGER_LEFT | TRIGGER_RIGHT
+
+def _demand_of(filter_):
+    """What the Poller has to generate for an EventHandler filter: its
+buttons, sticks, triggers and COMBO bits, and the button edges it
+lets through (FILTER_PRESSED_ONLY, FILTER_RELEASED_ONLY or both)"""
+    edges = filter_ & (FILTER_PRESSED_ONLY | FILTER_RELEASED_ONLY)
+    return (filter_ & (_GENERATED_DEMAND | COMBO)) | (edges or FILTER_PRESSED_ONLY | FILTER_RELEASED_ONLY)
+
+_RATE_WINDOW = 0.25    # seconds of packet numbers per report rate estimate
+_RATE_DECAY = 0.9      # per window, so a wrong estimate doesn't stick
+_SMOOTHING_REPORT_RATE = 125.0  # assumed until the report rate of a slot is estimated
+_SMOOTHING_SETTLE = 2.0         # report intervals without a new packet before the held position is smoothed again
+
+class Poller:
+    """Turns the controller states into events, like get_events().
+Every Poller keeps its own copy of the last states, so several of
+them can be used independently. get_events() uses a shared one.
+
+With <pooled> set to True, polling doesn't allocate anything in
+the steady state: the states are double buffered and swapped
+instead of reallocated, events are taken from a pool and poll()
+always returns the same list. That list and the events in it are
+only valid until the next call to poll().
+
+<report_rates> holds the estimated report rate of each slot and
+<last_packet_time> the time.time() of the last poll that got a
+new state (or a connection change).
+
+The raw states of the last poll are available without copying
+through <states> and <connected>, and every poll is recorded
+into <history> if a StateHistory is given, into <predictor> if a
+Predictor is given and into <calibrator> if an AutoCalibrator is
+given, whose calibrations the poller then applies.
+
+<source> is where the states are read from (the XInput driver by
+default), e.g. a SharedStateReader.
+
+With a <filter> or <controllers> (see set_demand()), only the events
+that pass them are generated at all."""
+    def __init__(self, pooled=False, history=None, source=None, filter=FILTER_NONE, controllers=None, predictor=None,
+                 calibrator=None):
+        self.pooled = pooled
+        self.history = history
+        self.predictor = predictor
+        self.calibrator = calibrator
+        self._calibrations = {}
+        self._calibration_version = None
+        self.source = _xinput_source if source is None else source
+        self._demand = None
+        self._remaps = {}
+        self._smoothing = {}
+        self.reset()
+        self.set_demand(filter, controllers)
+
+    def reset(self):
+        """Forgets all states. The next poll() checks every controller
+and reports the connected ones."""
+        slots = range(self.source.slots)
+        self._slots = slots
+        self._current_array = (State * len(slots))()
+        self._previous_array = (State * len(slots))()
+        self._current = list(self._current_array)      # views into the arrays
+        self._previous = list(self._previous_array)
+        self._current_pads = [state.Gamepad for state in self._current]
+        self._previous_pads = [state.Gamepad for state in self._previous]
+        self._connected = (ctypes.c_ubyte * len(slots))()
+        self._read_connected = (ctypes.c_ubyte * len(slots))()     # for sources with read_states()
+        self._active = []       # the connected slots, in order
+        self._fresh = [False for _ in slots]
+        self._last_norm_values = array("d", [nan]) * (6 * len(slots))  # LT, RT, LX, LY, RX, RY per slot
+        self._last_checked = 0
+        self._events = []
+        self._pools = [_EventPool(i) for i in slots] if self.pooled else None
+        self._rebase = {}
+        self._turbo_since = {}
+        self._report_rates = [None for _ in slots]
+        self._rate_packets = [None for _ in slots]     # the packet numbers at the start of the window
+        self._rate_since = 0.0
+        self.last_packet_time = None
+        self._smoothed_packets = [None for _ in slots]  # the packet number the filters last saw
+        self._smoothed_at = [0.0 for _ in slots]
+        for filters in self._smoothing.values():
+            for stick_filter in filters:
+                if stick_filter is not None:
+                    stick_filter.reset()
+        self._set_demand(self._demand)
+
+    def set_remap(self, user_index, remap):
+        """Remaps the buttons of <user_index> with a ButtonRemap (None
+removes it). The remapped buttons are what the states, the history
+and the events of this poller show."""
+        remaps = dict(self._remaps)     # replaced, not modified, a thread may be polling
+        if remap is None:
+            remaps.pop(user_index, None)
+        else:
+            remaps[user_index] = remap
+        self._remaps = remaps
+        self._turbo_since.pop(user_index, None)
+
+    def set_calibration(self, user_index, calibration):
+        """Normalizes the sticks of <user_index> with a Calibration (None
+removes it), e.g. one learned by an AutoCalibrator"""
+        calibrations = dict(self._calibrations)  # replaced, not modified, a thread may be polling
+        if calibration is None:
+            calibrations.pop(user_index, None)
+        else:
+            calibrations[user_index] = calibration
+        self._calibrations = calibrations
+
+    def set_calibrator(self, calibrator):
+        """Feeds every poll into an AutoCalibrator and applies its
+calibrations, or stops feeding one with None. The calibrations
+that were applied stay until set_calibration() removes them."""
+        self.calibrator = calibrator
+        self._calibration_version = None    # applies the new one's calibrations on the next poll
+
+    def set_smoothing(self, user_index, stick, stick_filter):
+        """Smooths the <stick> (LEFT or RIGHT) of <user_index> with an
+EMAFilter, OneEuroFilter or MedianFilter (None removes it). Every
+stick needs its own filter instance. The filter gets every new
+packet, not every poll, so its smoothing doesn't depend on the
+polling rate. A controller only sends packets when its state changes,
+so a position that is held for two report intervals is fed again
+every two report intervals, which lets the filter settle at rest.
+The filter runs before the states are compared, so the states, the
+history and the events all show the smoothed positions and jitter
+doesn't cause STICK_MOVED events."""
+        if stick not in (LEFT, RIGHT):
+            raise ValueError("stick must be LEFT or RIGHT")
+        smoothing = dict(self._smoothing)    # replaced, not modified, a thread may be polling
+        filters = list(smoothing.get(user_index, (None, None)))
+        filters[stick] = stick_filter
+        if filters == [None, None]:
+            smoothing.pop(user_index, None)
+        else:
+            smoothing[user_index] = tuple(filters)
+        if stick_filter is not None:
+            stick_filter.reset()
+        if 0 <= user_index < len(self._smoothed_packets):
+            self._smoothed_packets[user_index] = None
+        self._smoothing = smoothing
+
+    def set_demand(self, filter=FILTER_NONE, controllers=None):
+        """Only generates the events that pass <filter> (like the filter
+of an EventHandler) for the slots in <controllers> (all slots with
+None). Whole kinds of events nobody asked for are skipped before any
+work is done, e.g. no stick is normalized without STICK_LEFT or
+STICK_RIGHT in the filter. Connection events are always generated,
+and the raw states and the history are not affected.
+Slots and buttons, triggers and sticks that are added later report
+their current state on the next poll, like a new connection."""
+        if filter == FILTER_NONE and controllers is None:
+            self._set_demand(None)
+        else:
+            wanted = _demand_of(filter)
+            self._set_demand({i : wanted for i in (self._slots if controllers is None else controllers)})
+
+    def _set_demand(self, demand):
+        """<demand> maps slots to what is generated for them (see
+_demand_of()), None generates everything"""
+        full = _demand_of(FILTER_NONE)
+        masks = [full if demand is None else demand.get(i, 0) for i in self._slots]
+        pressed = [mask & _BUTTON_MASK if mask & FILTER_PRESSED_ONLY else 0 for mask in masks]
+        released = [mask & _BUTTON_MASK if mask & FILTER_RELEASED_ONLY else 0 for mask in masks]
+        if self._active:
+            for i in self._active:
+                # what wasn't generated before is compared against a neutral state next time
+                added = (masks[i] & ~self._demand_masks[i] & _ANALOG_DEMAND) | (pressed[i] & ~self._demand_pressed[i])
+                if added:
+                    self._rebase[i] = self._rebase.get(i, 0) | added
+        self._demand = demand
+        self._demand_masks = masks
+        self._demand_pressed = pressed
+        self._demand_released = released
+        self._demanded = [i for i in self._active if masks[i] & _GENERATED_DEMAND]
+
+    def poll(self):
+        """poll() -> list of Event
+Returns the events for each change that occured since the
+last call. See get_events()"""
+        pooled = self.pooled
+        if pooled:
+            events = self._events
+            del events[:]
+        else:
+            events = []
+
+        # swap the buffers, the oldest one gets overwritten
+        current = self._previous
+        previous = self._current
+        self._current, self._previous = current, previous
+        current_array = self._previous_array
+        self._previous_array = self._current_array
+        self._current_array = current_array
+        current_pads = self._previous_pads
+        previous_pads = self._current_pads
+        self._current_pads, self._previous_pads = current_pads, previous_pads
+
+        slots = self._slots
+        connected = self._connected
+        fresh = self._fresh
+        read_state = self.source.read_state
+
+        this_time = time.time()
+        read_states = getattr(self.source, "read_states", None)
+        if read_states is not None:
+            # everything at once, the slots are only visited if a connection changed
+            read_connected = self._read_connected
+            read_states(current_array, read_connected)
+            if bytes(read_connected) != bytes(connected):
+                for i in slots:
+                    if bool(read_connected[i]) != bool(connected[i]):
+                        connected[i] = read_connected[i]
+                        self.__connection_changed(i, bool(connected[i]), events)
+        elif self._last_checked + 1 < this_time:
+            self._last_checked = this_time
+            for i in slots:
+                is_connected = (read_state(i, current[i]) == 0)
+                if is_connected != connected[i]:
+                    connected[i] = is_connected
+                    self.__connection_changed(i, is_connected, events)
+                if not is_connected:
+                    ctypes.memset(ctypes.addressof(current[i]), 0, ctypes.sizeof(State))
+        else:
+            for i in self._active:
+                if read_state(i, current[i]) != 0:
+                    connected[i] = False
+                    self.__connection_changed(i, False, events)
+
+        if self._remaps:
+            turbo_since = self._turbo_since
+            for i, remap in self._remaps.items():
+                if i < len(connected) and connected[i]:
+                    pad = current_pads[i]
+                    pad.wButtons = buttons = _remap_buttons(remap, pad.wButtons, turbo_since, i, this_time)
+                    if buttons != previous_pads[i].wButtons:
+                        fresh[i] = True     # the turbo toggles without a new packet
+
+        if self._smoothing:
+            smoothed_packets = self._smoothed_packets
+            smoothed_at = self._smoothed_at
+            for i, (left, right) in self._smoothing.items():
+                if i < len(connected) and connected[i]:
+                    pad = current_pads[i]
+                    last = previous_pads[i]
+                    packet = current[i].dwPacketNumber
+                    if packet == smoothed_packets[i]:
+                        interval = _SMOOTHING_SETTLE / (self._report_rates[i] or _SMOOTHING_REPORT_RATE)
+                        if this_time - smoothed_at[i] < interval:
+                            # no new sample: keep the smoothed position
+                            if left is not None:
+                                pad.sThumbLX = last.sThumbLX
+                                pad.sThumbLY = last.sThumbLY
+                            if right is not None:
+                                pad.sThumbRX = last.sThumbRX
+                                pad.sThumbRY = last.sThumbRY
+                            continue
+                        # held that long, the position is real: let the filters settle on it
+                    smoothed_packets[i] = packet
+                    smoothed_at[i] = this_time
+                    if left is not None:
+                        x, y = left.update(pad.sThumbLX, pad.sThumbLY, this_time)
+                        pad.sThumbLX = x = round(x)
+                        pad.sThumbLY = y = round(y)
+                        if x != last.sThumbLX or y != last.sThumbLY:
+                            fresh[i] = True
+                    if right is not None:
+                        x, y = right.update(pad.sThumbRX, pad.sThumbRY, this_time)
+                        pad.sThumbRX = x = round(x)
+                        pad.sThumbRY = y = round(y)
+                        if x != last.sThumbRX or y != last.sThumbRY:
+                            fresh[i] = True
+
+        for i in self._active:
+            if current[i].dwPacketNumber != previous[i].dwPacketNumber:
+                self.last_packet_time = this_time
+                break
+        if this_time - self._rate_since >= _RATE_WINDOW:
+            self.__estimate_rates(current, this_time)
+
+        if self.history is not None:
+            self.history.record(current_array, connected, this_time)
+        if self.predictor is not None:
+            self.predictor.record(current_array, connected, this_time)
+        calibrator = self.calibrator
+        if calibrator is not None:
+            calibrator.record(current_array, connected, this_time)
+            if calibrator.version != self._calibration_version:
+                self._calibration_version = calibrator.version
+                for i, calibration in calibrator.calibrations.items():
+                    self.set_calibration(i, calibration)
+
+        norm_values = self._last_norm_values
+        if self._rebase:
+            self.__rebase(previous_pads, norm_values)
+        masks = self._demand_masks
+        calibrations = self._calibrations
+        pressed_masks = self._demand_pressed
+        released_masks = self._demand_released
+        for i in self._demanded:
+            if current[i].dwPacketNumber == previous[i].dwPacketNumber:
+                if not fresh[i]:
+                    continue    # the packet number only changes if the state did
+            fresh[i] = False
+
+            pad = current_pads[i]
+            last = previous_pads[i]
+            pool = self._pools[i] if pooled else None
+            wanted = masks[i]
+
+            buttons = pad.wButtons
+            if buttons != last.wButtons:
+                changed = (buttons ^ last.wButtons) & ((buttons & pressed_masks[i]) | (~buttons & released_masks[i]))
+                while changed:  # only visit the bits that changed, lowest first
+                    button = changed & -changed
+                    changed ^= button
+                    if pooled:
+                        event = pool.buttons[button]
+                        event.type = EVENT_BUTTON_PRESSED if button & buttons else EVENT_BUTTON_RELEASED
+                    else:
+                        event = Event(i, EVENT_BUTTON_PRESSED if button & buttons else EVENT_BUTTON_RELEASED)
                         event.button = _button_dict[button]
                         event.button_id = button
-                        yield event
-
-        if these_states[i].Gamepad.bLeftTrigger != _last_states[i].Gamepad.bLeftTrigger:
-            LT = these_states[i].Gamepad.bLeftTrigger
-
-            normLT = 0
-
-            if LT > XINPUT_GAMEPAD_TRIGGER_THRESHOLD:
-                LT -= XINPUT_GAMEPAD_TRIGGER_THRESHOLD
-                normLT = LT / (255. - XINPUT_GAMEPAD_TRIGGER_THRESHOLD)
-            else:
-                LT = 0
-
-            if normLT != _last_norm_values[0]:
-                event = Event(i, EVENT_TRIGGER_MOVED)
-                event.trigger = LEFT
-                event.value = normLT
-                yield event
-
-            _last_norm_values[0] = normLT
-
-        if these_states[i].Gamepad.bRightTrigger != _last_states[i].Gamepad.bRightTrigger:
-            RT = these_states[i].Gamepad.bRightTrigger
-
-            normRT = 0
-
-            if RT > XINPUT_GAMEPAD_TRIGGER_THRESHOLD:
-                RT -= XINPUT_GAMEPAD_TRIGGER_THRESHOLD
-                normRT = RT / (255. - XINPUT_GAMEPAD_TRIGGER_THRESHOLD)
-            else:
-                RT = 0
-
-            if normRT != _last_norm_values[1]:
+                    events.append(event)
+
+            if wanted & TRIGGER_LEFT and pad.bLeftTrigger != last.bLeftTrigger:
+                self.__trigger_moved(i, LEFT, _normalize_trigger(pad.bLeftTrigger, XINPUT_GAMEPAD_TRIGGER_THRESHOLD), norm_values, pool, events)
+
+            if wanted & TRIGGER_RIGHT and pad.bRightTrigger != last.bRightTrigger:
+                self.__trigger_moved(i, RIGHT, _normalize_trigger(pad.bRightTrigger, XINPUT_GAMEPAD_TRIGGER_THRESHOLD), norm_values, pool, events)
+
+            calibration = calibrations.get(i) if calibrations else None
+            if wanted & STICK_LEFT:
+                LX = pad.sThumbLX
+                LY = pad.sThumbLY
+                if LX != last.sThumbLX or LY != last.sThumbLY:
+                    if calibration is None:
+                        normalized = _normalize_stick(LX, LY, XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+                    else:
+                        normalized = calibration.left.normalize(LX, LY, XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+                    self.__stick_moved(i, LEFT, normalized, norm_values, pool, events)
+
+            if wanted & STICK_RIGHT:
+                RX = pad.sThumbRX
+                RY = pad.sThumbRY
+                if RX != last.sThumbRX or RY != last.sThumbRY:
+                    if calibration is None:
+                        normalized = _normalize_stick(RX, RY, XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+                    else:
+                        normalized = calibration.right.normalize(RX, RY, XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+                    self.__stick_moved(i, RIGHT, normalized, norm_values, pool, events)
+
+        return events
+
+    def __rebase(self, previous_pads, norm_values):
+        """Clears what set_demand() added from the previous states"""
+        for i, added in self._rebase.items():
+            last = previous_pads[i]
+            last.wButtons &= ~added & 0xFFFF
+            if added & TRIGGER_LEFT:
+                last.bLeftTrigger = 0
+                norm_values[6 * i + LEFT] = nan
+            if added & TRIGGER_RIGHT:
+                last.bRightTrigger = 0
+                norm_values[6 * i + RIGHT] = nan
+            if added & STICK_LEFT:
+                last.sThumbLX = last.sThumbLY = 0
+                norm_values[6 * i + 2] = norm_values[6 * i + 3] = nan
+            if added & STICK_RIGHT:
+                last.sThumbRX = last.sThumbRY = 0
+                norm_values[6 * i + 4] = norm_values[6 * i + 5] = nan
+            self._fresh[i] = True
+        self._rebase.clear()
+
+    def __estimate_rates(self, current, now):
+        """Updates the report rates from the packet numbers since the
+start of the window. Packets only count while the state changes,
+so the highest rate seen is kept and only decays slowly."""
+        elapsed = now - self._rate_since
+        rates = self._report_rates
+        packets = self._rate_packets
+        for i in self._active:
+            packet = current[i].dwPacketNumber
+            if packets[i] is not None:
+                increments = (packet - packets[i]) & 0xFFFFFFFF
+                if increments:
+                    rate = increments / elapsed
+                    decayed = (rates[i] or 0.0) * _RATE_DECAY
+                    rates[i] = rate if rate > decayed else decayed
+            packets[i] = packet
+        self._rate_since = now
+
+    @property
+    def report_rates(self):
+        """The estimated report rate of every slot in reports per second,
+from how fast its packet number increases while the state changes.
+None until it was measured and for disconnected slots."""
+        return tuple(self._report_rates)
+
+    @property
+    def states(self):
+        """The raw states of the last poll() as a ctypes array of
+XINPUT_STATE with one entry per slot. It supports the buffer
+protocol, e.g. memoryview(poller.states) or
+numpy.ctypeslib.as_array(poller.states), and is only valid
+until the next poll() (the buffers are swapped).
+Disconnected slots hold a zeroed state."""
+        return self._current_array
+
+    @property
+    def connected(self):
+        """The connection flags of the last poll() as a ctypes array
+of bytes, one per slot"""
+        return self._connected
+
+    def __connection_changed(self, i, is_connected, events):
+        if is_connected:
+            # compare the first state against a neutral one
+            ctypes.memset(ctypes.addressof(self._previous[i]), 0, ctypes.sizeof(State))
+            self._fresh[i] = True
+            self._last_norm_values[6 * i:6 * i + 6] = array("d", [nan]) * 6
+            self._active = sorted(self._active + [i])
+        else:
+            self._rebase.pop(i, None)
+            self._turbo_since.pop(i, None)
+            self._report_rates[i] = None
+            ctypes.memset(ctypes.addressof(self._current[i]), 0, ctypes.sizeof(State))
+            ctypes.memset(ctypes.addressof(self._previous[i]), 0, ctypes.sizeof(State))
+            self._active = [j for j in self._active if j != i]
+        for stick_filter in self._smoothing.get(i, ()):
+            if stick_filter is not None:
+                stick_filter.reset()    # don't smooth from the last session's position
+        self._smoothed_packets[i] = None
+        self._rate_packets[i] = None
+        self.last_packet_time = time.time()
+        self._demanded = [j for j in self._active if self._demand_masks[j] & _GENERATED_DEMAND]
+        if self.pooled:
+            event = self._pools[i].connection
+            event.type = EVENT_CONNECTED if is_connected else EVENT_DISCONNECTED
+        else:
+            event = Event(i, EVENT_CONNECTED if is_connected else EVENT_DISCONNECTED)
+        events.append(event)
+
+    def __trigger_moved(self, i, side, value, norm_values, pool, events):
+        index = 6 * i + side
+        if value != norm_values[index]:
+            if pool is None:
                 event = Event(i, EVENT_TRIGGER_MOVED)
-                event.trigger = RIGHT
-                event.value = normRT
-                yield event
-
-            _last_norm_values[1] = normRT
-
-        if these_states[i].Gamepad.sThumbLX != _last_states[i].Gamepad.sThumbLX or these_states[i].Gamepad.sThumbLY != _last_states[i].Gamepad.sThumbLY:
-            LX = these_states[i].Gamepad.sThumbLX
-            LY = these_states[i].Gamepad.sThumbLY
-
-            magL = sqrt(LX*LX + LY*LY)
-
-            if magL != 0:
-                normLX = LX / magL
-                normLY = LY / magL
-            else: # if magL == 0 the stick is centered, there is no direction
-                normLX = 0
-                normLY = 0
-
-            normMagL = 0
-
-            if (magL > XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE):
-                magL = min(32767, magL)
-
-                magL -= XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE
-
-                normMagL = magL / (32767. - XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+                event.trigger = side
             else:
-                magL = 0
-
-            out = (normLX * normMagL, normLY * normMagL)
-
-            if out != _last_norm_values[2]:
+                event = pool.triggers[side]
+            event.value = value
+            events.append(event)
+
+        norm_values[index] = value
+
+    def __stick_moved(self, i, side, normalized, norm_values, pool, events):
+        normX, normY, normMag = normalized
+        x = normX * normMag
+        y = normY * normMag
+        index = 6 * i + 2 + 2 * side
+        if x != norm_values[index] or y != norm_values[index + 1]:
+            if pool is None:
                 event = Event(i, EVENT_STICK_MOVED)
-                event.stick = LEFT
-                event.x = out[0]
-                event.y = out[1]
-                event.value = normMagL
-                event.dir = (normLX, normLY) if event.value else (0.0, 0.0)
-                yield event
-
-            _last_norm_values[2] = out
-
-        if these_states[i].Gamepad.sThumbRX != _last_states[i].Gamepad.sThumbRX or these_states[i].Gamepad.sThumbRY != _last_states[i].Gamepad.sThumbRY:
-            RX = these_states[i].Gamepad.sThumbRX
-            RY = these_states[i].Gamepad.sThumbRY
-
-            magR = sqrt(RX*RX + RY*RY)
-
-            if magR != 0:
-                normRX = RX / magR
-                normRY = RY / magR
-            else:   # if magR == 0 the stick is centered, there is no direction
-                normRX = 0
-                normRY = 0
-
-            normMagR = 0
-
-            if (magR > XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE):
-                magR = min(32767, magR)
-
-                magR -= XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE
-
-                normMagR = magR / (32767. - XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+                event.stick = side
             else:
-                magR = 0
+                event = pool.sticks[side]
+            event.x = x
+            event.y = y
+            event.value = normMag
+            event.dir = (normX, normY) if normMag else (0.0, 0.0)
+            events.append(event)
+
+        norm_values[index] = x
+        norm_values[index + 1] = y
+
+_default_poller = Poller()
+
+def set_remap(user_index, remap):
+    """Remaps the buttons of <user_index> in get_events(), get_state()
+and get_snapshot() with a ButtonRemap, or removes the remapping with
+None. Other Pollers have their own Poller.set_remap()."""
+    _default_poller.set_remap(user_index, remap)
+
+def set_calibration(user_index, calibration):
+    """Normalizes the sticks of <user_index> in get_events() and in
+get_thumb_values(state, user_index) with a Calibration, or removes
+the calibration with None. See AutoCalibrator."""
+    _default_poller.set_calibration(user_index, calibration)
+
+def set_calibrator(calibrator):
+    """Lets an AutoCalibrator learn from the states get_events() polls
+and applies its calibrations there, or stops it with None.
+See Poller.set_calibrator()"""
+    _default_poller.set_calibrator(calibrator)
+
+def set_smoothing(user_index, stick, stick_filter):
+    """Smooths the <stick> (LEFT or RIGHT) of <user_index> in
+get_events() with a filter, or removes the smoothing with None.
+See Poller.set_smoothing()"""
+    _default_poller.set_smoothing(user_index, stick, stick_filter)
 
-            out = (normRX * normMagR, normRY * normMagR)
-
-            if out != _last_norm_values[3]:
-                event = Event(i, EVENT_STICK_MOVED)
-                event.stick = RIGHT
-                event.x = out[0]
-                event.y = out[1]
-                event.value = normMagR
-                event.dir = (normRX, normRY) if event.value else (0.0, 0.0)
-                yield event
-
-            _last_norm_values[3] = out
+def get_events():
+    """get_events() -> generator
+Returns a generator that yields events for each change that
+occured since this function was last called.
+Each event has a <type> and <user_index> associated.
+The other variables vary."""
+    for event in _default_poller.poll():
+        yield event
+
+_handlers_changed = 0      # bumped when a handler's rate, filter or controllers change, so threads regroup them
+
+def _handlers_change(method):
+    def changed(self, *args):
+        global _handlers_changed
+        result = method(self, *args)
+        _handlers_changed += 1
+        return result
+    changed.__name__ = method.__name__
+    return changed
+
+class _ControllerSet(set):
+    """The controllers of an EventHandler. Changing it in place, e.g.
+with handler.controllers.add(1), regroups the handlers like
+add_controller() does."""
+    __slots__ = ()
+
+for _name in ("add", "remove", "discard", "pop", "clear", "update", "difference_update", "intersection_update",
+              "symmetric_difference_update", "__ior__", "__iand__", "__isub__", "__ixor__"):
+    setattr(_ControllerSet, _name, _handlers_change(getattr(set, _name)))
+del _name
 
-    _last_states = these_states
-    
 class EventHandler:
-    def __init__(self, *controllers, filter = FILTER_NONE):
+    batched = False     # True delivers the events to process_events() in batches
+
+    def __init__(self, *controllers, filter = FILTER_NONE, rate = None):
         self.set_controllers(*controllers)
         
         self.filter = filter
+
+        self.set_rate(rate)
+
+    # the GamepadThreads follow every change of these, however they are made
+    @property
+    def controllers(self):
+        return self._controllers
+
+    @controllers.setter
+    def controllers(self, controllers):
+        global _handlers_changed
+        self._controllers = _ControllerSet(controllers)
+        _handlers_changed += 1
+
+    @property
+    def filter(self):
+        return self._filter
+
+    @filter.setter
+    def filter(self, filter_):
+        global _handlers_changed
+        self._filter = filter_
+        _handlers_changed += 1
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate):
+        global _handlers_changed
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self._rate = rate
+        _handlers_changed += 1
     
     def process_button_event(self, event):
         raise NotImplementedError("Method not implemented. Must be implemented in the child class")
@@ -569,10 +1892,39 @@ class EventHandler:
     def process_connection_event(self, event):
         raise NotImplementedError("Method not implemented. Must be implemented in the child class")
 
+    def process_combo_event(self, event):
+        """Called for chords and sequences recognized by a ComboRecognizer
+that was added to the GamepadThread. Does nothing by default."""
+        pass
+
+    def process_gesture_event(self, event):
+        """Called for stick gestures recognized by a GestureRecognizer
+that was added to the GamepadThread. Does nothing by default."""
+        pass
+
+    def process_events(self, batch):
+        """Called instead of the process_*_event() methods if <batched> is
+True, with all of a poll's events for this handler's controllers
+(and filter) as an EventBatch. By default it passes each event to
+its process_*_event() method."""
+        for event in batch:
+            type_ = event.type
+            if type_ == EVENT_STICK_MOVED:
+                self.process_stick_event(event)
+            elif type_ == EVENT_TRIGGER_MOVED:
+                self.process_trigger_event(event)
+            elif type_ == EVENT_BUTTON_PRESSED or type_ == EVENT_BUTTON_RELEASED:
+                self.process_button_event(event)
+            elif type_ == EVENT_CONNECTED or type_ == EVENT_DISCONNECTED:
+                self.process_connection_event(event)
+            elif type_ == EVENT_COMBO:
+                self.process_combo_event(event)
+            elif type_ == EVENT_GESTURE:
+                self.process_gesture_event(event)
 
     def add_controller(self, user_index):
         """Adds a given controller to the ones that are processed"""
-        assert 0 <= user_index <= 3, "controllers must have a user_index between 0 and 3"
+        assert 0 <= user_index, "controllers must have a user_index of 0 or more"
 
         self.controllers.add(user_index)
 
@@ -582,13 +1934,13 @@ class EventHandler:
             raise ValueError("You need to specify at least one controller")
         
         for user_index in controllers:
-            assert 0 <= user_index <= 3, "controllers must have a user_index between 0 and 3"
+            assert 0 <= user_index, "controllers must have a user_index of 0 or more"
 
         self.controllers = set(controllers)
 
     def remove_controller(self, user_index):
         """Removes a given controller from the ones that are processed"""
-        assert 0 <= user_index <= 3, "controllers must have a user_index between 0 and 3"
+        assert 0 <= user_index, "controllers must have a user_index of 0 or more"
 
         assert len(self.controllers) >= 2, "you have to keep at least one controller"
     
@@ -600,8 +1952,6 @@ class EventHandler:
 
     def has_controller(self, user_index):
         """Checks, wether or not this handler handles controller <user_index>"""
-        assert 0 <= user_index <= 3, "controllers must have a user_index between 0 and 3"
-
         return user_index in self.controllers
     
     def set_filter(self, filter_):
@@ -617,9 +1967,123 @@ A filter can be any combination of filters, such as
         """Removes all filters"""
         self.filter = FILTER_NONE
 
+    def set_rate(self, rate):
+        """Sets how many times per second the events are delivered to this
+handler. With None (the default) it gets every event as soon as it
+is polled. With a rate, the GamepadThread collects the events in
+between: every button press and release, every connection change,
+combo and gesture, but only the latest value of each trigger and
+stick. This way, a handler at a lower rate than the thread's
+update_frequency isn't called for every raw event."""
+        self.rate = rate
+
+
+class EventBatch:
+    """The events of one poll (or one delivery at a handler's rate),
+in order in <events> and partitioned by kind into <connections>,
+<buttons>, <triggers>, <sticks>, <combos> and <gestures>.
+The same batch may be passed to several handlers, don't modify it.
+With a pooled Poller the events are only valid during the call."""
+    __slots__ = ("events", "connections", "buttons", "triggers", "sticks", "combos", "gestures")
+
+    def __init__(self, events):
+        self.events = events
+        self.connections = connections = []
+        self.buttons = buttons = []
+        self.triggers = triggers = []
+        self.sticks = sticks = []
+        self.combos = combos = []
+        self.gestures = gestures = []
+        for event in events:
+            type_ = event.type
+            if type_ == EVENT_STICK_MOVED:
+                sticks.append(event)
+            elif type_ == EVENT_TRIGGER_MOVED:
+                triggers.append(event)
+            elif type_ == EVENT_BUTTON_PRESSED or type_ == EVENT_BUTTON_RELEASED:
+                buttons.append(event)
+            elif type_ == EVENT_CONNECTED or type_ == EVENT_DISCONNECTED:
+                connections.append(event)
+            elif type_ == EVENT_COMBO:
+                combos.append(event)
+            elif type_ == EVENT_GESTURE:
+                gestures.append(event)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+def _handler_wants(handler, event):
+    """Applies the controllers and the filter of <handler> to <event>,
+like the GamepadThread does for the process_*_event() methods"""
+    if not handler.has_controller(event.user_index):
+        return False
+    type_ = event.type
+    filter_ = handler.filter
+    if type_ == EVENT_BUTTON_PRESSED or type_ == EVENT_BUTTON_RELEASED:
+        if (filter_ & (FILTER_PRESSED_ONLY+FILTER_RELEASED_ONLY)) and not(filter_ & (FILTER_PRESSED_ONLY << (type_ - EVENT_BUTTON_PRESSED))):
+            return False
+        return bool(event.button_id & filter_)
+    if type_ == EVENT_TRIGGER_MOVED:
+        return bool((TRIGGER_LEFT << event.trigger) & filter_)
+    if type_ == EVENT_STICK_MOVED or type_ == EVENT_GESTURE:
+        return bool((STICK_LEFT << event.stick) & filter_)
+    if type_ == EVENT_COMBO:
+        return bool(COMBO & filter_)
+    return True
+
+def _is_batched(handler):
+    return getattr(handler, "batched", False)
+
+class _RateGroup:
+    """The handlers of one GamepadThread with the same delivery rate,
+and the events collected for them since their last delivery"""
+    __slots__ = ("interval", "handlers", "batch_handlers", "due", "discrete", "analog")
+
+    def __init__(self, rate, handlers):
+        self.interval = 1 / rate
+        self.handlers = handlers
+        self.batch_handlers = ()
+        self.due = 0.0
+        self.discrete = []
+        self.analog = {}        # (user_index, type, trigger or stick) -> latest event
+
+    def collect(self, events):
+        discrete = self.discrete
+        analog = self.analog
+        for event in events:
+            type_ = event.type
+            if type_ == EVENT_STICK_MOVED:
+                analog[(event.user_index, type_, event.stick)] = event
+            elif type_ == EVENT_TRIGGER_MOVED:
+                analog[(event.user_index, type_, event.trigger)] = event
+            else:
+                discrete.append(event)
+
+    def take(self, now):
+        """The collected events if the group is due, else None"""
+        if now < self.due or not (self.discrete or self.analog):
+            return None
+        due = self.due + self.interval
+        self.due = due if due > now else now + self.interval    # no catching up after a late delivery
+        return self.drain()
+
+    def drain(self):
+        """The collected events, the triggers and sticks last"""
+        events = self.discrete
+        if self.analog:
+            events += self.analog.values()
+            self.analog = {}
+        self.discrete = []
+        return events
+
+_ADAPTIVE_OVERSAMPLING = 4     # polls per report while a controller is in use
 
 class GamepadThread:
-    def __init__(self, *event_handlers, auto_start=True, update_frequency=1000):
+    def __init__(self, *event_handlers, auto_start=True, update_frequency=1000, recognizers=(), poller=None,
+                 adaptive=False, idle_frequency=30, idle_timeout=0.5):
         for event_handler in event_handlers:
             if (event_handler is None or not issubclass(type(event_handler), EventHandler)):
                 raise TypeError("The event handler must be a subclass of XInput.EventHandler")
@@ -630,21 +2094,53 @@ class GamepadThread:
         if update_frequency <= 0:
             raise ValueError("Update_frequency must be greater than 0")
 
+        if idle_frequency <= 0:
+            raise ValueError("Idle_frequency must be greater than 0")
+
         self.__update_frequency = update_frequency
+
+        # with adaptive polling, the thread polls a few times per report of the fastest controller while
+        # any of them sends new states, and at idle_frequency after idle_timeout seconds without any
+        self.adaptive = adaptive
+        self.idle_frequency = idle_frequency
+        self.idle_timeout = idle_timeout
+        self.poll_frequency = update_frequency
             
         self.handlers = set(event_handlers)
 
+        self.recognizers = list(recognizers)
+
+        self.poller = _default_poller if poller is None else poller
+
         self.lock = Lock()
 
         self.queued_new_handlers = []
         self.queued_removed_handlers = []
+
+        self._waited_events = None      # collected once wait_for_events() was called
+        self._events_available = Condition(Lock())
+        self._batch_listeners = ()      # called with the events of every poll, e.g. by aevents()
+
+        self.__group_handlers()
         
         if auto_start:
             self.start()
 
     def __tfun(self):           # thread function
+        # sources that can wait for input (e.g. an EvdevSource) wake the thread up instead of a timer
+        wait = getattr(getattr(self.poller, "source", None), "wait", None)
+        last_poll = time.perf_counter()
         while(self.running):  # polling
-            time.sleep(1 / self.__update_frequency)  # sleep to avoid overloading the CPU
+            if wait is None:
+                if self.adaptive:
+                    self.poll_frequency = self.__adaptive_frequency()
+                time.sleep(1 / self.poll_frequency)  # sleep to avoid overloading the CPU
+            else:
+                wait(0.1)
+                remaining = last_poll + 1 / self.__update_frequency - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)   # never faster than update_frequency
+                last_poll = time.perf_counter()
             self.lock.acquire()
             for new_handler in self.queued_new_handlers:
                 self.handlers.add(new_handler)
@@ -652,39 +2148,209 @@ class GamepadThread:
             for removed_handler in self.queued_removed_handlers:
                 if removed_handler in self.handlers:
                     self.handlers.remove(removed_handler)
+            if self.queued_new_handlers or self.queued_removed_handlers:
+                self.__group_handlers()
             self.queued_new_handlers.clear()
             self.queued_removed_handlers.clear()
             self.lock.release()
-            
-            events = get_events()
-            for event in events:    # filtering events
-                if event.type == EVENT_CONNECTED or event.type == EVENT_DISCONNECTED:
-                    for handler in self.handlers:
-                        if handler.has_controller(event.user_index):
-                            handler.process_connection_event(event)
-                            
-                elif event.type == EVENT_BUTTON_PRESSED or event.type == EVENT_BUTTON_RELEASED:
-                    for handler in self.handlers:
-                        if handler.has_controller(event.user_index):
-                            if not((handler.filter & (FILTER_PRESSED_ONLY+FILTER_RELEASED_ONLY)) and not(handler.filter & (FILTER_PRESSED_ONLY << (event.type - EVENT_BUTTON_PRESSED)))):
-                                if event.button_id & handler.filter:
-                                    handler.process_button_event(event)
-                elif event.type == EVENT_TRIGGER_MOVED:
-                    for handler in self.handlers:
-                        if handler.has_controller(event.user_index):
-                            if (TRIGGER_LEFT << event.trigger) & handler.filter:
-                                handler.process_trigger_event(event)
-                elif event.type == EVENT_STICK_MOVED:
-                    for handler in self.handlers:
-                        if handler.has_controller(event.user_index):
-                            if (STICK_LEFT << event.stick) & handler.filter:
-                                handler.process_stick_event(event)
-                else: 
-                    raise ValueError("Event type not recognized")
-                
+
+            self._dispatch_events(self.poller.poll())
+
+    def __adaptive_frequency(self):
+        last_packet_time = getattr(self.poller, "last_packet_time", None)
+        if last_packet_time is None:
+            return self.__update_frequency
+        if time.time() - last_packet_time > self.idle_timeout:
+            return min(self.idle_frequency, self.__update_frequency)
+        rates = [rate for rate in self.poller.report_rates if rate]
+        if not rates:
+            return self.__update_frequency
+        frequency = _ADAPTIVE_OVERSAMPLING * max(rates)
+        return min(self.__update_frequency, max(frequency, self.idle_frequency))
+
+    def __group_handlers(self):
+        """Splits the handlers into the ones that get every event and
+one group per delivery rate"""
+        self._handlers_version = _handlers_changed
+        rates = {}
+        for handler in self.handlers:
+            rates.setdefault(getattr(handler, "rate", None), set()).add(handler)
+        immediate = rates.pop(None, set())
+        self._immediate_handlers = [handler for handler in immediate if not _is_batched(handler)]
+        self._immediate_batch_handlers = [handler for handler in immediate if _is_batched(handler)]
+        groups = {group.interval : group for group in getattr(self, "_rate_groups", ())}
+        self._rate_groups = []
+        for rate, handlers in sorted(rates.items()):
+            group = groups.get(1 / rate)
+            if group is None:
+                group = _RateGroup(rate, handlers)
+            # keeps what was collected so far
+            group.handlers = [handler for handler in handlers if not _is_batched(handler)]
+            group.batch_handlers = [handler for handler in handlers if _is_batched(handler)]
+            self._rate_groups.append(group)
+        if getattr(self, "running", False):
+            self.__apply_demand()
+
+    def __apply_demand(self):
+        """Lets the poller generate only the events that the handlers
+(and the recognizers feeding them) can receive at all. The shared
+poller of get_events() is left alone, its other callers get every
+event."""
+        set_demand = getattr(self.poller, "_set_demand", None)
+        if set_demand is None or self.poller is _default_poller:
+            return
+        if self._waited_events is not None or self._batch_listeners:
+            set_demand(None)    # they get every event
+            return
+        demand = {}
+        for handler in self.handlers:
+            wanted = _demand_of(handler.filter)
+            for user_index in handler.controllers:
+                demand[user_index] = demand.get(user_index, 0) | wanted
+        if self.recognizers:
+            needed = 0
+            for recognizer in self.recognizers:
+                needed |= _demand_of(getattr(recognizer, "demand", FILTER_NONE))
+            for user_index in demand:
+                demand[user_index] |= needed
+        set_demand(demand)
+
+    def _dispatch_events(self, events):
+        if self.recognizers:
+            events = self.__recognize(events)
+        if self._waited_events is not None or self._batch_listeners:
+            events = list(events)
+            self.__hand_over(events)
+        if self._handlers_version != _handlers_changed:
+            self.__group_handlers()
+        groups = self._rate_groups
+        if groups:
+            if not isinstance(events, list):
+                events = list(events)
+            if events:
+                kept = [_copy_event(event) for event in events] if getattr(self.poller, "pooled", False) else events
+                for group in groups:
+                    group.collect(kept)
+            self.__dispatch(events, self._immediate_handlers, self._immediate_batch_handlers)
+            now = time.perf_counter()
+            for group in groups:
+                collected = group.take(now)
+                if collected is not None:
+                    self.__dispatch(collected, group.handlers, group.batch_handlers)
+        else:
+            self.__dispatch(events, self._immediate_handlers, self._immediate_batch_handlers)
+
+    def __dispatch(self, events, handlers, batch_handlers):
+        if batch_handlers:
+            if not isinstance(events, list):
+                events = list(events)
+            if events:
+                self.__dispatch_batch(events, batch_handlers)
+            if not handlers:
+                return
+        for event in events:    # filtering events
+            if event.type == EVENT_CONNECTED or event.type == EVENT_DISCONNECTED:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        handler.process_connection_event(event)
+                        
+            elif event.type == EVENT_BUTTON_PRESSED or event.type == EVENT_BUTTON_RELEASED:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        if not((handler.filter & (FILTER_PRESSED_ONLY+FILTER_RELEASED_ONLY)) and not(handler.filter & (FILTER_PRESSED_ONLY << (event.type - EVENT_BUTTON_PRESSED)))):
+                            if event.button_id & handler.filter:
+                                handler.process_button_event(event)
+            elif event.type == EVENT_TRIGGER_MOVED:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        if (TRIGGER_LEFT << event.trigger) & handler.filter:
+                            handler.process_trigger_event(event)
+            elif event.type == EVENT_STICK_MOVED:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        if (STICK_LEFT << event.stick) & handler.filter:
+                            handler.process_stick_event(event)
+            elif event.type == EVENT_COMBO:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        if COMBO & handler.filter:
+                            handler.process_combo_event(event)
+            elif event.type == EVENT_GESTURE:
+                for handler in handlers:
+                    if handler.has_controller(event.user_index):
+                        if (STICK_LEFT << event.stick) & handler.filter:
+                            handler.process_gesture_event(event)
+            else: 
+                raise ValueError("Event type not recognized")
+
+    def __hand_over(self, events):  # to wait_for_events() and the batch listeners
+        if not events:
+            return
+        if getattr(self.poller, "pooled", False):
+            events = [_copy_event(event) for event in events]   # pooled events are reused by the next poll
+        for listener in self._batch_listeners:
+            listener(events)
+        if self._waited_events is not None:
+            with self._events_available:
+                self._waited_events += events
+                self._events_available.notify_all()
+
+    def _add_batch_listener(self, listener):
+        self.lock.acquire()
+        self._batch_listeners = self._batch_listeners + (listener,)
+        self._handlers_version = None       # regroup, the poller has to generate everything now
+        self.lock.release()
+
+    def _remove_batch_listener(self, listener):
+        self.lock.acquire()
+        self._batch_listeners = tuple(l for l in self._batch_listeners if l is not listener)
+        self._handlers_version = None
+        self.lock.release()
+
+    def wait_for_events(self, timeout=None):
+        """wait_for_events(timeout=None) -> list of Event
+Blocks until the thread polled at least one event or <timeout>
+seconds passed, and returns all events since the last call (an
+empty list on timeout). The thread wakes the caller up, there is
+no polling in between.
+The events are only collected from the first call on."""
+        with self._events_available:
+            if self._waited_events is None:
+                self._waited_events = []
+                self._handlers_version = None   # regroup, the poller has to generate everything now
+            if not self._waited_events:
+                self._events_available.wait_for(lambda: self._waited_events, timeout)
+            events = self._waited_events
+            self._waited_events = []
+        return events
+
+    def __dispatch_batch(self, events, batch_handlers):
+        batch = EventBatch(events)
+        slots = {event.user_index for event in events}
+        for handler in batch_handlers:
+            if handler.filter == FILTER_NONE and slots <= handler.controllers:
+                handler.process_events(batch)      # shared, nothing to filter
+            else:
+                selected = [event for event in events if _handler_wants(handler, event)]
+                if selected:
+                    handler.process_events(EventBatch(selected))
+
+    def __recognize(self, events):    # feeds every event through the recognizers, yielding what they derive from it
+        recognizers = self.recognizers
+        for event in events:
+            yield event
+            for recognizer in recognizers:
+                for derived in recognizer.process_event(event):
+                    yield derived
+        for recognizer in recognizers:
+            for derived in recognizer.poll():
+                yield derived
 
     def start(self):     # starts the thread
         self.running = True
+        self.lock.acquire()
+        self.__apply_demand()
+        self.lock.release()
         if(not hasattr(self,"__thread")):
             self.__thread = Thread(target=self.__tfun, args=())
             self.__thread.daemon = True
@@ -693,6 +2359,8 @@ class GamepadThread:
     def stop(self):      # stops the thread
         self.running = False
         self.__thread.join()
+        if hasattr(self.poller, "_set_demand") and self.poller is not _default_poller:
+            self.poller._set_demand(None)   # the poller may be used without the thread again
     
     def add_event_handler(self, event_handler):
         if (event_handler is None or not issubclass(type(event_handler), EventHandler)):
@@ -708,8 +2376,1967 @@ class GamepadThread:
         self.queued_removed_handlers.append(event_handler)
         self.lock.release()
 
+    def add_recognizer(self, recognizer):
+        """Adds a recognizer (e.g. a ComboRecognizer). The events it
+derives are dispatched to the handlers like any other event."""
+        self.lock.acquire()
+        self.recognizers = self.recognizers + [recognizer]
+        self._handlers_version = None
+        self.lock.release()
+
+    def remove_recognizer(self, recognizer):
+        self.lock.acquire()
+        self.recognizers = [r for r in self.recognizers if r is not recognizer]
+        self._handlers_version = None
+        self.lock.release()
+
     def __del__(self):
         if hasattr(self, "__thread"):
             self.stop()
+
+_wait_thread = None
+_wait_thread_lock = Lock()
+
+def wait_for_events(timeout=None):
+    """wait_for_events(timeout=None) -> list of Event
+Blocks until at least one event occured or <timeout> seconds
+passed and returns the events since the last call. The first call
+starts a GamepadThread with its own Poller, independent of
+get_events()."""
+    global _wait_thread
+    with _wait_thread_lock:
+        if _wait_thread is None:
+            _wait_thread = GamepadThread(auto_start=False, poller=Poller())
+            _wait_thread._waited_events = []    # keep the first poll's connection events
+            _wait_thread.start()
+    return _wait_thread.wait_for_events(timeout)
+
+async def aevents(thread=None, update_frequency=1000, max_batches=64):
+    """async for event in aevents(): ...
+Yields the events of a GamepadThread in an asyncio event loop.
+The polling stays in that thread, every poll's events are handed
+to the loop as one batch with call_soon_threadsafe. Without a
+<thread>, one with its own Poller is started and stopped again
+when the iteration ends.
+At most <max_batches> batches wait for a slow consumer. What comes
+in after that is merged into one batch, which keeps every button
+press and release, connection change, combo and gesture, but only
+the latest value of each trigger and stick."""
+    import asyncio
+    if max_batches < 1:
+        raise ValueError("max_batches must be at least 1")
+    loop = asyncio.get_running_loop()
+    batches = asyncio.Queue(max_batches)
+    overflow = _RateGroup(1, ())    # merges what doesn't fit into the queue
+    own_thread = thread is None
+    if own_thread:
+        thread = GamepadThread(auto_start=False, update_frequency=update_frequency, poller=Poller())
+
+    def put(events):            # called in the event loop
+        if batches.full() or overflow.discrete or overflow.analog:
+            overflow.collect(events)
+        else:
+            batches.put_nowait(events)
+
+    def listener(events):       # called in the polling thread
+        loop.call_soon_threadsafe(put, events)
+
+    thread._add_batch_listener(listener)
+    if own_thread:
+        thread.start()
+    try:
+        while True:
+            batch = await batches.get()
+            if overflow.discrete or overflow.analog:
+                batches.put_nowait(overflow.drain())     # after the batches that came before it
+            for event in batch:
+                yield event
+    finally:
+        thread._remove_batch_listener(listener)
+        if own_thread:
+            await loop.run_in_executor(None, thread.stop)
+
+async def aset_vibration(user_index, left_speed, right_speed):
+    """Like set_vibration(), without blocking the asyncio event loop"""
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, set_vibration, user_index, left_speed, right_speed)
+
+async def aget_battery_information(user_index):
+    """Like get_battery_information(), without blocking the asyncio event loop"""
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, get_battery_information, user_index)
+
+class _ComboPattern:
+    __slots__ = ("name", "buttons", "window", "max_interval", "max_duration")
+
+    def __init__(self, name, buttons, window=None, max_interval=None, max_duration=None):
+        self.name = name
+        self.buttons = buttons
+        self.window = window
+        self.max_interval = max_interval
+        self.max_duration = max_duration
+
+class _ComboSlot:
+    __slots__ = ("node", "times", "held", "press_times")
+
+    def __init__(self, length):
+        self.node = 0
+        self.times = deque(maxlen=max(1, length))
+        self.held = 0
+        self.press_times = {}
+
+class ComboRecognizer:
+    """Recognizes chords (buttons pressed together within a time window)
+and sequences (buttons pressed one after another, e.g. fighting game
+motions) in the button events of every controller.
+All sequences are compiled into one automaton and all chords into one
+lookup table, so the work per event doesn't grow with the number of
+registered patterns.
+Feed it events with process_event() or add it to a GamepadThread."""
+    demand = _BUTTON_MASK   # the events a GamepadThread has to generate for it
+
+    def __init__(self):
+        self.chords = []
+        self.sequences = []
+        self._slots = {}
+        self._compiled = False
+
+    def add_chord(self, name, buttons, window=0.05):
+        """Registers the chord <name>. <buttons> is a combination of
+BUTTON_* values, e.g. (BUTTON_LEFT_SHOULDER | BUTTON_RIGHT_SHOULDER).
+The chord is recognized when all of them are held and were pressed
+within <window> seconds of each other."""
+        if bin(buttons & 0xffff).count("1") < 2 or buttons & ~0xffff:
+            raise ValueError("A chord needs at least two buttons")
+        if window < 0:
+            raise ValueError("window must not be negative")
+        self.chords.append(_ComboPattern(name, buttons, window=window))
+        self._compiled = False
+
+    def add_sequence(self, name, buttons, max_interval=0.25, max_duration=None):
+        """Registers the sequence <name>. <buttons> is an ordered
+iterable of BUTTON_* values, e.g. (BUTTON_DPAD_DOWN, BUTTON_DPAD_RIGHT, BUTTON_X).
+At most <max_interval> seconds may pass between two presses and
+at most <max_duration> seconds between the first and the last.
+None removes the respective limit. Pressing a button that
+isn't part of the sequence breaks it."""
+        buttons = tuple(buttons)
+        if not buttons:
+            raise ValueError("A sequence needs at least one button")
+        for button in buttons:
+            if button not in _button_dict:
+                raise ValueError("{!r} is not a single button".format(button))
+        self.sequences.append(_ComboPattern(name, buttons, max_interval=max_interval, max_duration=max_duration))
+        self._compiled = False
+
+    def remove(self, name):
+        """Removes every chord and sequence called <name>"""
+        self.chords = [chord for chord in self.chords if chord.name != name]
+        self.sequences = [sequence for sequence in self.sequences if sequence.name != name]
+        self._compiled = False
+
+    def reset(self, user_index=None):
+        """Forgets any partially entered combos (of <user_index> only, if given)"""
+        if user_index is None:
+            self._slots.clear()
+        else:
+            self._slots.pop(user_index, None)
+
+    def compile(self):
+        """Builds the automaton and the chord table. Called automatically
+by process_event() after patterns were added or removed."""
+        # Aho-Corasick trie over the sequences
+        goto = [{}]
+        outputs = [[]]
+        for sequence in self.sequences:
+            node = 0
+            for button in sequence.buttons:
+                if button not in goto[node]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[node][button] = len(goto) - 1
+                node = goto[node][button]
+            outputs[node].append(sequence)
+
+        # failure links, resolved into a full transition table
+        alphabet = set(button for sequence in self.sequences for button in sequence.buttons)
+        transitions = [dict() for _ in goto]
+        fail = [0] * len(goto)
+        queue = deque()
+        for button in alphabet:
+            child = goto[0].get(button, 0)
+            transitions[0][button] = child
+            if child:
+                queue.append(child)
+        while queue:
+            node = queue.popleft()
+            outputs[node] = outputs[node] + outputs[fail[node]]
+            for button in alphabet:
+                child = goto[node].get(button)
+                if child is None:
+                    transitions[node][button] = transitions[fail[node]][button]
+                else:
+                    fail[child] = transitions[fail[node]][button]
+                    transitions[node][button] = child
+                    queue.append(child)
+
+        self._transitions = transitions
+        self._outputs = [tuple(output) for output in outputs]
+        self._max_length = max([len(sequence.buttons) for sequence in self.sequences] or [1])
+        intervals = [sequence.max_interval for sequence in self.sequences]
+        self._reset_interval = None if None in intervals or not intervals else max(intervals)
+
+        self._chord_table = {}
+        for chord in self.chords:
+            self._chord_table.setdefault(chord.buttons, []).append(chord)
+        self._max_window = max([chord.window for chord in self.chords] or [0])
+
+        self._slots.clear()
+        self._compiled = True
+
+    def process_event(self, event, now=None):
+        """process_event(Event[, float]) -> tuple of Event
+Feeds one event into the recognizer and returns the EVENT_COMBO
+events it completed. Each of them has the additional members
+<combo> (the registered name), <buttons> (the button ids in order)
+and <duration> (seconds from the first to the last press).
+<now> defaults to time.perf_counter()."""
+        if event.type == EVENT_BUTTON_PRESSED:
+            pressed = True
+        elif event.type == EVENT_BUTTON_RELEASED:
+            pressed = False
+        elif event.type == EVENT_DISCONNECTED:
+            self._slots.pop(event.user_index, None)
+            return ()
+        else:
+            return ()
+
+        if not self._compiled:
+            self.compile()
+
+        slot = self._slots.get(event.user_index)
+        if slot is None:
+            slot = self._slots[event.user_index] = _ComboSlot(self._max_length)
+
+        button = event.button_id
+        if not pressed:
+            slot.held &= ~button
+            return ()
+
+        if now is None:
+            now = time.perf_counter()
+        found = ()
+
+        # sequences
+        if self._transitions[0]:
+            times = slot.times
+            if times and self._reset_interval is not None and now - times[-1] > self._reset_interval:
+                slot.node = 0
+            slot.node = self._transitions[slot.node].get(button, 0)
+            times.append(now)
+            for sequence in self._outputs[slot.node]:
+                length = len(sequence.buttons)
+                start = times[-length]
+                if sequence.max_duration is not None and now - start > sequence.max_duration:
+                    continue
+                if sequence.max_interval is not None and length > 1:
+                    if any(times[-k] - times[-k - 1] > sequence.max_interval for k in range(1, length)):
+                        continue
+                found += (self.__combo_event(event.user_index, sequence.name, sequence.buttons, now - start),)
+
+        # chords
+        if self._chord_table:
+            recent = 0
+            held = slot.held
+            press_times = slot.press_times
+            oldest = now - self._max_window
+            while held:
+                bit = held & -held
+                held ^= bit
+                if press_times[bit] >= oldest:
+                    recent |= bit
+            recent &= ~button
+            subset = recent
+            while True:
+                chords = self._chord_table.get(subset | button)
+                if chords:
+                    first = min([press_times[bit] for bit in _button_dict if bit & subset] or [now])
+                    for chord in chords:
+                        if now - first <= chord.window:
+                            buttons = tuple(bit for bit in _button_dict if bit & chord.buttons)
+                            found += (self.__combo_event(event.user_index, chord.name, buttons, now - first),)
+                if not subset:
+                    break
+                subset = (subset - 1) & recent
+
+        slot.held |= button
+        slot.press_times[button] = now
+        return found
+
+    def poll(self, now=None):
+        """Combos are only ever completed by a button press, so this
+always returns an empty tuple. See GestureRecognizer.poll()"""
+        return ()
+
+    @staticmethod
+    def __combo_event(user_index, name, buttons, duration):
+        event = Event(user_index, EVENT_COMBO)
+        event.combo = name
+        event.buttons = buttons
+        event.duration = duration
+        return event
+
+class _GestureStick:
+    __slots__ = ("in_center", "flicked", "angle", "turned", "turn_start", "reached", "sector", "sector_since", "held")
+
+    def __init__(self):
+        self.in_center = float("-inf")
+        self.flicked = False
+        self.angle = None
+        self.turned = 0.
+        self.turn_start = 0.
+        self.reached = 0
+        self.sector = None
+        self.sector_since = 0.
+        self.held = False
+
+class GestureRecognizer:
+    """Recognizes gestures in the stick events of every controller:
+GESTURE_FLICK          - the stick was pushed from the center to the rim
+                         within <flick_time> seconds
+GESTURE_QUARTER_CIRCLE - the stick was turned by 90 degrees along the rim
+GESTURE_HALF_CIRCLE    - ... by 180 degrees
+GESTURE_ROTATION       - ... by a full turn, within <circle_time> seconds
+GESTURE_HOLD           - the stick was held in one of 8 directions
+                         for <hold_time> seconds
+Each stick keeps a few running values that are updated in constant
+time per event, no samples are buffered.
+Feed it events with process_event() and call poll() once per frame
+(holds can complete while the stick doesn't move), or add it to a
+GamepadThread, which does both."""
+    demand = STICK_LEFT | STICK_RIGHT   # the events a GamepadThread has to generate for it
+
+    def __init__(self, flick_threshold=0.9, flick_time=0.1, center_threshold=0.2,
+                 circle_threshold=0.5, circle_time=1.0, hold_threshold=0.5, hold_time=0.5):
+        self.flick_threshold = flick_threshold
+        self.flick_time = flick_time
+        self.center_threshold = center_threshold
+        self.circle_threshold = circle_threshold
+        self.circle_time = circle_time
+        self.hold_threshold = hold_threshold
+        self.hold_time = hold_time
+
+        self._sticks = {}
+        self._pending_holds = set()
+
+    def reset(self, user_index=None):
+        """Forgets any partial gestures (of <user_index> only, if given)"""
+        for key in list(self._sticks):
+            if user_index is None or key[0] == user_index:
+                del self._sticks[key]
+                self._pending_holds.discard(key)
+
+    def process_event(self, event, now=None):
+        """process_event(Event[, float]) -> tuple of Event
+Feeds one event into the recognizer and returns the EVENT_GESTURE
+events it completed. Each of them has the additional members
+<gesture> (one of the GESTURE_* values), <stick> (LEFT or RIGHT),
+<dir> (the direction of a flick or hold as X and Y) and
+<clockwise> (the direction of a circle or rotation).
+<now> defaults to time.perf_counter()."""
+        if event.type != EVENT_STICK_MOVED:
+            if event.type == EVENT_DISCONNECTED:
+                self.reset(event.user_index)
+            return ()
+
+        if now is None:
+            now = time.perf_counter()
+
+        key = (event.user_index, event.stick)
+        stick = self._sticks.get(key)
+        if stick is None:
+            stick = self._sticks[key] = _GestureStick()
+
+        value = event.value
+        found = ()
+
+        # flicks
+        if value <= self.center_threshold:
+            stick.in_center = now
+            stick.flicked = False
+        elif value >= self.flick_threshold and not stick.flicked:
+            stick.flicked = True
+            if now - stick.in_center <= self.flick_time:
+                found += (self.__gesture_event(key, GESTURE_FLICK, event.dir, now - stick.in_center),)
+
+        angle = atan2(event.y, event.x) if value else 0.
+
+        # circles
+        if value >= self.circle_threshold:
+            if stick.angle is None or now - stick.turn_start > self.circle_time:
+                stick.turned = 0.
+                stick.turn_start = now
+                stick.reached = 0
+            else:
+                delta = angle - stick.angle
+                if delta > pi:
+                    delta -= 2 * pi
+                elif delta <= -pi:
+                    delta += 2 * pi
+
+                if stick.turned and delta and (delta > 0) != (stick.turned > 0):
+                    stick.turned = 0.
+                    stick.turn_start = now
+                    stick.reached = 0
+
+                stick.turned += delta
+                quarters = int(abs(stick.turned) / (pi / 2))
+                while stick.reached < quarters:
+                    stick.reached += 1
+                    gesture = GESTURE_QUARTER_CIRCLE if stick.reached == 1 else \
+                              GESTURE_HALF_CIRCLE if stick.reached == 2 else \
+                              GESTURE_ROTATION if stick.reached == 4 else \
+                              None
+                    if gesture is not None:
+                        event_ = self.__gesture_event(key, gesture, event.dir, now - stick.turn_start)
+                        event_.clockwise = stick.turned < 0
+                        found += (event_,)
+                    if stick.reached == 4:
+                        stick.turned -= 2 * pi if stick.turned > 0 else -2 * pi
+                        stick.turn_start = now
+                        stick.reached = 0
+                        quarters -= 4
+            stick.angle = angle
+        else:
+            stick.angle = None
+
+        # holds
+        if value >= self.hold_threshold:
+            sector = int(round(angle / (pi / 4))) % 8
+            if sector != stick.sector:
+                stick.sector = sector
+                stick.sector_since = now
+                stick.held = False
+                self._pending_holds.add(key)
+            elif not stick.held and now - stick.sector_since >= self.hold_time:
+                found += (self.__hold_event(key, stick, now),)
+        elif stick.sector is not None:
+            stick.sector = None
+            self._pending_holds.discard(key)
+
+        return found
+
+    def poll(self, now=None):
+        """poll([float]) -> tuple of Event
+Returns the holds that completed since the last event of their stick.
+Only sticks that are currently being held are looked at."""
+        if not self._pending_holds:
+            return ()
+        if now is None:
+            now = time.perf_counter()
+        found = ()
+        for key in list(self._pending_holds):
+            stick = self._sticks[key]
+            if now - stick.sector_since >= self.hold_time:
+                found += (self.__hold_event(key, stick, now),)
+        return found
+
+    def __hold_event(self, key, stick, now):
+        stick.held = True
+        self._pending_holds.discard(key)
+        direction = (round(cos(stick.sector * pi / 4), 12), round(sin(stick.sector * pi / 4), 12))
+        return self.__gesture_event(key, GESTURE_HOLD, direction, now - stick.sector_since)
+
+    @staticmethod
+    def __gesture_event(key, gesture, direction, duration):
+        event = Event(key[0], EVENT_GESTURE)
+        event.gesture = gesture
+        event.stick = key[1]
+        event.dir = direction
+        event.clockwise = None
+        event.duration = duration
+        return event
+
+ACTION_CONTEXT_DEFAULT = "default"
+
+_STICK_BUCKET = 4    # stick axis tables have an entry per 16 raw units of magnitude
+
+class _ActionContext:
+    __slots__ = ("actions", "axes")
+
+    def __init__(self):
+        self.actions = {}   # action -> list of (inputs, threshold)
+        self.axes = {}      # axis -> (input, curve, deadzone, scale)
+
+class ActionState:
+    """The actions and axes of one slot as of the last ActionMap.update().
+<bits> holds a bit per active action and <previous> the bits of the
+update before. <axes> holds two values (X and Y) per axis, Y is 0
+for axes bound to a trigger or to buttons."""
+    __slots__ = ("user_index", "connected", "context", "bits", "previous", "axes", "_map")
+
+    def active(self, action):
+        """Whether <action> is held"""
+        return bool(self.bits & self._map._action_bits[action])
+
+    def pressed(self, action):
+        """Whether <action> became active in the last update"""
+        return bool(self.bits & ~self.previous & self._map._action_bits[action])
+
+    def released(self, action):
+        """Whether <action> stopped being active in the last update"""
+        return bool(~self.bits & self.previous & self._map._action_bits[action])
+
+    def axis(self, name):
+        """The value of axis <name>: (x, y) for sticks, a float otherwise"""
+        index, dimensions = self._map._axis_index[name]
+        if dimensions == 2:
+            return (self.axes[index], self.axes[index + 1])
+        return self.axes[index]
+
+class ActionMap:
+    """Binds named actions and axes to controller inputs, per context:
+    actions = ActionMap()
+    actions.bind("jump", BUTTON_A, BUTTON_Y)
+    actions.bind_axis("move", STICK_LEFT, curve=2.0)
+    actions.bind("back", BUTTON_B, context="menu")
+The bindings are compiled into flat lookup tables, so update()
+evaluates all actions of a slot with a few table lookups on the raw
+XINPUT_GAMEPAD values instead of one get_button_values() or
+get_thumb_values() call per binding. Each slot uses one context at
+a time, ACTION_CONTEXT_DEFAULT unless set_context() was called."""
+    def __init__(self):
+        self._contexts = {ACTION_CONTEXT_DEFAULT : _ActionContext()}
+        self._context = ACTION_CONTEXT_DEFAULT     # of the slots that are used later
+        self._slot_states = []
+        self._compiled = False
+
+    def bind(self, action, *inputs, threshold=XINPUT_GAMEPAD_TRIGGER_THRESHOLD, context=ACTION_CONTEXT_DEFAULT):
+        """Binds <action> to any of <inputs>, which are combinations of
+BUTTON_* values, TRIGGER_LEFT and TRIGGER_RIGHT. A trigger counts
+as held above the raw value <threshold>."""
+        if not inputs:
+            raise ValueError("You need to specify at least one input")
+        for inputs_ in inputs:
+            if not inputs_ or inputs_ & ~(_BUTTON_MASK | TRIGGER_LEFT | TRIGGER_RIGHT):
+                raise ValueError("Actions can only be bound to buttons and triggers")
+        if not 0 <= threshold <= 255:
+            raise ValueError("threshold must be between 0 and 255")
+        bindings = self._contexts.setdefault(context, _ActionContext()).actions.setdefault(action, [])
+        bindings.extend((inputs_, threshold) for inputs_ in inputs)
+        self._compiled = False
+
+    def bind_axis(self, name, input, curve=1.0, deadzone=DEADZONE_DEFAULT, scale=1.0, context=ACTION_CONTEXT_DEFAULT):
+        """Binds the axis <name> to <input>: STICK_LEFT or STICK_RIGHT
+(an (x, y) axis), TRIGGER_LEFT or TRIGGER_RIGHT, or a pair of
+(negative, positive) button combinations (-1, 0 or 1).
+<curve> is applied to the magnitude after the <deadzone> (a raw
+value, the XInput default with DEADZONE_DEFAULT): either an exponent
+or a function from [0, 1] to [0, 1]. The result is multiplied by
+<scale>."""
+        if isinstance(input, tuple):
+            if len(input) != 2 or any(not buttons or buttons & ~_BUTTON_MASK for buttons in input):
+                raise ValueError("An axis on buttons needs a (negative, positive) pair of buttons")
+        elif input not in (STICK_LEFT, STICK_RIGHT, TRIGGER_LEFT, TRIGGER_RIGHT):
+            raise ValueError("Axes can only be bound to a stick, a trigger or a pair of buttons")
+        if not callable(curve) and curve <= 0:
+            raise ValueError("curve must be a function or an exponent greater than 0")
+        self._contexts.setdefault(context, _ActionContext()).axes[name] = (input, curve, deadzone, scale)
+        self._compiled = False
+
+    def unbind(self, name, context=None):
+        """Removes the action or axis <name> (from <context> only, if given)"""
+        contexts = self._contexts.values() if context is None else (self._contexts[context],)
+        for bindings in contexts:
+            bindings.actions.pop(name, None)
+            bindings.axes.pop(name, None)
+        self._compiled = False
+
+    def set_context(self, context, user_index=None):
+        """Switches <user_index> to <context>. With None, every slot is
+switched, also the ones that are first used later. Its actions
+start out released and its axes at 0."""
+        if context not in self._contexts:
+            raise ValueError("Unknown context {!r}".format(context))
+        if user_index is None:
+            self._context = context
+        else:
+            self.__slot_state(user_index)
+        for state in self._slot_states:
+            if user_index is None or state.user_index == user_index:
+                state.context = context
+                state.bits = state.previous = 0
+                for index in range(len(state.axes)):
+                    state.axes[index] = 0.0
+
+    def compile(self):
+        """Builds the lookup tables. Called automatically by update()
+after bindings were added or removed."""
+        action_bits = {}
+        axis_index = {}
+        for bindings in self._contexts.values():
+            for action in bindings.actions:
+                action_bits.setdefault(action, 1 << len(action_bits))
+            for name, binding in bindings.axes.items():
+                dimensions = 2 if binding[0] in (STICK_LEFT, STICK_RIGHT) else 1
+                if axis_index.setdefault(name, (2 * len(axis_index), dimensions))[1] != dimensions:
+                    raise ValueError("Axis {!r} is bound to a stick in one context and not in another".format(name))
+
+        compiled = {}
+        for context, bindings in self._contexts.items():
+            # one table per byte of wButtons and per trigger, each entry is the bits of the actions it activates
+            low = [0] * 256
+            high = [0] * 256
+            left = [0] * 256
+            right = [0] * 256
+            for action, inputs in bindings.actions.items():
+                bit = action_bits[action]
+                for inputs_, threshold in inputs:
+                    for value in range(256):
+                        if value & inputs_:
+                            low[value] |= bit
+                        if value & (inputs_ >> 8):
+                            high[value] |= bit
+                    if inputs_ & TRIGGER_LEFT:
+                        for value in range(threshold + 1, 256):
+                            left[value] |= bit
+                    if inputs_ & TRIGGER_RIGHT:
+                        for value in range(threshold + 1, 256):
+                            right[value] |= bit
+
+            program = []
+            for name, (input, curve, deadzone, scale) in bindings.axes.items():
+                index = axis_index[name][0]
+                if isinstance(input, tuple):
+                    program.append((index, 0, (input[0], input[1], scale)))
+                    continue
+                if not callable(curve):
+                    curve = _power_curve(curve)
+                if input == STICK_LEFT or input == STICK_RIGHT:
+                    if deadzone == DEADZONE_DEFAULT:
+                        deadzone = XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE if input == STICK_LEFT else XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE
+                    # the curved magnitude per bucket of raw magnitude, taken at the middle of the bucket
+                    table = array("d", (_curved_stick(magnitude, deadzone, curve) * scale
+                                        for magnitude in range(1 << (_STICK_BUCKET - 1), 32768, 1 << _STICK_BUCKET)))
+                    table.append(_curved_stick(32767, deadzone, curve) * scale)
+                else:
+                    if deadzone == DEADZONE_DEFAULT:
+                        deadzone = XINPUT_GAMEPAD_TRIGGER_THRESHOLD
+                    table = array("d", (curve(_normalize_trigger(value, deadzone)) * scale for value in range(256)))
+                program.append((index, input, table))
+            compiled[context] = (low, high, left, right, tuple(program))
+
+        self._action_bits = action_bits
+        self._axis_index = axis_index
+        self._tables = compiled
+        for state in self._slot_states:
+            state.axes = array("d", bytes(16 * len(axis_index)))
+            state.bits = state.previous = 0
+        self._compiled = True
+
+    def update(self, states, connected=None):
+        """update(states[, connected]) -> list of ActionState
+Evaluates the bindings once for every slot of <states>, e.g. the
+states and connected flags of a Poller after its poll(). The
+actions of disconnected slots are released."""
+        if not self._compiled:
+            self.compile()
+        for user_index in range(len(states)):
+            state = self.__slot_state(user_index)
+            if connected is not None and not connected[user_index]:
+                state.connected = False
+                state.previous = state.bits
+                state.bits = 0
+                continue
+            state.connected = True
+            self.__evaluate(state, states[user_index].Gamepad)
+        return self._slot_states
+
+    def update_slot(self, user_index, state):
+        """update_slot(int, XINPUT_STATE) -> ActionState
+Evaluates the bindings for one slot, e.g. with a state returned by
+get_state()"""
+        if not self._compiled:
+            self.compile()
+        action_state = self.__slot_state(user_index)
+        action_state.connected = True
+        self.__evaluate(action_state, state.Gamepad)
+        return action_state
+
+    def __getitem__(self, user_index):
+        return self.__slot_state(user_index)
+
+    def __slot_state(self, user_index):
+        states = self._slot_states
+        while len(states) <= user_index:
+            state = ActionState()
+            state.user_index = len(states)
+            state.connected = False
+            state.context = self._context
+            state.bits = state.previous = 0
+            state.axes = array("d", bytes(16 * len(getattr(self, "_axis_index", ()))))
+            state._map = self
+            states.append(state)
+        return states[user_index]
+
+    def __evaluate(self, state, pad):
+        low, high, left, right, program = self._tables[state.context]
+        buttons = pad.wButtons
+        state.previous = state.bits
+        state.bits = low[buttons & 0xFF] | high[buttons >> 8] | left[pad.bLeftTrigger] | right[pad.bRightTrigger]
+
+        axes = state.axes
+        for index, input, table in program:
+            if input == STICK_LEFT or input == STICK_RIGHT:
+                if input == STICK_LEFT:
+                    X = pad.sThumbLX
+                    Y = pad.sThumbLY
+                else:
+                    X = pad.sThumbRX
+                    Y = pad.sThumbRY
+                mag = sqrt(X*X + Y*Y)
+                if mag:
+                    factor = table[int(mag) >> _STICK_BUCKET if mag < 32767 else -1] / mag   # the last entry is for the rim
+                    axes[index] = X * factor
+                    axes[index + 1] = Y * factor
+                else:
+                    axes[index] = axes[index + 1] = 0.0
+            elif input == TRIGGER_LEFT:
+                axes[index] = table[pad.bLeftTrigger]
+            elif input == TRIGGER_RIGHT:
+                axes[index] = table[pad.bRightTrigger]
+            else:
+                negative, positive, scale = table
+                axes[index] = (bool(buttons & positive) - bool(buttons & negative)) * scale
+
+def _power_curve(exponent):
+    return lambda value: value ** exponent
+
+def _curved_stick(magnitude, deadzone, curve):
+    if magnitude <= deadzone:
+        return 0.0
+    return curve((min(32767, magnitude) - deadzone) / (32767. - deadzone))
+
+class FrameSummary:
+    """What happened on one slot between two Sampler.take_frame() calls.
+<buttons> are the buttons held at the end, <pressed> and <released>
+the buttons that were pressed or released at least once (even if a
+press and its release fell between two frames), <held> the buttons
+that were down at any sample, <press_counts> the number of presses
+per button id. <peak_triggers> are the highest (LT, RT) values and
+<peak_thumbs> the ((LX, LY), (RX, RY)) positions farthest from the
+center, normalized like get_trigger_values() and get_thumb_values().
+<samples> is the number of new states that were seen."""
+    __slots__ = ("user_index", "connected", "buttons", "pressed", "released", "held", "press_counts",
+                 "peak_triggers", "peak_thumbs", "samples")
+
+    def __str__(self):
+        return str({name : getattr(self, name) for name in self.__slots__})
+
+class _SlotAccumulator:
+    __slots__ = ("pressed", "released", "held", "press_counts", "peak_lt", "peak_rt",
+                 "peak_left", "peak_left_mag", "peak_right", "peak_right_mag", "samples")
+
+    def __init__(self):
+        self.pressed = self.released = self.held = 0
+        self.press_counts = {}
+        self.peak_lt = self.peak_rt = 0
+        self.peak_left = self.peak_right = (0, 0)
+        self.peak_left_mag = self.peak_right_mag = 0
+        self.samples = 0
+
+class Sampler:
+    """Polls <source> (the XInput driver by default) in its own thread at
+<update_frequency> and accumulates what happens on every slot: button
+edges and press counts, and the peak trigger and stick values. A
+consumer at frame rate calls take_frame() to get a FrameSummary per
+slot, so presses that are released again before the next frame are
+not lost like they are between two get_events() calls."""
+    def __init__(self, source=None, update_frequency=4000, auto_start=True):
+        if update_frequency <= 0:
+            raise ValueError("Update_frequency must be greater than 0")
+        self.source = _xinput_source if source is None else source
+        self.update_frequency = update_frequency
+
+        slots = self.source.slots
+        self._states = (XINPUT_STATE * slots)()     # the last sample, only changed under the lock
+        self._scratch = (XINPUT_STATE * slots)()    # the next sample is read into this one, then they are swapped
+        self._connected = (ctypes.c_ubyte * slots)()
+        self._last_packets = [None] * slots
+        self._last_buttons = [0] * slots
+        self._accumulators = [_SlotAccumulator() for _ in range(slots)]
+        self._last_checked = 0
+        self._lock = Lock()
+        self._remaps = {}
+        self._turbo_since = {}
+
+        self.running = False
+        self._thread = None
+        if auto_start:
+            self.start()
+
+    def sample(self):
+        """Reads every slot once and accumulates the changes. The thread
+calls this <update_frequency> times per second."""
+        source = self.source
+        states = self._scratch
+        connected = self._connected
+        read_states = getattr(source, "read_states", None)
+        if read_states is not None:
+            read_states(states, connected)
+        else:
+            now = time.time()
+            rescan = self._last_checked + 1 < now    # disconnected slots are only checked once per second
+            if rescan:
+                self._last_checked = now
+            read_state = source.read_state
+            for i in range(source.slots):
+                if connected[i] or rescan:
+                    connected[i] = read_state(i, states[i]) == ERROR_SUCCESS
+
+        remaps = self._remaps
+        now = time.time()
+        self._lock.acquire()
+        try:
+            self._states, self._scratch = states, self._states
+            for i in range(source.slots):
+                if not connected[i]:
+                    self._last_packets[i] = None
+                    self._last_buttons[i] = 0
+                    continue
+                state = states[i]
+                if remaps and i in remaps:
+                    pad = state.Gamepad
+                    pad.wButtons = _remap_buttons(remaps[i], pad.wButtons, self._turbo_since, i, now)
+                    if state.dwPacketNumber == self._last_packets[i] and pad.wButtons & _BUTTON_MASK == self._last_buttons[i]:
+                        continue
+                elif state.dwPacketNumber == self._last_packets[i]:
+                    continue
+                self._last_packets[i] = state.dwPacketNumber
+                self.__accumulate(i, state.Gamepad)
+        finally:
+            self._lock.release()
+
+    def __accumulate(self, i, pad):
+        accumulator = self._accumulators[i]
+        accumulator.samples += 1
+
+        buttons = pad.wButtons & _BUTTON_MASK
+        changed = buttons ^ self._last_buttons[i]
+        if changed:
+            self._last_buttons[i] = buttons
+            pressed = changed & buttons
+            accumulator.pressed |= pressed
+            accumulator.released |= changed & ~buttons
+            counts = accumulator.press_counts
+            while pressed:  # only visit the bits that changed, lowest first
+                button = pressed & -pressed
+                pressed ^= button
+                counts[button] = counts.get(button, 0) + 1
+        accumulator.held |= buttons
+
+        if pad.bLeftTrigger > accumulator.peak_lt:
+            accumulator.peak_lt = pad.bLeftTrigger
+        if pad.bRightTrigger > accumulator.peak_rt:
+            accumulator.peak_rt = pad.bRightTrigger
+
+        LX = pad.sThumbLX
+        LY = pad.sThumbLY
+        magnitude = LX * LX + LY * LY
+        if magnitude > accumulator.peak_left_mag:
+            accumulator.peak_left_mag = magnitude
+            accumulator.peak_left = (LX, LY)
+        RX = pad.sThumbRX
+        RY = pad.sThumbRY
+        magnitude = RX * RX + RY * RY
+        if magnitude > accumulator.peak_right_mag:
+            accumulator.peak_right_mag = magnitude
+            accumulator.peak_right = (RX, RY)
+
+    def set_remap(self, user_index, remap):
+        """Remaps the buttons of <user_index> with a ButtonRemap before
+they are accumulated (None removes it), like Poller.set_remap()"""
+        self._lock.acquire()
+        if remap is None:
+            self._remaps.pop(user_index, None)
+        else:
+            self._remaps[user_index] = remap
+        self._turbo_since.pop(user_index, None)
+        self._lock.release()
+
+    @staticmethod
+    def __seed(accumulator, pad):
+        accumulator.peak_lt = pad.bLeftTrigger
+        accumulator.peak_rt = pad.bRightTrigger
+        accumulator.peak_left = (pad.sThumbLX, pad.sThumbLY)
+        accumulator.peak_left_mag = pad.sThumbLX * pad.sThumbLX + pad.sThumbLY * pad.sThumbLY
+        accumulator.peak_right = (pad.sThumbRX, pad.sThumbRY)
+        accumulator.peak_right_mag = pad.sThumbRX * pad.sThumbRX + pad.sThumbRY * pad.sThumbRY
+
+    def take_frame(self):
+        """take_frame() -> tuple of FrameSummary, one per slot
+Returns what was accumulated since the last call and starts over."""
+        self._lock.acquire()
+        accumulators = self._accumulators
+        self._accumulators = fresh = [_SlotAccumulator() for _ in accumulators]
+        last_buttons = list(self._last_buttons)
+        connected = [self._last_packets[i] is not None for i in range(len(accumulators))]
+        for i, accumulator in enumerate(fresh):   # the next frame's peaks start at the current values
+            if connected[i]:
+                self.__seed(accumulator, self._states[i].Gamepad)
+        self._lock.release()
+
+        frame = []
+        for i, accumulator in enumerate(accumulators):
+            summary = FrameSummary()
+            summary.user_index = i
+            summary.connected = connected[i]
+            summary.buttons = ButtonSet(last_buttons[i])
+            summary.pressed = ButtonSet(accumulator.pressed)
+            summary.released = ButtonSet(accumulator.released)
+            summary.held = ButtonSet(accumulator.held | last_buttons[i])
+            summary.press_counts = accumulator.press_counts
+            summary.peak_triggers = (_normalize_trigger(accumulator.peak_lt, XINPUT_GAMEPAD_TRIGGER_THRESHOLD),
+                                     _normalize_trigger(accumulator.peak_rt, XINPUT_GAMEPAD_TRIGGER_THRESHOLD))
+            left = _normalize_stick(accumulator.peak_left[0], accumulator.peak_left[1], XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+            right = _normalize_stick(accumulator.peak_right[0], accumulator.peak_right[1], XINPUT_GAMEPAD_RIGHT_THUMB_DEADZONE)
+            summary.peak_thumbs = ((left[0] * left[2], left[1] * left[2]), (right[0] * right[2], right[1] * right[2]))
+            summary.samples = accumulator.samples
+            frame.append(summary)
+        return tuple(frame)
+
+    def __tfun(self):
+        while self.running:
+            time.sleep(1 / self.update_frequency)
+            self.sample()
+
+    def start(self):
+        self.running = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self.__tfun, args=())
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+class _SharedHeader(Structure):
+    _fields_ = [("sequence", ctypes.c_uint64),
+                ("timestamp", ctypes.c_double),
+                ("slots", ctypes.c_uint32),
+                ]
+
+_shared_blocks = {}
+
+def _shared_block(slots):
+    """The layout of a shared block with <slots> slots"""
+    block = _shared_blocks.get(slots)
+    if block is None:
+        class _SharedBlock(Structure):
+            _fields_ = [("sequence", ctypes.c_uint64),
+                        ("timestamp", ctypes.c_double),
+                        ("slots", ctypes.c_uint32),
+                        ("connected", ctypes.c_ubyte * slots),
+                        ("states", XINPUT_STATE * slots),
+                        ]
+        block = _shared_blocks[slots] = _SharedBlock
+    return block
+
+_published_blocks = set()     # the blocks published by this process
+
+def _attach_shared_memory(name):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13 registers attached blocks too and removes them when
+    # the reader exits, so this one block is unregistered again (unless
+    # the registration is the publisher's own, in this process)
+    memory = shared_memory.SharedMemory(name)
+    if os.name == "posix" and memory.name not in _published_blocks:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+class SharedStatePublisher:
+    """Polls the controllers once and publishes the raw states,
+connection flags and packet numbers of all slots in a
+multiprocessing.shared_memory block, so other processes can read
+them with a SharedStateReader instead of polling the driver too.
+Writes are guarded by a sequence lock: readers never block the
+publisher and retry if they raced with a write.
+<name> is the name of the block (generated if None), <poller> the
+Poller that is used (by default a pooled one on the XInput driver)."""
+    def __init__(self, name=None, poller=None, auto_start=True, update_frequency=1000):
+        from multiprocessing import shared_memory
+
+        if update_frequency <= 0:
+            raise ValueError("Update_frequency must be greater than 0")
+
+        self.poller = Poller(pooled=True) if poller is None else poller
+        self.update_frequency = update_frequency
+
+        slots = self.poller.source.slots
+        block = _shared_block(slots)
+        self._memory = shared_memory.SharedMemory(name, create=True, size=ctypes.sizeof(block))
+        _published_blocks.add(self._memory.name)
+        self._block = block.from_buffer(self._memory.buf)
+        self._block.sequence = 0
+        self._block.slots = slots
+        self.running = False
+        self._thread = None
+
+        if auto_start:
+            self.start()
+
+    @property
+    def name(self):
+        """The name a SharedStateReader needs to attach to the block"""
+        return self._memory.name
+
+    def publish(self):
+        """Polls once and publishes the result. Returns the poll's events."""
+        events = self.poller.poll()
+        block = self._block
+        block.sequence += 1     # odd: write in progress
+        ctypes.memmove(block.connected, self.poller.connected, block.slots)
+        ctypes.memmove(block.states, self.poller.states, ctypes.sizeof(block.states))
+        block.timestamp = time.time()
+        block.sequence += 1
+        return events
+
+    def __tfun(self):
+        while self.running:
+            time.sleep(1 / self.update_frequency)
+            self.publish()
+
+    def start(self):
+        self.running = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self.__tfun, args=())
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stops publishing and removes the shared memory block"""
+        self.stop()
+        if self._memory is not None:
+            self._block = None
+            self._memory.close()
+            self._memory.unlink()
+            _published_blocks.discard(self._memory.name)
+            self._memory = None
+
+    def __del__(self):
+        if getattr(self, "_memory", None) is not None:
+            self.close()
+
+class SharedStateReader(_Source):
+    """Reads the states published by a SharedStatePublisher in another
+process (or the same one) without calling into the driver.
+It offers get_state(), get_connected() and get_events() like the
+module does, and can be used as the source of a Poller.
+The per-slot reads are consistent, a torn read is retried. If the
+block stays mid-write for <timeout> seconds (the publisher died while
+writing), the read raises TimeoutError."""
+    def __init__(self, name, timeout=0.1):
+        self.timeout = timeout
+        self._memory = _attach_shared_memory(name)
+        self.slots = _SharedHeader.from_buffer_copy(self._memory.buf).slots
+        self._block = _shared_block(self.slots).from_buffer(self._memory.buf)
+        self._state_size = ctypes.sizeof(XINPUT_STATE)
+        self._states_address = ctypes.addressof(self._block.states)
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int
+Fills <state> like XInputGetState would."""
+        if not 0 <= user_index < self.slots:
+            return ERROR_BAD_ARGUMENTS
+        block = self._block
+        deadline = None
+        while True:
+            sequence = block.sequence
+            if not sequence & 1:
+                connected = block.connected[user_index]
+                ctypes.memmove(ctypes.addressof(state), self._states_address + user_index * self._state_size, self._state_size)
+                if block.sequence == sequence:
+                    return ERROR_SUCCESS if connected else ERROR_DEVICE_NOT_CONNECTED
+            deadline = self.__retry(deadline)
+
+    def read_all(self, states, connected):
+        """Copies the states and connection flags of all slots, as of
+one single publish, into the ctypes arrays <states> (of XINPUT_STATE)
+and <connected> (of bytes), one entry per slot. Returns the publish
+timestamp."""
+        block = self._block
+        deadline = None
+        while True:
+            sequence = block.sequence
+            if not sequence & 1:
+                ctypes.memmove(connected, block.connected, self.slots)
+                ctypes.memmove(states, block.states, ctypes.sizeof(block.states))
+                timestamp = block.timestamp
+                if block.sequence == sequence:
+                    return timestamp
+            deadline = self.__retry(deadline)
+
+    def __retry(self, deadline):
+        """Called before retrying a read that raced with a write. Returns
+the deadline to pass to the next call."""
+        now = time.perf_counter()
+        if deadline is None:
+            deadline = now + self.timeout
+        elif now > deadline:
+            raise TimeoutError("The shared state block stayed mid-write for {} seconds".format(self.timeout))
+        time.sleep(0)   # lets a publisher thread of this process finish its write
+        return deadline
+
+    read_states = read_all
+
+    @property
+    def sequence(self):
+        """Increases by 2 with every publish"""
+        return self._block.sequence
+
+    def get_connected(self):
+        """get_connected() -> tuple of bool, one per slot"""
+        return tuple(bool(flag) for flag in self._block.connected)
+
+    def close(self):
+        if self._memory is not None:
+            self._block = None
+            self._memory.close()
+            self._memory = None
+
+    def __del__(self):
+        if getattr(self, "_memory", None) is not None:
+            self.close()
+
+# binary event encoding: every frame is a little-endian uint32 length
+# followed by that many bytes of events. An event is its type and
+# user_index followed by a payload that depends on the type
+_FRAME_HEADER = struct.Struct("<I")
+_EVENT_HEADER = struct.Struct("<BH")
+_BUTTON_PAYLOAD = struct.Struct("<H")                # button_id
+_TRIGGER_PAYLOAD = struct.Struct("<Bf")              # trigger, value
+_STICK_PAYLOAD = struct.Struct("<Bfffff")            # stick, x, y, value, dir
+_GESTURE_PAYLOAD = struct.Struct("<BBffbf")          # gesture, stick, dir, clockwise (-1 for None), duration
+_COMBO_PAYLOAD = struct.Struct("<fBB")               # duration, button count, name length; buttons, name follow
+
+def _encode_event(event):
+    type_ = event.type
+    data = _EVENT_HEADER.pack(type_, event.user_index)
+    if type_ == EVENT_BUTTON_PRESSED or type_ == EVENT_BUTTON_RELEASED:
+        return data + _BUTTON_PAYLOAD.pack(event.button_id)
+    if type_ == EVENT_TRIGGER_MOVED:
+        return data + _TRIGGER_PAYLOAD.pack(event.trigger, event.value)
+    if type_ == EVENT_STICK_MOVED:
+        return data + _STICK_PAYLOAD.pack(event.stick, event.x, event.y, event.value, event.dir[0], event.dir[1])
+    if type_ == EVENT_GESTURE:
+        clockwise = -1 if event.clockwise is None else int(event.clockwise)
+        return data + _GESTURE_PAYLOAD.pack(event.gesture, event.stick, event.dir[0], event.dir[1], clockwise, event.duration)
+    if type_ == EVENT_COMBO:
+        name = str(event.combo).encode("utf-8")[:255]
+        return (data + _COMBO_PAYLOAD.pack(event.duration, len(event.buttons), len(name)) +
+                struct.pack("<{}H".format(len(event.buttons)), *event.buttons) + name)
+    return data
+
+def _decode_events(data):
+    """Decodes the body of one frame into a list of events"""
+    events = []
+    offset = 0
+    end = len(data)
+    while offset < end:
+        type_, user_index = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        event = Event(user_index, type_)
+        if type_ == EVENT_BUTTON_PRESSED or type_ == EVENT_BUTTON_RELEASED:
+            event.button_id, = _BUTTON_PAYLOAD.unpack_from(data, offset)
+            event.button = _button_dict.get(event.button_id)
+            offset += _BUTTON_PAYLOAD.size
+        elif type_ == EVENT_TRIGGER_MOVED:
+            event.trigger, event.value = _TRIGGER_PAYLOAD.unpack_from(data, offset)
+            offset += _TRIGGER_PAYLOAD.size
+        elif type_ == EVENT_STICK_MOVED:
+            event.stick, event.x, event.y, event.value, dirX, dirY = _STICK_PAYLOAD.unpack_from(data, offset)
+            event.dir = (dirX, dirY)
+            offset += _STICK_PAYLOAD.size
+        elif type_ == EVENT_GESTURE:
+            event.gesture, event.stick, dirX, dirY, clockwise, event.duration = _GESTURE_PAYLOAD.unpack_from(data, offset)
+            event.dir = (dirX, dirY)
+            event.clockwise = None if clockwise < 0 else bool(clockwise)
+            offset += _GESTURE_PAYLOAD.size
+        elif type_ == EVENT_COMBO:
+            event.duration, count, length = _COMBO_PAYLOAD.unpack_from(data, offset)
+            offset += _COMBO_PAYLOAD.size
+            event.buttons = struct.unpack_from("<{}H".format(count), data, offset)
+            offset += 2 * count
+            event.combo = bytes(data[offset:offset + length]).decode("utf-8")
+            offset += length
+        events.append(event)
+    return events
+
+def _create_socket(address, server):
+    """<address> is a path (Unix domain socket) or a (host, port) tuple (TCP)"""
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if server:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+class _BroadcastHandler(EventHandler):
+    def __init__(self, server, slots):
+        super().__init__(*range(max(slots, 1)))
+        self.server = server
+
+    def process_button_event(self, event):
+        self.server._queue(event)
+
+    process_stick_event = process_trigger_event = process_connection_event = \
+        process_combo_event = process_gesture_event = process_button_event
+
+class EventServer:
+    """Runs a GamepadThread and streams its events, binary encoded,
+to any number of EventClients over a Unix domain socket (<address>
+is a path) or TCP (<address> is a (host, port) tuple).
+Every client has a send buffer of at most <max_buffer> bytes. A
+client that falls further behind is disconnected, so a slow client
+never holds up the polling or the other clients.
+The sockets are served by a separate thread, the GamepadThread only
+encodes the events."""
+    def __init__(self, address, poller=None, recognizers=(), update_frequency=1000, max_buffer=1 << 16, auto_start=True):
+        self.address = address
+        self.max_buffer = max_buffer
+        self.clients = {}
+        self.evicted = 0
+
+        self._pending = []
+        self._pending_lock = Lock()
+        self._waker, self._wakeup = socket.socketpair()
+        self._waker.setblocking(False)
+        self._wakeup.setblocking(False)
+
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self._listener = _create_socket(address, True)
+        self._listener.bind(address)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        if not isinstance(address, str):
+            self.address = self._listener.getsockname()[:2]
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+
+        slots = getattr(getattr(poller, "source", _xinput_source), "slots", 4)
+        self.thread = GamepadThread(_BroadcastHandler(self, slots), auto_start=False, update_frequency=update_frequency,
+                                    recognizers=recognizers, poller=poller)
+        self.running = False
+        self._network_thread = None
+
+        if auto_start:
+            self.start()
+
+    def _queue(self, event):    # called by the GamepadThread
+        data = _encode_event(event)
+        self._pending_lock.acquire()
+        wake = not self._pending
+        self._pending.append(data)
+        self._pending_lock.release()
+        if wake:
+            try:
+                self._waker.send(b"\0")
+            except (BlockingIOError, OSError):
+                pass
+
+    def __serve(self):
+        selector = self._selector
+        while self.running:
+            for key, mask in selector.select(0.1):
+                sock = key.fileobj
+                if sock is self._listener:
+                    self.__accept()
+                elif sock is self._wakeup:
+                    try:
+                        while sock.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                elif mask & selectors.EVENT_READ:
+                    try:
+                        if not sock.recv(4096):     # clients don't send anything, this is EOF
+                            self.__drop(sock)
+                            continue
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                    except OSError:
+                        self.__drop(sock)
+                        continue
+                if mask & selectors.EVENT_WRITE and sock in self.clients:
+                    self.__send(sock)
+            self.__broadcast()
+
+    def __accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        self.clients[sock] = bytearray()
+        self._selector.register(sock, selectors.EVENT_READ)
+
+    def __broadcast(self):
+        self._pending_lock.acquire()
+        pending = self._pending
+        self._pending = []
+        self._pending_lock.release()
+        if not pending:
+            return
+        body = b"".join(pending)
+        frame = _FRAME_HEADER.pack(len(body)) + body
+        for sock, buffer in list(self.clients.items()):
+            if buffer and len(buffer) + len(frame) > self.max_buffer:
+                self.evicted += 1
+                self.__drop(sock)
+                continue
+            was_empty = not buffer
+            buffer += frame
+            if was_empty:
+                self.__send(sock)
+
+    def __send(self, sock):
+        buffer = self.clients[sock]
+        try:
+            sent = sock.send(buffer)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.__drop(sock)
+            return
+        del buffer[:sent]
+        self._selector.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE if buffer else selectors.EVENT_READ)
+
+    def __drop(self, sock):
+        self.clients.pop(sock, None)
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+    def start(self):
+        self.running = True
+        if self._network_thread is None:
+            self._network_thread = Thread(target=self.__serve, args=())
+            self._network_thread.daemon = True
+            self._network_thread.start()
+        self.thread.start()
+
+    def stop(self):
+        """Stops polling and disconnects all clients"""
+        if self.thread.running:
+            self.thread.stop()
+        self.running = False
+        if self._network_thread is not None:
+            self._network_thread.join()
+            self._network_thread = None
+        for sock in list(self.clients):
+            self.__drop(sock)
+        self._selector.close()
+        self._listener.close()
+        self._waker.close()
+        self._wakeup.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+class EventClient:
+    """Receives the events of an EventServer. It can be used like a
+Poller, e.g. to run the local handlers:
+    GamepadThread(handler, poller=EventClient("/tmp/xinput.sock"))
+or with get_events() in a game loop."""
+    def __init__(self, address):
+        self._socket = _create_socket(address, False)
+        self._socket.connect(address)
+        self._socket.setblocking(False)
+        self._buffer = bytearray()
+        self.connected = True
+
+    def fileno(self):
+        return self._socket.fileno()
+
+    def poll(self):
+        """poll() -> list of Event
+Returns the events that were received since the last call,
+without blocking."""
+        buffer = self._buffer
+        while self.connected:
+            try:
+                data = self._socket.recv(1 << 16)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.connected = False
+                break
+            buffer += data
+
+        events = []
+        offset = 0
+        while len(buffer) - offset >= _FRAME_HEADER.size:
+            length, = _FRAME_HEADER.unpack_from(buffer, offset)
+            if len(buffer) - offset - _FRAME_HEADER.size < length:
+                break
+            start = offset + _FRAME_HEADER.size
+            events += _decode_events(memoryview(buffer)[start:start + length])
+            offset = start + length
+        if offset:
+            del buffer[:offset]
+        return events
+
+    def get_events(self):
+        """get_events() -> generator
+Like XInput.get_events(), for the received events"""
+        for event in self.poll():
+            yield event
+
+    def close(self):
+        self.connected = False
+        self._socket.close()
+
+# remote states: a datagram holds any number of records, each the slot,
+# a sequence number and a mask of the fields that follow. A record with
+# all the field bits set is a full state, one without any a heartbeat
+_REMOTE_RECORD = struct.Struct("<HIB")
+_REMOTE_FIELDS = (("wButtons", "H"), ("bLeftTrigger", "B"), ("bRightTrigger", "B"),
+                  ("sThumbLX", "h"), ("sThumbLY", "h"), ("sThumbRX", "h"), ("sThumbRY", "h"))
+_REMOTE_FULL = 0x7F
+_REMOTE_DISCONNECT = 0x80
+_REMOTE_PAYLOADS = [(struct.Struct("<" + "".join(code for bit, (name, code) in enumerate(_REMOTE_FIELDS) if mask & (1 << bit))),
+                     tuple(name for bit, (name, code) in enumerate(_REMOTE_FIELDS) if mask & (1 << bit)))
+                    for mask in range(_REMOTE_FULL + 1)]
+
+def _sequence_newer(sequence, last):
+    return 0 < (sequence - last) & 0xFFFFFFFF < 0x80000000
+
+class RemoteSource(_Source):
+    """Presents controller states received over UDP, e.g. from thin
+clients, as <slots> controller slots. Use it as the source of a
+Poller, or through get_state(), get_connected() and get_events().
+The states are delta encoded (see RemoteSender). Records are ordered
+by their sequence numbers and stale ones are dropped, the applied
+sequence number becomes the dwPacketNumber of the slot.
+A slot that doesn't receive anything for <timeout> seconds counts
+as disconnected. <received> counts the records, <dropped> the stale
+records and the truncated or malformed datagrams, which are ignored
+as a whole.
+All pending datagrams are received and decoded in one batch, by a
+thread if <auto_start> is True, or whenever receive() is called."""
+    def __init__(self, address=("127.0.0.1", 0), slots=4, timeout=1.0, auto_start=True):
+        self.slots = slots
+        self.timeout = timeout
+        self.received = 0
+        self.dropped = 0
+
+        self._states = (XINPUT_STATE * slots)()
+        self._connected = (ctypes.c_ubyte * slots)()
+        self._sequences = [None] * slots
+        self._last_seen = [0.0] * slots
+        self._state_size = ctypes.sizeof(XINPUT_STATE)
+        self._states_address = ctypes.addressof(self._states)
+        self._lock = Lock()
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(address)
+        self._socket.setblocking(False)
+        self.address = self._socket.getsockname()[:2]
+        self._buffer = bytearray(1 << 16)
+
+        self.running = False
+        self._thread = None
+        if auto_start:
+            self.start()
+
+    def receive(self):
+        """Receives and applies everything that's pending, without
+blocking. Returns the number of datagrams."""
+        datagrams = []
+        buffer = self._buffer
+        recv_into = self._socket.recv_into
+        while True:
+            try:
+                size = recv_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            datagrams.append(bytes(buffer[:size]))
+        self.feed(*datagrams)
+        return len(datagrams)
+
+    def feed(self, *datagrams):
+        """Applies <datagrams> as if they were received, in one batch"""
+        records = [[] for _ in range(self.slots)]
+        touched = []
+        malformed = 0
+        header_size = _REMOTE_RECORD.size
+        for data in datagrams:
+            decoded = []
+            offset = 0
+            end = len(data)
+            while offset < end:
+                if offset + header_size > end:
+                    break
+                slot, sequence, mask = _REMOTE_RECORD.unpack_from(data, offset)
+                offset += header_size
+                payload, names = _REMOTE_PAYLOADS[mask & _REMOTE_FULL]
+                if offset + payload.size > end:
+                    break
+                decoded.append((slot, (sequence, mask, names, payload.unpack_from(data, offset))))
+                offset += payload.size
+            else:
+                for slot, record in decoded:
+                    if slot < self.slots:
+                        if not records[slot]:
+                            touched.append(slot)
+                        records[slot].append(record)
+                continue
+            malformed += 1
+
+        now = time.perf_counter()
+        self._lock.acquire()
+        try:
+            self.dropped += malformed
+            for slot in touched:
+                self.__apply(slot, records[slot], now)
+            self.__expire(now)
+        finally:
+            self._lock.release()
+
+    def __apply(self, slot, records, now):
+        last = self._sequences[slot]
+        if len(records) > 1:
+            base = records[0][0] if last is None else last
+            records.sort(key=lambda record: (record[0] - base) & 0xFFFFFFFF)
+        gamepad = self._states[slot].Gamepad
+        applied = None
+        for sequence, mask, names, values in records:
+            self.received += 1
+            if last is not None and not _sequence_newer(sequence, last):
+                self.dropped += 1
+                continue
+            last = sequence
+            if mask & _REMOTE_DISCONNECT:
+                self._connected[slot] = 0
+                ctypes.memset(ctypes.addressof(self._states[slot]), 0, self._state_size)
+                applied = None
+                continue
+            self._connected[slot] = 1
+            for name, value in zip(names, values):
+                setattr(gamepad, name, value)
+            if names:
+                applied = sequence
+        if applied is not None:
+            self._states[slot].dwPacketNumber = applied
+        self._sequences[slot] = last
+        self._last_seen[slot] = now
+
+    def __expire(self, now):
+        connected = self._connected
+        last_seen = self._last_seen
+        limit = now - self.timeout
+        for slot in range(self.slots):
+            if connected[slot] and last_seen[slot] < limit:
+                connected[slot] = 0
+                self._sequences[slot] = None    # a restarted sender starts over
+                ctypes.memset(ctypes.addressof(self._states[slot]), 0, self._state_size)
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int
+Fills <state> like XInputGetState would."""
+        if not 0 <= user_index < self.slots:
+            return ERROR_BAD_ARGUMENTS
+        if not self._connected[user_index]:
+            return ERROR_DEVICE_NOT_CONNECTED
+        self._lock.acquire()
+        ctypes.memmove(ctypes.addressof(state), self._states_address + user_index * self._state_size, self._state_size)
+        self._lock.release()
+        return ERROR_SUCCESS
+
+    def read_states(self, states, connected):
+        """Copies all states and connection flags into the ctypes arrays
+<states> and <connected>. Disconnected slots are zeroed."""
+        self._lock.acquire()
+        ctypes.memmove(states, self._states, ctypes.sizeof(self._states))
+        ctypes.memmove(connected, self._connected, self.slots)
+        self._lock.release()
+
+    def get_connected(self):
+        """get_connected() -> tuple of bool, one per slot"""
+        return tuple(bool(flag) for flag in self._connected)
+
+    def __tfun(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._socket, selectors.EVENT_READ)
+        try:
+            while self.running:
+                selector.select(0.1)
+                self.receive()
+        finally:
+            selector.close()
+
+    def start(self):
+        self.running = True
+        if self._thread is None:
+            self._thread = Thread(target=self.__tfun, args=())
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._socket.close()
+
+class RemoteSender:
+    """Sends controller states to a RemoteSource at <address>.
+update() queues the changes of one slot since its last update,
+flush() sends everything queued, batched into as few datagrams as
+possible. Every <keyframe_interval>th update of a slot carries its
+full state, so a lost datagram is corrected eventually."""
+    def __init__(self, address, keyframe_interval=30, max_datagram=1200):
+        self.address = address
+        self.keyframe_interval = keyframe_interval
+        self.max_datagram = max_datagram
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._pending = bytearray()
+        self._last = {}         # slot -> [sequence, updates since the last keyframe, field values]
+
+    def update(self, user_index, state):
+        """Queues the state (an XINPUT_STATE or XINPUT_GAMEPAD) of a slot"""
+        gamepad = getattr(state, "Gamepad", state)
+        values = tuple(getattr(gamepad, name) for name, code in _REMOTE_FIELDS)
+        last = self._last.get(user_index)
+        if last is None:
+            last = self._last[user_index] = [0, 0, None]
+        last[0] = (last[0] + 1) & 0xFFFFFFFF
+        if last[2] is None or last[1] >= self.keyframe_interval:
+            mask = _REMOTE_FULL
+            last[1] = 0
+        else:
+            mask = 0
+            for bit, (value, previous) in enumerate(zip(values, last[2])):
+                if value != previous:
+                    mask |= 1 << bit
+            last[1] += 1
+        last[2] = values
+        payload, names = _REMOTE_PAYLOADS[mask]
+        self.__queue(_REMOTE_RECORD.pack(user_index, last[0], mask) +
+                     payload.pack(*[value for bit, value in enumerate(values) if mask & (1 << bit)]))
+
+    def disconnect(self, user_index):
+        """Queues the disconnection of a slot"""
+        last = self._last.get(user_index)
+        if last is None:
+            last = self._last[user_index] = [0, 0, None]
+        last[0] = (last[0] + 1) & 0xFFFFFFFF
+        last[2] = None          # the next update is a full state
+        self.__queue(_REMOTE_RECORD.pack(user_index, last[0], _REMOTE_DISCONNECT))
+
+    def __queue(self, record):
+        if len(self._pending) + len(record) > self.max_datagram:
+            self.flush()
+        self._pending += record
+
+    def flush(self):
+        if self._pending:
+            self._socket.sendto(self._pending, self.address)
+            del self._pending[:]
+
+    def send(self, user_index, state):
+        """update() and flush()"""
+        self.update(user_index, state)
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self._socket.close()
+
+# Linux evdev: struct input_event is a timeval followed by type, code and value
+_INPUT_EVENT = struct.Struct("@llHHi")
+_EV_SYN = 0x00
+_EV_KEY = 0x01
+_EV_ABS = 0x03
+_SYN_REPORT = 0
+_SYN_DROPPED = 3
+
+_evdev_buttons = {0x130 : BUTTON_A,                 # BTN_SOUTH
+                  0x131 : BUTTON_B,                 # BTN_EAST
+                  0x133 : BUTTON_X,                 # BTN_X
+                  0x134 : BUTTON_Y,                 # BTN_Y
+                  0x136 : BUTTON_LEFT_SHOULDER,     # BTN_TL
+                  0x137 : BUTTON_RIGHT_SHOULDER,    # BTN_TR
+                  0x13a : BUTTON_BACK,              # BTN_SELECT
+                  0x13b : BUTTON_START,             # BTN_START
+                  0x13d : BUTTON_LEFT_THUMB,        # BTN_THUMBL
+                  0x13e : BUTTON_RIGHT_THUMB,       # BTN_THUMBR
+                  0x220 : BUTTON_DPAD_UP,           # BTN_DPAD_UP
+                  0x221 : BUTTON_DPAD_DOWN,
+                  0x222 : BUTTON_DPAD_LEFT,
+                  0x223 : BUTTON_DPAD_RIGHT,
+                  }
+
+# axis code -> (field, default range); the Y axes point down in evdev
+_evdev_axes = {0x00 : ("sThumbLX", -32768, 32767),         # ABS_X
+               0x01 : ("sThumbLY", -32768, 32767),         # ABS_Y
+               0x03 : ("sThumbRX", -32768, 32767),         # ABS_RX
+               0x04 : ("sThumbRY", -32768, 32767),         # ABS_RY
+               0x02 : ("bLeftTrigger", 0, 255),            # ABS_Z
+               0x05 : ("bRightTrigger", 0, 255),           # ABS_RZ
+               0x10 : ("hat_x", -1, 1),                    # ABS_HAT0X
+               0x11 : ("hat_y", -1, 1),                    # ABS_HAT0Y
+               }
+
+def _evdev_range(fd, code, default):
+    """The (minimum, maximum) of an axis, asked from the device with
+EVIOCGABS. Anything that isn't an evdev device gets <default>."""
+    try:
+        import fcntl
+        info = (ctypes.c_int32 * 6)()  # value, minimum, maximum, fuzz, flat, resolution
+        fcntl.ioctl(fd, (2 << 30) | (ctypes.sizeof(info) << 16) | (ord("E") << 8) | (0x40 + code), info)
+    except (ImportError, OSError):
+        return default
+    return (info[1], info[2]) if info[1] < info[2] else default
+
+class EvdevSource(_Source):
+    """Reads Linux evdev devices (e.g. /dev/input/event3 of a pad using
+the xpad driver), one slot per device. <devices> are paths or open
+file descriptors.
+The input_event records are read in bulk, with one os.read() of up
+to <batch> records, and mapped onto XINPUT_GAMEPAD: the face,
+shoulder, thumb, start and back buttons, the D-pad (as buttons or as
+hat), the sticks and the triggers, scaled to the XInput ranges.
+Every SYN_REPORT that changed something is one new state with a new
+dwPacketNumber. Pending records are read whenever states are read,
+and wait() blocks until one of the devices has some, so a
+GamepadThread on this source only wakes up for input.
+A device that is unplugged counts as disconnected."""
+    def __init__(self, *devices, batch=64):
+        self.slots = len(devices)
+        self.batch = batch
+        self._fds = []
+        self._owned = []
+        self._axes = []
+        for device in devices:
+            if isinstance(device, int):
+                fd = device
+                os.set_blocking(fd, False)
+            else:
+                fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+            self._fds.append(fd)
+            self._owned.append(not isinstance(device, int))
+            axes = {}
+            for code, (field, low, high) in _evdev_axes.items():
+                low, high = _evdev_range(fd, code, (low, high))
+                axes[code] = (field, low, high - low)
+            self._axes.append(axes)
+
+        self._states = (XINPUT_STATE * self.slots)()
+        self._pending = (XINPUT_GAMEPAD * self.slots)()
+        self._dirty = [False] * self.slots
+        self._dropping = [False] * self.slots
+        self._partial = [b""] * self.slots
+        self._connected = (ctypes.c_ubyte * self.slots)(*[1] * self.slots)
+        self._state_size = ctypes.sizeof(XINPUT_STATE)
+        self._states_address = ctypes.addressof(self._states)
+        self._lock = Lock()
+
+        self._selector = selectors.DefaultSelector()
+        for slot, fd in enumerate(self._fds):
+            self._selector.register(fd, selectors.EVENT_READ, slot)
+
+    def wait(self, timeout=None):
+        """Blocks until a device has something to read or <timeout>
+seconds passed. Returns True if there is something."""
+        if not self.slots:
+            time.sleep(timeout or 0)
+            return False
+        return bool(self._selector.select(timeout))
+
+    def receive(self):
+        """Reads and applies everything that's pending, without blocking"""
+        self._lock.acquire()
+        try:
+            for slot in range(self.slots):
+                if self._connected[slot]:
+                    while self.__read(slot):
+                        pass
+        finally:
+            self._lock.release()
+
+    def __read(self, slot):     # returns True if there may be more to read
+        size = _INPUT_EVENT.size
+        wanted = size * self.batch
+        try:
+            data = os.read(self._fds[slot], wanted)
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:         # ENODEV: unplugged
+            data = b""
+        if not data:
+            self.__disconnect(slot)
+            return False
+        more = len(data) == wanted
+        if self._partial[slot]:
+            data = self._partial[slot] + data
+        usable = len(data) - len(data) % size
+        self._partial[slot] = data[usable:]
+        self.__apply(slot, _INPUT_EVENT.iter_unpack(memoryview(data)[:usable]))
+        return more
+
+    def __apply(self, slot, records):
+        pad = self._pending[slot]
+        axes = self._axes[slot]
+        dirty = self._dirty[slot]
+        dropping = self._dropping[slot]
+        for sec, usec, type_, code, value in records:
+            if type_ == _EV_SYN:
+                if code == _SYN_REPORT:
+                    if dropping:
+                        dropping = False    # a fresh frame follows
+                    elif dirty:
+                        state = self._states[slot]
+                        state.Gamepad = pad
+                        state.dwPacketNumber += 1
+                        dirty = False
+                elif code == _SYN_DROPPED:
+                    dropping = True
+            elif dropping:
+                continue
+            elif type_ == _EV_KEY:
+                button = _evdev_buttons.get(code)
+                if button is not None:
+                    pad.wButtons = pad.wButtons | button if value else pad.wButtons & ~button
+                    dirty = True
+            elif type_ == _EV_ABS:
+                axis = axes.get(code)
+                if axis is None:
+                    continue
+                field, low, span = axis
+                if field == "hat_x" or field == "hat_y":
+                    negative, positive = (BUTTON_DPAD_LEFT, BUTTON_DPAD_RIGHT) if field == "hat_x" else (BUTTON_DPAD_UP, BUTTON_DPAD_DOWN)
+                    buttons = pad.wButtons & ~(negative | positive)
+                    if value < 0:
+                        buttons |= negative
+                    elif value > 0:
+                        buttons |= positive
+                    pad.wButtons = buttons
+                elif field[0] == "b":
+                    setattr(pad, field, max(0, min(255, (value - low) * 255 // span)))
+                else:
+                    value = (value - low) * 65535 // span - 32768
+                    if field[-1] == "Y":
+                        value = -1 - value
+                    setattr(pad, field, max(-32768, min(32767, value)))
+                dirty = True
+        self._dirty[slot] = dirty
+        self._dropping[slot] = dropping
+
+    def __disconnect(self, slot):
+        self._connected[slot] = 0
+        ctypes.memset(ctypes.addressof(self._states[slot]), 0, self._state_size)
+        try:
+            self._selector.unregister(self._fds[slot])
+        except (KeyError, ValueError):
+            pass
+
+    def read_state(self, user_index, state):
+        """read_state(int, XINPUT_STATE) -> int
+Fills <state> like XInputGetState would."""
+        if not 0 <= user_index < self.slots:
+            return ERROR_BAD_ARGUMENTS
+        self.receive()
+        if not self._connected[user_index]:
+            return ERROR_DEVICE_NOT_CONNECTED
+        self._lock.acquire()
+        ctypes.memmove(ctypes.addressof(state), self._states_address + user_index * self._state_size, self._state_size)
+        self._lock.release()
+        return ERROR_SUCCESS
+
+    def read_states(self, states, connected):
+        """Copies all states and connection flags into the ctypes arrays
+<states> and <connected>. Disconnected slots are zeroed."""
+        self.receive()
+        self._lock.acquire()
+        ctypes.memmove(states, self._states, ctypes.sizeof(self._states))
+        ctypes.memmove(connected, self._connected, self.slots)
+        self._lock.release()
+
+    def get_connected(self):
+        """get_connected() -> tuple of bool, one per slot"""
+        self.receive()
+        return tuple(bool(flag) for flag in self._connected)
+
+    def close(self):
+        """Closes the devices that were opened by path"""
+        self._selector.close()
+        for fd, owned in zip(self._fds, self._owned):
+            if owned:
+                os.close(fd)
+        self._owned = [False] * self.slots
 #/defining custom classes and methods #
-    
+
+def _main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m XInput")
+    commands = parser.add_subparsers(dest="command")
+    serve = commands.add_parser("serve", help="stream the controller events to EventClients")
+    serve.add_argument("--unix", metavar="PATH", help="listen on this Unix domain socket")
+    serve.add_argument("--tcp", metavar="HOST:PORT", default="127.0.0.1:7567", help="listen on this TCP address (default %(default)s)")
+    serve.add_argument("--frequency", type=float, default=1000, help="polling frequency in Hz (default %(default)s)")
+    serve.add_argument("--max-buffer", type=int, default=1 << 16, help="bytes a client may fall behind before it's dropped (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command != "serve":
+        parser.print_help()
+        return 2
+
+    if args.unix:
+        address = args.unix
+    else:
+        host, _, port = args.tcp.rpartition(":")
+        address = (host or "127.0.0.1", int(port))
+
+    server = EventServer(address, update_frequency=args.frequency, max_buffer=args.max_buffer)
+    print("Serving XInput events on {}".format(server.address))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(_main())
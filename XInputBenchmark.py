@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark suite for the polling and dispatch hot paths.
+
+Runs on any platform against a simulated XInput DLL, so no controller
+(and no Windows) is required. Results are written as JSON and compared
+against the per-case limits in benchmark_thresholds.json.
+
+    python XInputBenchmark.py [--output FILE] [--thresholds FILE]
+                              [--filter SUBSTRING] [--quick]
+                              [--update-thresholds]
+
+The exit status is 1 if any case exceeds its threshold.
+"""
+
+import ctypes, ctypes.util
+
+import argparse, json, os, platform, sys, time
+
+ERROR_SUCCESS               = 0
+ERROR_DEVICE_NOT_CONNECTED  = 1167
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_OUTPUT = os.path.join(HERE, "benchmark_results.json")
+DEFAULT_THRESHOLDS = os.path.join(HERE, "benchmark_thresholds.json")
+
+THRESHOLD_HEADROOM = 3.0    # used by --update-thresholds
+
+# simulated input source #
+class SimulatedXInputDLL:
+    """Stands in for the XInput DLL.
+Each slot holds plain Python values that are copied into the
+XINPUT_STATE passed to XInputGetState, like the driver would."""
+    def __init__(self):
+        self.connected = [True, True, True, True]
+        # packet, buttons, LT, RT, LX, LY, RX, RY
+        self.values = [[0, 0, 0, 0, 0, 0, 0, 0] for _ in range(4)]
+
+        connected = self.connected
+        values = self.values
+
+        def XInputGetState(index, pstate):
+            if not connected[index]:
+                return ERROR_DEVICE_NOT_CONNECTED
+            state = pstate._obj
+            packet, buttons, lt, rt, lx, ly, rx, ry = values[index]
+            state.dwPacketNumber = packet
+            gamepad = state.Gamepad
+            gamepad.wButtons = buttons
+            gamepad.bLeftTrigger = lt
+            gamepad.bRightTrigger = rt
+            gamepad.sThumbLX = lx
+            gamepad.sThumbLY = ly
+            gamepad.sThumbRX = rx
+            gamepad.sThumbRY = ry
+            return ERROR_SUCCESS
+
+        def XInputSetState(index, pvibration):
+            return ERROR_SUCCESS if connected[index] else ERROR_DEVICE_NOT_CONNECTED
+
+        def XInputGetBatteryInformation(index, dev_type, pinformation):
+            pinformation._obj.BatteryType = 0x01
+            pinformation._obj.BatteryLevel = 0x03
+            return ERROR_SUCCESS
+
+        self.XInputGetState = XInputGetState
+        self.XInputSetState = XInputSetState
+        self.XInputGetBatteryInformation = XInputGetBatteryInformation
+
+    def set(self, index, buttons=0, lt=0, rt=0, lx=0, ly=0, rx=0, ry=0):
+        values = self.values[index]
+        values[0] += 1
+        values[1:] = [buttons, lt, rt, lx, ly, rx, ry]
+
+def load_simulated_xinput():
+    """Imports XInput with the simulated DLL in place of the real one."""
+    dll = SimulatedXInputDLL()
+    find_library, WinDLL = ctypes.util.find_library, getattr(ctypes, "WinDLL", None)
+    ctypes.util.find_library = lambda name: name
+    ctypes.WinDLL = lambda name: dll
+    try:
+        sys.modules.pop("XInput", None)
+        import XInput
+    finally:
+        ctypes.util.find_library = find_library
+        if WinDLL is None:
+            del ctypes.WinDLL
+        else:
+            ctypes.WinDLL = WinDLL
+    return XInput, dll
+#/simulated input source #
+
+# timing helpers #
+def measure(func, number, repeat=5):
+    """Returns the best time per call of <func> in microseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / number * 1e6
+
+def _allocations(func, number):
+    import gc, tracemalloc
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        count = gc.get_count()[0]
+        size = tracemalloc.get_traced_memory()[0]
+        for _ in range(number):
+            func()
+        size = tracemalloc.get_traced_memory()[0] - size
+        count = gc.get_count()[0] - count
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    return size, count
+
+def net_allocations(func, number, warmup=1000):
+    """Returns the whole bytes and GC-tracked objects each call of <func>
+leaves allocated. The difference between <number> and 2 * <number>
+calls is used, so one-off effects of the measurement (interpreter
+caches and free lists filling up) cancel out or round away."""
+    number = max(number, 2000)
+    for _ in range(warmup):
+        func()
+    single = _allocations(func, number)
+    double = _allocations(func, 2 * number)
+    return (double[0] - single[0]) // number, (double[1] - single[1]) // number
+#/timing helpers #
+
+# benchmark cases #
+CASES = []
+
+def case(name, unit="us", **params):
+    """Registers a benchmark. Cases measured in microseconds per
+operation get their thresholds from --update-thresholds, other
+units (e.g. allocation counts) have fixed limits."""
+    def decorator(func):
+        CASES.append((name, unit, params, func))
+        return func
+    return decorator
+
+def _change_pattern(dll, change_rate, tick):
+    """Changes every field of a slot on <change_rate> of the ticks."""
+    period = int(round(1 / change_rate)) if change_rate else 0
+    for i in range(4):
+        if period and (tick + i) % period == 0:
+            flip = tick & 1
+            dll.set(i, buttons=0x5555 if flip else 0xA0AA,
+                    lt=200 if flip else 40, rt=40 if flip else 200,
+                    lx=20000 if flip else -20000, ly=-15000 if flip else 15000,
+                    rx=-30000 if flip else 30000, ry=9000 if flip else -9000)
+
+for _rate in (0.0, 0.1, 0.5, 1.0):
+    def _bench_get_events(XInput, dll, number, change_rate=_rate):
+        for i in range(4):
+            dll.set(i)
+        XInput._default_poller.reset()
+        list(XInput.get_events())   # connects all four slots
+        tick = [0]
+        def run():
+            tick[0] += 1
+            _change_pattern(dll, change_rate, tick[0])
+            for event in XInput.get_events():
+                pass
+        overhead = measure(lambda: _change_pattern(dll, change_rate, 1), number)
+        return measure(run, number) - overhead
+    case("get_events", change_rate=_rate)(_bench_get_events)
+
+def _pooled_thread(XInput, dll):
+    """A GamepadThread (not started) on a pooled Poller with all slots connected and idle."""
+    class IdleHandler(XInput.EventHandler):
+        def process_button_event(self, event): pass
+        def process_stick_event(self, event): pass
+        def process_trigger_event(self, event): pass
+        def process_connection_event(self, event): pass
+    for i in range(4):
+        dll.set(i, lx=1000, ly=-1000)
+    poller = XInput.Poller(pooled=True)
+    thread = XInput.GamepadThread(IdleHandler(0, 1, 2, 3), auto_start=False, poller=poller)
+    return thread, poller
+
+@case("pooled_poller_idle_tick")
+def _bench_pooled_idle(XInput, dll, number):
+    thread, poller = _pooled_thread(XInput, dll)
+    return measure(lambda: thread._dispatch_events(poller.poll()), number)
+
+@case("pooled_poller_idle_tick_with_history")
+def _bench_pooled_idle_history(XInput, dll, number):
+    thread, poller = _pooled_thread(XInput, dll)
+    poller.history = XInput.StateHistory(1000)
+    def run():
+        thread._dispatch_events(poller.poll())
+        poller.history.states(100)
+    return measure(run, number)
+
+@case("pooled_poller_idle_net_bytes", unit="bytes")
+def _bench_pooled_idle_bytes(XInput, dll, number):
+    """Net memory allocated per idle tick (must stay 0)"""
+    thread, poller = _pooled_thread(XInput, dll)
+    return net_allocations(lambda: thread._dispatch_events(poller.poll()), number)[0]
+
+@case("pooled_poller_idle_net_gc_objects", unit="objects")
+def _bench_pooled_idle_gc(XInput, dll, number):
+    """Net GC-tracked objects created per idle tick (must stay 0)"""
+    thread, poller = _pooled_thread(XInput, dll)
+    return net_allocations(lambda: thread._dispatch_events(poller.poll()), number)[1]
+
+@case("shared_state_publish")
+def _bench_shared_publish(XInput, dll, number):
+    publisher = XInput.SharedStatePublisher(auto_start=False)
+    try:
+        return measure(publisher.publish, number)
+    finally:
+        publisher.close()
+
+@case("shared_state_reader_get_events_idle")
+def _bench_shared_reader(XInput, dll, number):
+    publisher = XInput.SharedStatePublisher(auto_start=False)
+    reader = XInput.SharedStateReader(publisher.name)
+    try:
+        publisher.publish()
+        list(reader.get_events())
+        def run():
+            for event in reader.get_events():
+                pass
+        return measure(run, number)
+    finally:
+        reader.close()
+        publisher.close()
+
+@case("get_button_values")
+def _bench_get_button_values(XInput, dll, number):
+    state = XInput.State()
+    state.Gamepad.wButtons = 0x5555
+    return measure(lambda: XInput.get_button_values(state), number)
+
+@case("get_buttons")
+def _bench_get_buttons(XInput, dll, number):
+    state = XInput.State()
+    state.Gamepad.wButtons = 0x5555
+    return measure(lambda: XInput.get_buttons(state), number)
+
+@case("get_trigger_values")
+def _bench_get_trigger_values(XInput, dll, number):
+    state = XInput.State()
+    state.Gamepad.bLeftTrigger = 128
+    state.Gamepad.bRightTrigger = 250
+    return measure(lambda: XInput.get_trigger_values(state), number)
+
+@case("get_thumb_values")
+def _bench_get_thumb_values(XInput, dll, number):
+    state = XInput.State()
+    state.Gamepad.sThumbLX = 20000
+    state.Gamepad.sThumbLY = -12000
+    state.Gamepad.sThumbRX = -3000
+    state.Gamepad.sThumbRY = 32767
+    return measure(lambda: XInput.get_thumb_values(state), number)
+
+@case("snapshot_all_views_read_3x")
+def _bench_snapshot(XInput, dll, number):
+    dll.set(0, buttons=0x5555, lt=128, rt=250, lx=20000, ly=-12000, rx=-3000, ry=32767)
+    def run():
+        snapshot = XInput.get_snapshot(0)
+        for _ in range(3):
+            snapshot.buttons, snapshot.triggers, snapshot.thumbs
+    return measure(run, number)
+
+def _sample_events(XInput, dll):
+    """One tick worth of events touching every event type on all slots."""
+    for i in range(4):
+        dll.set(i)
+    XInput._default_poller.reset()
+    events = list(XInput.get_events())
+    for i in range(4):
+        dll.set(i, buttons=0x1003, lt=200, rt=100, lx=20000, ly=20000, rx=-20000, ry=-20000)
+    events += list(XInput.get_events())
+    return events
+
+for _handlers in (1, 10, 100):
+    def _bench_dispatch(XInput, dll, number, handlers=_handlers):
+        class CountingHandler(XInput.EventHandler):
+            calls = 0
+            def process_button_event(self, event):
+                CountingHandler.calls += 1
+            def process_stick_event(self, event):
+                CountingHandler.calls += 1
+            def process_trigger_event(self, event):
+                CountingHandler.calls += 1
+            def process_connection_event(self, event):
+                CountingHandler.calls += 1
+
+        thread = XInput.GamepadThread(*[CountingHandler(0, 1, 2, 3) for _ in range(handlers)],
+                                      auto_start=False)
+        events = _sample_events(XInput, dll)
+        return measure(lambda: thread._dispatch_events(events), max(1, number // handlers)) / len(events)
+    case("gamepad_thread_dispatch_per_event", handlers=_handlers)(_bench_dispatch)
+
+def _button_event(XInput, user_index, button, pressed):
+    event = XInput.Event(user_index, XInput.EVENT_BUTTON_PRESSED if pressed else XInput.EVENT_BUTTON_RELEASED)
+    event.button = XInput._button_dict[button]
+    event.button_id = button
+    return event
+
+for _patterns in (10, 1000):
+    def _bench_combo_recognizer(XInput, dll, number, patterns=_patterns):
+        import random
+        rng = random.Random(patterns)
+        buttons = sorted(XInput._button_dict)
+        recognizer = XInput.ComboRecognizer()
+        for n in range(patterns):
+            if n % 4:
+                recognizer.add_sequence("sequence{}".format(n), [rng.choice(buttons) for _ in range(rng.randint(3, 6))])
+            else:
+                recognizer.add_chord("chord{}".format(n), sum(rng.sample(buttons, rng.randint(2, 3))))
+        recognizer.compile()
+        stream = []
+        for _ in range(256):
+            button = rng.choice(buttons)
+            stream.append(_button_event(XInput, rng.randrange(4), button, True))
+            stream.append(_button_event(XInput, stream[-1].user_index, button, False))
+        clock = [0.0]
+        def run():
+            for event in stream:
+                clock[0] += 0.01
+                recognizer.process_event(event, clock[0])
+        return measure(run, max(1, number // 100)) / len(stream)
+    case("combo_recognizer_per_event", patterns=_patterns)(_bench_combo_recognizer)
+
+@case("gesture_recognizer_per_event")
+def _bench_gesture_recognizer(XInput, dll, number):
+    from math import cos, sin, pi
+    recognizer = XInput.GestureRecognizer()
+    stream = []
+    for n in range(256):
+        event = XInput.Event(n % 4, XInput.EVENT_STICK_MOVED)
+        event.stick = (n // 4) & 1
+        event.value = (n % 7) / 6.
+        event.x = cos(n * pi / 13) * event.value
+        event.y = sin(n * pi / 13) * event.value
+        event.dir = (cos(n * pi / 13), sin(n * pi / 13))
+        stream.append(event)
+    clock = [0.0]
+    def run():
+        for event in stream:
+            clock[0] += 0.004
+            recognizer.process_event(event, clock[0])
+        recognizer.poll(clock[0])
+    return measure(run, max(1, number // 100)) / len(stream)
+
+@case("event_stream_encode_per_event")
+def _bench_event_encode(XInput, dll, number):
+    events = _sample_events(XInput, dll)
+    def run():
+        for event in events:
+            XInput._encode_event(event)
+    return measure(run, max(1, number // 10)) / len(events)
+
+@case("event_stream_decode_per_event")
+def _bench_event_decode(XInput, dll, number):
+    events = _sample_events(XInput, dll)
+    body = b"".join(XInput._encode_event(event) for event in events)
+    return measure(lambda: XInput._decode_events(body), max(1, number // 10)) / len(events)
+
+@case("remote_source_feed_per_record", slots=256)
+def _bench_remote_feed(XInput, dll, number, slots=256):
+    source = XInput.RemoteSource(slots=slots, auto_start=False)
+    record, (full, _), (delta, _) = XInput._REMOTE_RECORD, XInput._REMOTE_PAYLOADS[0x7F], XInput._REMOTE_PAYLOADS[0x09]
+    sent = [b"".join(record.pack(slot, 1, 0x7F) + full.pack(0, 0, 0, slot, 0, 0, 0) for slot in range(slots))]
+    for tick in range(1, 4):       # buttons and left stick X changed
+        sent.append(b"".join(record.pack(slot, tick + 1, 0x09) + delta.pack(tick & 1, tick * 1000 + slot)
+                             for slot in range(slots)))
+    def run():
+        source._sequences = [None] * slots
+        source.feed(*sent)
+    try:
+        return measure(run, max(1, number // 100)) / (4 * slots)
+    finally:
+        source.close()
+
+for _slots in (256,):
+    def _bench_virtual_hub(XInput, dll, number, slots=_slots):
+        """One pooled poll of a hub of <slots> virtual pads, 1 in 16 of them changing"""
+        source = XInput.VirtualSource(slots)
+        for i in range(slots):
+            source.connect(i)
+        poller = XInput.Poller(pooled=True, source=XInput.ControllerHub(source))
+        poller.poll()
+        tick = [0]
+        def run():
+            tick[0] += 1
+            for i in range(tick[0] & 15, slots, 16):
+                source.set_state(i, buttons=tick[0] & 0x1000, thumbs=((tick[0] * 64 & 0x7FFF, 0), (0, 0)))
+            poller.poll()
+        return measure(run, max(1, number // 10))
+    case("virtual_hub_pooled_tick", slots=_slots)(_bench_virtual_hub)
+
+@case("evdev_source_receive_per_record")
+def _bench_evdev_receive(XInput, dll, number):
+    """Bulk reads of stick frames (X, Y, SYN_REPORT) through a pipe"""
+    read_end, write_end = os.pipe()
+    source = XInput.EvdevSource(read_end)
+    record = XInput._INPUT_EVENT
+    frames = b"".join(record.pack(0, 0, 3, 0, n * 100) + record.pack(0, 0, 3, 1, -n * 100) + record.pack(0, 0, 0, 0, 0)
+                      for n in range(64))
+    def run():
+        os.write(write_end, frames)
+        source.receive()
+    try:
+        return measure(run, max(1, number // 10)) / (3 * 64)
+    finally:
+        source.close()
+        os.close(read_end)
+        os.close(write_end)
+
+@case("gamepad_thread_dispatch_waited_per_event")
+def _bench_dispatch_waited(XInput, dll, number):
+    """Dispatching to one handler while wait_for_events() collects"""
+    class NullHandler(XInput.EventHandler):
+        def process_button_event(self, event):
+            pass
+        process_stick_event = process_trigger_event = process_connection_event = process_button_event
+    thread = XInput.GamepadThread(NullHandler(0, 1, 2, 3), auto_start=False)
+    thread.wait_for_events(0)
+    events = _sample_events(XInput, dll)
+    def run():
+        thread._dispatch_events(events)
+        thread.wait_for_events(0)
+    return measure(run, max(1, number // 10)) / len(events)
+
+@case("gamepad_thread_low_rate_dispatch_per_event", handlers=100)
+def _bench_low_rate_dispatch(XInput, dll, number, handlers=100):
+    """<handlers> handlers at 10 Hz, fed at the full polling rate"""
+    class NullHandler(XInput.EventHandler):
+        def process_button_event(self, event):
+            pass
+        process_stick_event = process_trigger_event = process_connection_event = process_button_event
+    thread = XInput.GamepadThread(*[NullHandler(0, 1, 2, 3, rate=10) for _ in range(handlers)], auto_start=False)
+    events = _sample_events(XInput, dll)
+    thread._dispatch_events(events)
+    return measure(lambda: thread._dispatch_events(events), max(1, number // 10)) / len(events)
+
+for _handlers in (1, 10, 100):
+    def _bench_batch_dispatch(XInput, dll, number, handlers=_handlers):
+        class BatchHandler(XInput.EventHandler):
+            batched = True
+            calls = 0
+            def process_events(self, batch):
+                BatchHandler.calls += 1
+        thread = XInput.GamepadThread(*[BatchHandler(0, 1, 2, 3) for _ in range(handlers)], auto_start=False)
+        events = _sample_events(XInput, dll)
+        return measure(lambda: thread._dispatch_events(events), max(1, number // 10)) / len(events)
+    case("gamepad_thread_batch_dispatch_per_event", handlers=_handlers)(_bench_batch_dispatch)
+
+@case("sampler_sample_all_changed")
+def _bench_sampler(XInput, dll, number):
+    """One Sampler sample of the four driver slots, all of them changing"""
+    for i in range(4):
+        dll.set(i)
+    sampler = XInput.Sampler(auto_start=False)
+    sampler.sample()
+    tick = [0]
+    def run():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        sampler.sample()
+    overhead = measure(lambda: _change_pattern(dll, 1.0, 1), number)
+    return measure(run, number) - overhead
+
+for _filter in ("buttons", "none"):
+    def _bench_demand(XInput, dll, number, filter=_filter):
+        """A pooled poll of the four driver slots, all of them changing, with a Poller that only generates button events (or everything)"""
+        for i in range(4):
+            dll.set(i)
+        wanted = XInput._BUTTON_MASK if filter == "buttons" else XInput.FILTER_NONE
+        poller = XInput.Poller(pooled=True, filter=wanted)
+        poller.poll()
+        tick = [0]
+        def run():
+            tick[0] += 1
+            _change_pattern(dll, 1.0, tick[0])
+            poller.poll()
+        overhead = measure(lambda: _change_pattern(dll, 1.0, 1), number)
+        return measure(run, number) - overhead
+    case("poller_demand_tick", filter=_filter)(_bench_demand)
+
+@case("action_map_update", actions=8, axes=4)
+def _bench_action_map(XInput, dll, number):
+    """Evaluating 8 actions and 4 axes on the four driver slots"""
+    for i in range(4):
+        dll.set(i, buttons=0x1003, lt=200, rt=100, lx=20000, ly=20000, rx=-20000, ry=-20000)
+    poller = XInput.Poller(pooled=True)
+    poller.poll()
+    actions = XInput.ActionMap()
+    for n, button in enumerate((0x1000, 0x2000, 0x4000, 0x8000, 0x0001, 0x0002, 0x0100)):
+        actions.bind("action{}".format(n), button)
+    actions.bind("fire", XInput.TRIGGER_RIGHT)
+    actions.bind_axis("move", XInput.STICK_LEFT, curve=2.0)
+    actions.bind_axis("look", XInput.STICK_RIGHT)
+    actions.bind_axis("brake", XInput.TRIGGER_LEFT)
+    actions.bind_axis("turn", (0x0004, 0x0008))
+    actions.update(poller.states, poller.connected)
+    return measure(lambda: actions.update(poller.states, poller.connected), number)
+
+@case("poller_remap_tick")
+def _bench_remap(XInput, dll, number):
+    """A pooled poll of the four driver slots, all of them changing, each with a ButtonRemap and turbo"""
+    for i in range(4):
+        dll.set(i)
+    remap = XInput.ButtonRemap({0x1000 : 0x2000, 0x2000 : 0x1000, 0x0020 : 0}, turbo=0x0200)
+    poller = XInput.Poller(pooled=True)
+    for i in range(4):
+        poller.set_remap(i, remap)
+    poller.poll()
+    tick = [0]
+    def run():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        poller.poll()
+    overhead = measure(lambda: _change_pattern(dll, 1.0, 1), number)
+    return measure(run, number) - overhead
+
+for _filter in ("ema", "one_euro", "median"):
+    def _bench_smoothing(XInput, dll, number, filter=_filter):
+        """A pooled poll of the four driver slots, all of them changing, with both sticks smoothed"""
+        for i in range(4):
+            dll.set(i)
+        make = {"ema" : XInput.EMAFilter, "one_euro" : XInput.OneEuroFilter, "median" : XInput.MedianFilter}[filter]
+        poller = XInput.Poller(pooled=True)
+        for i in range(4):
+            poller.set_smoothing(i, XInput.LEFT, make())
+            poller.set_smoothing(i, XInput.RIGHT, make())
+        poller.poll()
+        tick = [0]
+        def run():
+            tick[0] += 1
+            _change_pattern(dll, 1.0, tick[0])
+            poller.poll()
+        overhead = measure(lambda: _change_pattern(dll, 1.0, 1), number)
+        return measure(run, number) - overhead
+    case("poller_smoothing_tick", filter=_filter)(_bench_smoothing)
+
+@case("predictor_record_all_changed")
+def _bench_predictor(XInput, dll, number):
+    """Predictor.record() of the four driver slots, all of them changing"""
+    for i in range(4):
+        dll.set(i)
+    poller = XInput.Poller(pooled=True)
+    predictor = XInput.Predictor()
+    tick = [0]
+    def run():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        poller.poll()
+        predictor.record(poller.states, poller.connected, tick[0] * 0.001)
+    def without():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        poller.poll()
+    return measure(run, number) - measure(without, number)
+
+@case("poller_report_rate_estimate")
+def _bench_rate_estimate(XInput, dll, number):
+    """One report rate window of the four driver slots, all of them
+with new packets"""
+    for i in range(4):
+        dll.set(i)
+    poller = XInput.Poller(pooled=True)
+    poller.poll()
+    estimate = poller._Poller__estimate_rates
+    current = poller._current
+    tick = [0]
+    def run():
+        tick[0] += 1
+        for state in current:
+            state.dwPacketNumber += 2
+        estimate(current, tick[0] * 0.25)
+    return measure(run, number)
+
+@case("auto_calibrator_record_all_changed")
+def _bench_auto_calibrator(XInput, dll, number):
+    """AutoCalibrator.record() of the four driver slots, all of them changing"""
+    for i in range(4):
+        dll.set(i)
+    poller = XInput.Poller(pooled=True)
+    calibrator = XInput.AutoCalibrator()
+    tick = [0]
+    def run():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        poller.poll()
+        calibrator.record(poller.states, poller.connected, tick[0] * 0.001)
+    def without():
+        tick[0] += 1
+        _change_pattern(dll, 1.0, tick[0])
+        poller.poll()
+    return measure(run, number) - measure(without, number)
+#/benchmark cases #
+
+def case_key(name, params):
+    return name + "".join("[{}={}]".format(key, params[key]) for key in sorted(params))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the XInput polling and dispatch paths.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON file with the per-case limits")
+    parser.add_argument("--filter", default="", help="only run cases whose key contains this string")
+    parser.add_argument("--quick", action="store_true", help="run fewer iterations")
+    parser.add_argument("--update-thresholds", action="store_true",
+                        help="rewrite the thresholds file from this run's results")
+    args = parser.parse_args(argv)
+
+    XInput, dll = load_simulated_xinput()
+
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)["cases"]
+
+    number = 200 if args.quick else 2000
+
+    results = []
+    failed = 0
+    for name, unit, params, func in CASES:
+        key = case_key(name, params)
+        if args.filter not in key:
+            continue
+        value = func(XInput, dll, number)
+        threshold = thresholds.get(key)
+        passed = threshold is None or value <= threshold
+        failed += not passed
+        results.append({"case" : key,
+                        "name" : name,
+                        "params" : params,
+                        "value" : round(value, 4),
+                        "unit" : unit,
+                        "threshold" : threshold,
+                        "passed" : passed})
+        print("{:<55} {:>10.3f} {:<6} {}".format(key, value, unit,
+              "" if threshold is None else ("ok" if passed else "REGRESSION (limit {} {})".format(threshold, unit))))
+
+    report = {"python" : platform.python_version(),
+              "implementation" : platform.python_implementation(),
+              "platform" : platform.platform(),
+              "timestamp" : time.time(),
+              "quick" : args.quick,
+              "passed" : not failed,
+              "results" : results}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.update_thresholds:
+        for result in results:
+            if result["unit"] == "us":
+                thresholds[result["case"]] = round(max(result["value"], 0.1) * THRESHOLD_HEADROOM, 2)
+        with open(args.thresholds, "w") as f:
+            json.dump({"cases" : dict(sorted(thresholds.items()))}, f, indent=2)
+            f.write("\n")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
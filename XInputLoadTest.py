@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Synthetic load generator for soak-testing handler stacks.
+
+Drives a VirtualSource with scriptable generators (stick random walks,
+trigger sweeps, button mashing, connect/disconnect storms) at a
+configurable rate and slot count, consumes the events through
+get_events() or a GamepadThread and reports the throughput and the
+latency from a state change to its events being handled (from the
+oldest change when a poll picks up several).
+No controller (and no Windows) is required.
+
+    python XInputLoadTest.py [--slots N] [--rate HZ] [--duration SECONDS]
+                             [--mode {thread,get_events}] [--poll-frequency HZ]
+                             [--mash-rate HZ] [--storm-rate HZ] [--pooled]
+                             [--json FILE]
+
+Generators can be combined in a script as well:
+
+    report = run_load(slots=64, rate=1250, duration=10,
+                      generators=[StickRandomWalk(), ButtonMash(rate=20)],
+                      handlers=[MyHandler(*range(64))])
+"""
+
+import argparse, ctypes, json, random, sys, time
+
+from threading import Thread
+
+import XInput
+
+STAMPS = 1024       # per-slot ring of write times, indexed by packet number
+
+# generators #
+class Generator:
+    """Changes the raw values of one slot per tick.
+<values> is [buttons, LT, RT, LX, LY, RX, RY], <dt> the seconds
+since the last tick. Returns False to leave the slot unchanged."""
+    def start(self, slots, rng):
+        pass
+
+    def step(self, slot, values, now, dt, rng):
+        raise NotImplementedError("Method not implemented. Must be implemented in the child class")
+
+class StickRandomWalk(Generator):
+    """Both sticks wander over their whole range at about <speed>
+full ranges per second, each axis turning around at random."""
+    def __init__(self, speed=2.0, turn_rate=2.0):
+        self.speed = speed
+        self.turn_rate = turn_rate
+
+    def start(self, slots, rng):
+        self.directions = [[rng.choice((-1, 1)) for _ in range(4)] for _ in range(slots)]
+
+    def step(self, slot, values, now, dt, rng):
+        step = int(self.speed * dt * 65535) + 1
+        directions = self.directions[slot]
+        for axis in range(4):
+            if rng.random() < self.turn_rate * dt:
+                directions[axis] = -directions[axis]
+            value = values[3 + axis] + directions[axis] * rng.randint(0, 2 * step)
+            if not -32768 <= value <= 32767:
+                directions[axis] = -directions[axis]
+                value = max(-32768, min(32767, value))
+            values[3 + axis] = value
+        return True
+
+class TriggerSweep(Generator):
+    """Both triggers sweep from 0 to 255 and back every <period>
+seconds, out of phase with each other and between slots."""
+    def __init__(self, period=1.0):
+        self.period = period
+
+    def step(self, slot, values, now, dt, rng):
+        phase = (now / self.period + slot * 0.37) % 1.0
+        left = int(510 * phase) if phase < 0.5 else int(510 * (1.0 - phase))
+        values[1] = min(left, 255)
+        values[2] = 255 - values[1]
+        return True
+
+class ButtonMash(Generator):
+    """Toggles random buttons at about <rate> changes per second"""
+    def __init__(self, rate=10.0, buttons=tuple(XInput._button_dict)):
+        self.rate = rate
+        self.buttons = buttons
+
+    def step(self, slot, values, now, dt, rng):
+        changed = False
+        presses = self.rate * dt
+        while presses > 0:
+            if presses >= 1 or rng.random() < presses:
+                values[0] ^= rng.choice(self.buttons)
+                changed = True
+            presses -= 1
+        return changed
+
+class ConnectionStorm(Generator):
+    """Connects and disconnects every slot at about <rate> times per
+second. Handled by the LoadGenerator itself, not per value."""
+    def __init__(self, rate=1.0):
+        self.rate = rate
+
+    def step(self, slot, values, now, dt, rng):
+        return False
+#/generators #
+
+class LoadGenerator:
+    """Drives <source> (a VirtualSource) from <generators> in a thread,
+ticking every slot <rate> times per second. The time of every write
+is kept by slot and packet number, for latency()."""
+    def __init__(self, source, generators, rate=1250, seed=None):
+        self.source = source
+        self.generators = [generator for generator in generators if not isinstance(generator, ConnectionStorm)]
+        self.storms = [generator for generator in generators if isinstance(generator, ConnectionStorm)]
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.updates = 0
+        self.connection_changes = 0
+        self.stamps = [[0.0] * STAMPS for _ in range(source.slots)]
+        self.running = False
+        self._thread = None
+
+    def latency(self, user_index, packet_number, now=None):
+        """Seconds since the state with <packet_number> was written"""
+        if now is None:
+            now = time.perf_counter()
+        return now - self.stamps[user_index][packet_number % STAMPS]
+
+    def __tfun(self):
+        source = self.source
+        slots = range(source.slots)
+        rng = self.rng
+        values = [[0] * 7 for _ in slots]
+        connected = [True for _ in slots]
+        packets = [0 for _ in slots]
+        for generator in self.generators:
+            generator.start(source.slots, rng)
+        for i in slots:
+            source.connect(i)
+
+        interval = 1 / self.rate
+        last = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            dt = now - last
+            last = now
+            for storm in self.storms:
+                flips = storm.rate * dt * len(slots)
+                while flips > 0:
+                    if flips >= 1 or rng.random() < flips:
+                        i = rng.randrange(len(slots))
+                        connected[i] = not connected[i]
+                        if connected[i]:
+                            source.connect(i)
+                        else:
+                            source.disconnect(i)
+                            packets[i] = 0
+                        self.connection_changes += 1
+                    flips -= 1
+
+            for i in slots:
+                if not connected[i]:
+                    continue
+                slot_values = values[i]
+                changed = False
+                for generator in self.generators:
+                    changed = generator.step(i, slot_values, now, dt, rng) or changed
+                if changed:
+                    packets[i] += 1
+                    self.stamps[i][packets[i] % STAMPS] = time.perf_counter()
+                    source.set_state(i, slot_values[0], (slot_values[1], slot_values[2]),
+                                     ((slot_values[3], slot_values[4]), (slot_values[5], slot_values[6])))
+                    self.updates += 1
+
+            remaining = interval - (time.perf_counter() - now)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def start(self):
+        self.running = True
+        self._thread = Thread(target=self.__tfun, args=())
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+class _TrackingPoller(XInput.Poller):
+    """A Poller that keeps the states every slot had before the last
+poll, so the latency of an event is measured from the oldest write
+it reports, not from the latest one"""
+    def poll(self):
+        before = getattr(self, "before", None)
+        if before is None:
+            before = self.before = (XInput.XINPUT_STATE * self.source.slots)()
+        ctypes.memmove(before, self.states, ctypes.sizeof(before))
+        return super().poll()
+
+class _Recorder:
+    """Counts the events and samples their latency"""
+    def __init__(self, generator, poller):
+        self.generator = generator
+        self.poller = poller
+        self.counts = {}
+        self.latencies = []
+
+    def record(self, event):
+        type_ = event.type
+        self.counts[type_] = self.counts.get(type_, 0) + 1
+        if type_ != XInput.EVENT_CONNECTED and type_ != XInput.EVENT_DISCONNECTED:
+            packet = self.poller.before[event.user_index].dwPacketNumber + 1    # the first write since the last poll
+            self.latencies.append(self.generator.latency(event.user_index, packet))
+
+class _RecordingHandler(XInput.EventHandler):
+    def __init__(self, recorder, slots):
+        super().__init__(*range(slots))
+        self.recorder = recorder
+
+    def process_button_event(self, event):
+        self.recorder.record(event)
+
+    process_stick_event = process_trigger_event = process_connection_event = process_button_event
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+_event_names = {XInput.EVENT_CONNECTED : "connected",
+                XInput.EVENT_DISCONNECTED : "disconnected",
+                XInput.EVENT_BUTTON_PRESSED : "button_pressed",
+                XInput.EVENT_BUTTON_RELEASED : "button_released",
+                XInput.EVENT_TRIGGER_MOVED : "trigger_moved",
+                XInput.EVENT_STICK_MOVED : "stick_moved"}
+
+def run_load(slots=16, rate=1250, duration=5.0, generators=None, mode="thread",
+             poll_frequency=1000, pooled=False, handlers=(), seed=None):
+    """Runs one load test and returns the report as a dict.
+<handlers> are added to the GamepadThread (in "thread" mode) or
+called like it would (in "get_events" mode), next to the handler
+that records the events."""
+    if mode not in ("thread", "get_events"):
+        raise ValueError("mode must be 'thread' or 'get_events'")
+    if generators is None:
+        generators = [StickRandomWalk(), TriggerSweep(), ButtonMash()]
+    source = XInput.VirtualSource(slots)
+    poller = _TrackingPoller(pooled=pooled, source=source)
+    generator = LoadGenerator(source, generators, rate, seed)
+    recorder = _Recorder(generator, poller)
+    recording_handler = _RecordingHandler(recorder, slots)
+
+    generator.start()
+    started = time.perf_counter()
+    if mode == "thread":
+        thread = XInput.GamepadThread(recording_handler, *handlers, update_frequency=poll_frequency, poller=poller)
+        time.sleep(duration)
+        thread.stop()
+    else:
+        # a GamepadThread that isn't started dispatches what get_events() would yield
+        dispatcher = XInput.GamepadThread(recording_handler, *handlers, auto_start=False, poller=poller)
+        interval = 1 / poll_frequency
+        while time.perf_counter() - started < duration:
+            dispatcher._dispatch_events(poller.poll())
+            time.sleep(interval)
+    elapsed = time.perf_counter() - started
+    generator.stop()
+
+    latencies = sorted(recorder.latencies)
+    events = sum(recorder.counts.values())
+    return {"mode" : mode,
+            "slots" : slots,
+            "rate" : rate,
+            "poll_frequency" : poll_frequency,
+            "pooled" : pooled,
+            "duration" : round(elapsed, 3),
+            "updates" : generator.updates,
+            "updates_per_second" : round(generator.updates / elapsed, 1),
+            "target_updates_per_second" : rate * slots,
+            "connection_changes" : generator.connection_changes,
+            "events" : events,
+            "events_per_second" : round(events / elapsed, 1),
+            "events_by_type" : {_event_names[type_] : count for type_, count in sorted(recorder.counts.items())},
+            "latency_us" : {"p50" : round(percentile(latencies, 0.5) * 1e6, 1),
+                            "p90" : round(percentile(latencies, 0.9) * 1e6, 1),
+                            "p99" : round(percentile(latencies, 0.99) * 1e6, 1),
+                            "p999" : round(percentile(latencies, 0.999) * 1e6, 1),
+                            "max" : round(latencies[-1] * 1e6 if latencies else 0.0, 1)}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-tests the XInput event pipeline with synthetic controllers.")
+    parser.add_argument("--slots", type=int, default=16, help="number of virtual controllers")
+    parser.add_argument("--rate", type=float, default=1250, help="state changes per second and slot (default is 10x a 125 Hz pad)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run")
+    parser.add_argument("--mode", choices=("thread", "get_events"), default="thread", help="how the events are consumed")
+    parser.add_argument("--poll-frequency", type=float, default=1000, help="polls per second")
+    parser.add_argument("--mash-rate", type=float, default=10.0, help="button changes per second and slot (0 to disable)")
+    parser.add_argument("--sweep-period", type=float, default=1.0, help="trigger sweep period in seconds (0 to disable)")
+    parser.add_argument("--walk-speed", type=float, default=2.0, help="stick random walk speed (0 to disable)")
+    parser.add_argument("--storm-rate", type=float, default=0.0, help="connects/disconnects per second and slot")
+    parser.add_argument("--pooled", action="store_true", help="use a pooled Poller")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generators")
+    parser.add_argument("--json", metavar="FILE", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    generators = []
+    if args.walk_speed:
+        generators.append(StickRandomWalk(args.walk_speed))
+    if args.sweep_period:
+        generators.append(TriggerSweep(args.sweep_period))
+    if args.mash_rate:
+        generators.append(ButtonMash(args.mash_rate))
+    if args.storm_rate:
+        generators.append(ConnectionStorm(args.storm_rate))
+
+    report = run_load(args.slots, args.rate, args.duration, generators, args.mode,
+                      args.poll_frequency, args.pooled, seed=args.seed)
+
+    print("{mode}: {slots} slots for {duration} s".format(**report))
+    print("updates: {updates} ({updates_per_second}/s of {target_updates_per_second}/s)".format(**report))
+    print("connection changes: {}".format(report["connection_changes"]))
+    print("events: {events} ({events_per_second}/s)".format(**report))
+    for name, count in report["events_by_type"].items():
+        print("    {:<16} {}".format(name, count))
+    print("latency (us): " + "  ".join("{} {}".format(key, value) for key, value in report["latency_us"].items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1364 @@
+#!/usr/bin/env python3
+"""
+Headless tests of what the polling, decoding and input processing
+paths produce.
+
+Like XInputBenchmark.py they run on any platform against a simulated
+XInput DLL, so no controller (and no Windows) is required.
+
+    python XInputUnitTest.py [-v]
+"""
+
+import asyncio, ctypes, importlib.util, os, random, socket, struct, tempfile, threading, time, unittest
+from unittest import mock
+from math import cos, sin, pi
+
+from XInputBenchmark import load_simulated_xinput, net_allocations
+
+XInput, dll = load_simulated_xinput()
+
+import XInputLoadTest    # uses the simulated XInput as well
+
+def reset_dll():
+    for i in range(4):
+        dll.connected[i] = True
+        dll.values[i][:] = [0, 0, 0, 0, 0, 0, 0, 0]
+
+class PooledPollerTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+        self.poller = XInput.Poller(pooled=True)
+        self.poller.poll()
+
+    def test_connects_every_slot(self):
+        poller = XInput.Poller(pooled=True)
+        events = poller.poll()
+        self.assertEqual(sorted(event.user_index for event in events), [0, 1, 2, 3])
+        self.assertTrue(all(event.type == XInput.EVENT_CONNECTED for event in events))
+
+    def test_events_describe_the_change(self):
+        dll.set(2, buttons=XInput.BUTTON_A, rt=255)
+        events = self.poller.poll()
+        self.assertEqual([(event.user_index, event.type) for event in events],
+                         [(2, XInput.EVENT_BUTTON_PRESSED), (2, XInput.EVENT_TRIGGER_MOVED)])
+        self.assertEqual(events[0].button, "A")
+        self.assertEqual(events[1].trigger, XInput.RIGHT)
+        self.assertEqual(events[1].value, 1.0)
+
+    def test_same_list_every_poll(self):
+        dll.set(0, buttons=XInput.BUTTON_B)
+        first = self.poller.poll()
+        dll.set(0)
+        self.assertIs(self.poller.poll(), first)
+        self.assertEqual(first[0].type, XInput.EVENT_BUTTON_RELEASED)
+
+    def assertAllocatesNothing(self, func):
+        size, objects = net_allocations(func, 2000)
+        self.assertLessEqual(size, 0)
+        self.assertLessEqual(objects, 0)
+
+    def test_idle_tick_allocates_nothing(self):
+        self.assertAllocatesNothing(self.poller.poll)
+
+    def test_changing_tick_allocates_nothing(self):
+        tick = [0]
+        def run():
+            tick[0] += 1
+            dll.set(0, buttons=XInput.BUTTON_A if tick[0] & 1 else 0, lx=20000 if tick[0] & 1 else -20000)
+            self.poller.poll()
+        self.assertAllocatesNothing(run)
+
+class EventHandlerTest(unittest.TestCase):
+    def test_rate_is_validated(self):
+        for rate in (0, -1):
+            self.assertRaises(ValueError, XInput.EventHandler, 0, rate=rate)
+        self.assertEqual(XInput.EventHandler(0, rate=10).rate, 10)
+        self.assertIsNone(XInput.EventHandler(0).rate)
+
+    def test_low_rate_handler_gets_aggregated_batches(self):
+        clock = FakeClock()
+        source = XInput.VirtualSource(1)
+        source.connect(0)
+        poller = XInput.Poller(source=source)
+        handler = BatchHandler(0, rate=30)
+        thread = XInput.GamepadThread(handler, auto_start=False, poller=poller)
+        with mock.patch.object(XInput, "time", clock):
+            for n in range(1000):       # one second at 1000 Hz, the stick moves on every tick
+                source.set_state(0, buttons=XInput.BUTTON_A if n == 500 else 0, thumbs=((8000 + n * 20, 0), (0, 0)))
+                thread._dispatch_events(poller.poll())
+                clock.now += 0.001
+        self.assertAlmostEqual(len(handler.batches), 30, delta=1)
+        self.assertTrue(all(len(batch.sticks) <= 1 for batch in handler.batches))   # only the latest position
+        buttons = [(event.type, event.button) for batch in handler.batches for event in batch.buttons]
+        self.assertEqual(buttons, [(XInput.EVENT_BUTTON_PRESSED, "A"), (XInput.EVENT_BUTTON_RELEASED, "A")])
+
+    def test_no_back_to_back_delivery_after_a_late_one(self):
+        group = XInput._RateGroup(10, [])
+        event = button_event(0, XInput.BUTTON_A, True)
+        group.collect([event])
+        self.assertEqual(group.take(0.0), [event])
+        group.collect([event])
+        self.assertIsNone(group.take(0.05))
+        self.assertEqual(group.take(0.25), [event])      # 0.15 s late
+        group.collect([event])
+        self.assertIsNone(group.take(0.26))              # not due at 0.2 any more, but at 0.35
+        self.assertEqual(group.take(0.35), [event])
+
+class RecordingHandler(XInput.EventHandler):
+    def __init__(self, *controllers, **kwargs):
+        super().__init__(*controllers, **kwargs)
+        self.events = []
+
+    def process_button_event(self, event):
+        self.events.append((event.user_index, event.type, event.button))
+
+    def process_stick_event(self, event):
+        self.events.append((event.user_index, event.type, event.stick))
+
+    def process_trigger_event(self, event):
+        self.events.append((event.user_index, event.type, event.trigger))
+
+    def process_connection_event(self, event):
+        self.events.append((event.user_index, event.type))
+
+class DemandTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.VirtualSource(2)
+        self.source.connect(0)
+        self.source.connect(1)
+        self.poller = XInput.Poller(source=self.source)
+        self.handler = RecordingHandler(0, filter=XInput.BUTTON_A)
+        self.thread = XInput.GamepadThread(self.handler, poller=self.poller)
+        wait_until(lambda: len(self.handler.events) == 1)     # slot 0 connected
+
+    def tearDown(self):
+        if self.thread.running:
+            self.thread.stop()
+
+    def press(self, user_index, buttons, lx=0):
+        self.source.set_state(user_index, buttons=buttons, thumbs=((lx, 0), (0, 0)))
+
+    def test_widening_the_attributes_directly(self):
+        self.handler.filter = XInput.FILTER_NONE
+        self.handler.controllers.add(1)
+        self.press(1, XInput.BUTTON_B)
+        wait_until(lambda: (1, XInput.EVENT_BUTTON_PRESSED, "B") in self.handler.events)
+
+    def test_demand_follows_the_handlers(self):
+        self.assertEqual(self.poller._demand, {0 : XInput._demand_of(XInput.BUTTON_A)})
+        self.handler.set_filter(XInput.BUTTON_A | XInput.STICK_LEFT)
+        wait_until(lambda: self.poller._demand == {0 : XInput._demand_of(XInput.BUTTON_A | XInput.STICK_LEFT)})
+
+    def test_widened_demand_reports_the_current_state(self):
+        self.press(0, XInput.BUTTON_A | XInput.BUTTON_B, lx=20000)
+        wait_until(lambda: (0, XInput.EVENT_BUTTON_PRESSED, "A") in self.handler.events)
+        self.handler.set_filter(XInput.FILTER_NONE)
+        wait_until(lambda: (0, XInput.EVENT_STICK_MOVED, XInput.LEFT) in self.handler.events)
+        self.assertEqual(self.handler.events[1:], [(0, XInput.EVENT_BUTTON_PRESSED, "A"), (0, XInput.EVENT_BUTTON_PRESSED, "B"),
+                                                   (0, XInput.EVENT_STICK_MOVED, XInput.LEFT)])
+
+    def test_stop_clears_the_demand(self):
+        self.thread.stop()
+        self.assertIsNone(self.poller._demand)
+        self.press(1, XInput.BUTTON_B)
+        self.assertEqual([(event.user_index, event.button) for event in self.poller.poll()], [(1, "B")])
+
+    def test_shared_poller_is_left_alone(self):
+        thread = XInput.GamepadThread(RecordingHandler(0, filter=XInput.BUTTON_A))
+        try:
+            self.assertIsNone(XInput._default_poller._demand)
+        finally:
+            thread.stop()
+
+class WaitForEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.VirtualSource(1)
+        self.source.connect(0)
+        self.thread = XInput.GamepadThread(poller=XInput.Poller(source=self.source))
+        self.thread.wait_for_events(0.01)   # starts collecting
+
+    def tearDown(self):
+        self.thread.stop()
+
+    def press_later(self, delay, buttons=XInput.BUTTON_A):
+        timer = threading.Timer(delay, self.source.set_state, (0, buttons))
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_returns_when_an_event_arrives(self):
+        self.press_later(0.05)
+        started = time.perf_counter()
+        events = self.thread.wait_for_events(5.0)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertEqual([(event.type, event.button) for event in events], [(XInput.EVENT_BUTTON_PRESSED, "A")])
+
+    def test_returns_nothing_after_the_timeout(self):
+        started = time.perf_counter()
+        self.assertEqual(self.thread.wait_for_events(0.05), [])
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_wakes_a_waiter_in_another_thread(self):
+        found = []
+        waiter = threading.Thread(target=lambda: found.extend(self.thread.wait_for_events(5.0)))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertTrue(waiter.is_alive())
+        self.source.set_state(0, buttons=XInput.BUTTON_X)
+        waiter.join(2.0)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual([event.button for event in found], ["X"])
+
+    def test_events_are_kept_until_the_next_call(self):
+        self.source.set_state(0, buttons=XInput.BUTTON_A)
+        time.sleep(0.05)
+        self.source.set_state(0, buttons=0)
+        time.sleep(0.05)
+        events = self.thread.wait_for_events(0.0)
+        self.assertEqual([event.type for event in events], [XInput.EVENT_BUTTON_PRESSED, XInput.EVENT_BUTTON_RELEASED])
+
+    def test_module_level(self):
+        reset_dll()
+        events = XInput.wait_for_events(2.0)    # the first poll's connections are kept
+        self.assertEqual(sorted(event.user_index for event in events if event.type == XInput.EVENT_CONNECTED), [0, 1, 2, 3])
+        dll.set(2, buttons=XInput.BUTTON_Y)
+        events = XInput.wait_for_events(2.0)
+        self.assertEqual([(event.user_index, event.button) for event in events], [(2, "Y")])
+
+class AsyncioTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+
+    def test_aevents(self):
+        async def consume():
+            found = []
+            async for event in XInput.aevents():
+                found.append((event.user_index, event.type))
+                if event.type == XInput.EVENT_CONNECTED and len(found) == 4:
+                    dll.set(1, buttons=XInput.BUTTON_A)
+                elif event.type == XInput.EVENT_BUTTON_PRESSED:
+                    return found
+        found = asyncio.run(asyncio.wait_for(consume(), 5.0))
+        self.assertEqual(sorted(found[:4]), [(i, XInput.EVENT_CONNECTED) for i in range(4)])
+        self.assertEqual(found[4:], [(1, XInput.EVENT_BUTTON_PRESSED)])
+
+    def test_slow_consumer_gets_merged_batches(self):
+        source = XInput.VirtualSource(1)
+        source.connect(0)
+        thread = XInput.GamepadThread(poller=XInput.Poller(source=source))
+        self.addCleanup(thread.stop)
+
+        async def consume():
+            events = XInput.aevents(thread, max_batches=2)
+            self.assertEqual((await events.__anext__()).type, XInput.EVENT_CONNECTED)
+            for n in range(1, 51):      # the event loop is blocked meanwhile
+                source.set_state(0, buttons=XInput.BUTTON_A if n == 20 else 0, thumbs=((n * 600, 0), (0, 0)))
+                time.sleep(0.003)
+            source.set_state(0, buttons=XInput.BUTTON_START)
+            found = []
+            async for event in events:
+                found.append(event)
+                if event.type == XInput.EVENT_BUTTON_PRESSED and event.button == "START":
+                    await events.aclose()
+                    return found
+        found = asyncio.run(asyncio.wait_for(consume(), 5.0))
+        buttons = [(event.type, event.button) for event in found if event.type != XInput.EVENT_STICK_MOVED]
+        self.assertEqual(buttons, [(XInput.EVENT_BUTTON_PRESSED, "A"), (XInput.EVENT_BUTTON_RELEASED, "A"),
+                                   (XInput.EVENT_BUTTON_PRESSED, "START")])
+        sticks = [event for event in found if event.type == XInput.EVENT_STICK_MOVED]
+        self.assertLess(len(sticks), 10)
+        self.assertAlmostEqual(sticks[-1].x, XInput._normalize_stick(30000, 0, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)[2])
+
+    def test_max_batches_is_validated(self):
+        async def first():
+            return await XInput.aevents(max_batches=0).__anext__()
+        self.assertRaises(ValueError, asyncio.run, first())
+
+    def test_blocking_calls_run_in_an_executor(self):
+        async def call():
+            return (await XInput.aset_vibration(0, 0.5, 0.5), await XInput.aget_battery_information(0))
+        vibrated, battery = asyncio.run(call())
+        self.assertTrue(vibrated)
+        self.assertEqual(battery, XInput.get_battery_information(0))
+        dll.connected[0] = False
+        self.assertFalse(asyncio.run(XInput.aset_vibration(0, 0.5, 0.5)))
+
+class BatchHandler(XInput.EventHandler):
+    batched = True
+
+    def __init__(self, *controllers, **kwargs):
+        super().__init__(*controllers, **kwargs)
+        self.batches = []
+
+    def process_events(self, batch):
+        self.batches.append(batch)
+
+class BatchedDeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.VirtualSource(2)
+        self.source.connect(0)
+        self.source.connect(1)
+
+    def thread(self, *handlers, pooled=False):
+        poller = XInput.Poller(pooled=pooled, source=self.source)
+        thread = XInput.GamepadThread(*handlers, auto_start=False, poller=poller)
+        return lambda: thread._dispatch_events(poller.poll())
+
+    def test_one_call_per_tick(self):
+        handler = BatchHandler(0, 1)
+        tick = self.thread(handler)
+        tick()
+        self.assertEqual([len(batch.connections) for batch in handler.batches], [2])
+        self.source.set_state(0, buttons=XInput.BUTTON_A | XInput.BUTTON_B)
+        self.source.set_state(1, thumbs=((20000, 0), (0, 0)), triggers=(255, 0))
+        tick()
+        batch = handler.batches[-1]
+        self.assertEqual(len(handler.batches), 2)
+        self.assertEqual([(event.user_index, event.button) for event in batch.buttons], [(0, "A"), (0, "B")])
+        self.assertEqual([(event.user_index, event.stick) for event in batch.sticks], [(1, XInput.LEFT)])
+        self.assertEqual([(event.user_index, event.trigger) for event in batch.triggers], [(1, XInput.LEFT)])
+        self.assertEqual(len(batch), 4)
+        tick()
+        self.assertEqual(len(handler.batches), 2)     # nothing happened, no call
+
+    def test_filter_and_controllers(self):
+        handler = BatchHandler(1, filter=XInput.BUTTON_A)
+        tick = self.thread(handler)
+        tick()
+        self.source.set_state(0, buttons=XInput.BUTTON_A)
+        self.source.set_state(1, buttons=XInput.BUTTON_A | XInput.BUTTON_B)
+        tick()
+        self.assertEqual([[(event.user_index, event.type) for event in batch] for batch in handler.batches],
+                         [[(1, XInput.EVENT_CONNECTED)], [(1, XInput.EVENT_BUTTON_PRESSED)]])
+
+    def test_not_batched_by_default(self):
+        handler = RecordingHandler(0)
+        self.assertFalse(handler.batched)
+        handler.process_events(XInput.EventBatch([button_event(0, XInput.BUTTON_X, True)]))     # passed on per event
+        self.assertEqual(handler.events, [(0, XInput.EVENT_BUTTON_PRESSED, "X")])
+
+    def test_pooled_events_are_copied_for_later_deliveries(self):
+        handler = BatchHandler(0, rate=1e6)     # delivered on every tick, but collected first
+        tick = self.thread(handler, pooled=True)
+        tick()
+        self.source.set_state(0, buttons=XInput.BUTTON_A)
+        tick()
+        self.source.set_state(0, buttons=XInput.BUTTON_B)
+        tick()
+        self.assertEqual([[(event.type, event.button) for event in batch.buttons] for batch in handler.batches[1:]],
+                         [[(XInput.EVENT_BUTTON_PRESSED, "A")],
+                          [(XInput.EVENT_BUTTON_RELEASED, "A"), (XInput.EVENT_BUTTON_PRESSED, "B")]])
+
+class ControllerHubTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+        self.bots = XInput.VirtualSource(300)
+        self.bots.connect(0)
+        self.bots.connect(299)
+
+    def test_numbers_the_slots_consecutively(self):
+        hub = XInput.ControllerHub(XInput.XInputSource(), self.bots)
+        self.assertEqual((hub.slots, hub.offset(self.bots)), (304, 4))
+        self.assertRaises(ValueError, hub.offset, XInput.VirtualSource(1))
+        self.assertEqual(hub.read_state(304, XInput.XINPUT_STATE()), XInput.ERROR_BAD_ARGUMENTS)
+        poller = XInput.Poller(source=hub)
+        self.assertEqual(sorted(event.user_index for event in poller.poll()), [0, 1, 2, 3, 4, 303])
+        self.bots.set_state(299, buttons=XInput.BUTTON_Y)
+        dll.set(1, buttons=XInput.BUTTON_X)
+        self.assertEqual(sorted((event.user_index, event.button) for event in poller.poll()), [(1, "X"), (303, "Y")])
+
+    def test_many_slots_through_handlers_and_history(self):
+        hub = XInput.ControllerHub(XInput.VirtualSource(4), self.bots)     # read_states() on both
+        history = XInput.StateHistory(8, slots=hub.slots)
+        poller = XInput.Poller(pooled=True, source=hub, history=history)
+        handler = RecordingHandler(303, filter=XInput.BUTTON_A)
+        thread = XInput.GamepadThread(handler, auto_start=False, poller=poller)
+        thread._dispatch_events(poller.poll())
+        self.bots.set_state(299, buttons=XInput.BUTTON_A)
+        self.bots.set_state(0, buttons=XInput.BUTTON_A)
+        thread._dispatch_events(poller.poll())
+        self.assertEqual(handler.events, [(303, XInput.EVENT_CONNECTED), (303, XInput.EVENT_BUTTON_PRESSED, "A")])
+        self.assertEqual(history.states(1)[303].Gamepad.wButtons, XInput.BUTTON_A)
+        self.assertEqual(list(history.connected(1))[4:], [1] + [0] * 298 + [1])
+
+class WithoutLibraryTest(unittest.TestCase):
+    def test_imports_and_fails_on_the_first_call(self):
+        spec = importlib.util.spec_from_file_location("XInput_without_library", XInput.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch("ctypes.util.find_library", lambda name: None):
+            spec.loader.exec_module(module)
+        self.assertIsNone(module.libXInput)
+        self.assertEqual(module.XInputSource().slots, 0)
+        self.assertRaises(IOError, module.get_connected)
+        self.assertRaises(IOError, module.get_state, 0)
+        bots = module.VirtualSource(2)
+        bots.connect(1)
+        self.assertEqual([event.user_index for event in module.Poller(source=bots).poll()], [1])
+
+class ButtonSetTest(unittest.TestCase):
+    def test_construction_and_membership(self):
+        buttons = XInput.ButtonSet(XInput.BUTTON_A | XInput.BUTTON_X | 0x0C00)     # 0x0C00 isn't a button
+        self.assertEqual(buttons, XInput.BUTTON_A | XInput.BUTTON_X)
+        self.assertEqual(XInput.ButtonSet(["A", XInput.BUTTON_X]), buttons)
+        self.assertEqual(XInput.ButtonSet.A | XInput.ButtonSet.X, buttons)
+        self.assertIn("A", buttons)
+        self.assertIn(XInput.BUTTON_X, buttons)
+        self.assertIn(XInput.BUTTON_A | XInput.BUTTON_X, buttons)
+        self.assertNotIn(XInput.BUTTON_A | XInput.BUTTON_B, buttons)
+        self.assertNotIn(0, buttons)
+        self.assertEqual(len(buttons), 2)
+        self.assertEqual(len(XInput.ButtonSet()), 0)
+        with self.assertRaises(KeyError):
+            XInput.ButtonSet(["TURBO"])
+
+    def test_set_operations(self):
+        ab = XInput.ButtonSet.A | XInput.ButtonSet.B
+        bx = XInput.ButtonSet.B | XInput.ButtonSet.X
+        for result, expected in ((ab | bx, XInput.BUTTON_A | XInput.BUTTON_B | XInput.BUTTON_X),
+                                 (ab & bx, XInput.BUTTON_B),
+                                 (ab ^ bx, XInput.BUTTON_A | XInput.BUTTON_X),
+                                 (ab - bx, XInput.BUTTON_A),
+                                 (XInput.BUTTON_X | ab, XInput.BUTTON_A | XInput.BUTTON_B | XInput.BUTTON_X),
+                                 (XInput.BUTTON_B & ab, XInput.BUTTON_B),
+                                 (~ab, XInput._BUTTON_MASK & ~(XInput.BUTTON_A | XInput.BUTTON_B))):
+            self.assertIsInstance(result, XInput.ButtonSet)
+            self.assertEqual(result, expected)
+        self.assertEqual(len(~XInput.ButtonSet()), 14)
+
+    def test_changes_against_a_previous_set(self):
+        previous = XInput.ButtonSet.A | XInput.ButtonSet.B
+        current = XInput.ButtonSet.B | XInput.ButtonSet.Y
+        self.assertEqual(current.pressed(previous), XInput.ButtonSet.Y)
+        self.assertEqual(current.released(previous), XInput.ButtonSet.A)
+        self.assertEqual(current.held(previous), XInput.ButtonSet.B)
+        self.assertEqual(current.pressed(int(previous)), XInput.BUTTON_Y)
+
+    def test_iteration_and_names(self):
+        buttons = XInput.ButtonSet(XInput.BUTTON_Y | XInput.BUTTON_DPAD_UP | XInput.BUTTON_A)
+        self.assertEqual(list(buttons), [XInput.BUTTON_DPAD_UP, XInput.BUTTON_A, XInput.BUTTON_Y])    # lowest bit first
+        self.assertEqual(buttons.names(), ("DPAD_UP", "A", "Y"))
+        self.assertEqual(list(XInput.ButtonSet()), [])
+        self.assertEqual(repr(buttons), "ButtonSet(DPAD_UP|A|Y)")
+        self.assertEqual(repr(XInput.ButtonSet()), "ButtonSet(0)")
+        state = XInput.XINPUT_STATE()
+        state.Gamepad.wButtons = int(buttons)
+        self.assertEqual(buttons.to_dict(), XInput.get_button_values(state))
+        self.assertEqual(XInput.get_buttons(state), buttons)
+
+    def test_events_only_for_the_changed_bits(self):
+        reset_dll()
+        for pooled in (False, True):
+            poller = XInput.Poller(pooled=pooled)
+            dll.set(1, buttons=XInput.BUTTON_A | XInput.BUTTON_B | XInput.BUTTON_START)
+            poller.poll()
+            dll.set(1, buttons=XInput.BUTTON_B | XInput.BUTTON_DPAD_LEFT | XInput.BUTTON_Y)
+            events = [(event.user_index, event.type, event.button) for event in poller.poll()]
+            self.assertEqual(events, [(1, XInput.EVENT_BUTTON_PRESSED, "DPAD_LEFT"),
+                                      (1, XInput.EVENT_BUTTON_RELEASED, "START"),
+                                      (1, XInput.EVENT_BUTTON_RELEASED, "A"),
+                                      (1, XInput.EVENT_BUTTON_PRESSED, "Y")])
+            dll.set(1, buttons=XInput.BUTTON_B | XInput.BUTTON_DPAD_LEFT | XInput.BUTTON_Y, lx=100)
+            self.assertEqual([event for event in poller.poll() if event.type in (XInput.EVENT_BUTTON_PRESSED, XInput.EVENT_BUTTON_RELEASED)],
+                             [])    # a new packet, but no button changed
+            reset_dll()
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+
+    def tearDown(self):
+        XInput.set_calibration(1, None)
+
+    def test_is_immutable(self):
+        dll.set(0, buttons=XInput.BUTTON_A, lt=200, lx=20000)
+        state = XInput.get_state(0)
+        snapshot = XInput.Snapshot(state, 0)
+        state.Gamepad.wButtons = 0
+        copy = snapshot.state
+        copy.Gamepad.wButtons = 0
+        copy.Gamepad.sThumbLX = 0
+        self.assertEqual(snapshot.state.Gamepad.wButtons, XInput.BUTTON_A)
+        self.assertEqual(snapshot.state.Gamepad.sThumbLX, 20000)
+        self.assertTrue(snapshot.buttons["A"])
+        self.assertEqual(snapshot.button_set, XInput.ButtonSet(XInput.BUTTON_A))
+        with self.assertRaises(AttributeError):
+            snapshot.user_index = 1
+        with self.assertRaises(AttributeError):
+            del snapshot.calibration
+        with self.assertRaises(TypeError):
+            snapshot.buttons["A"] = False
+
+    def test_values_match_the_get_functions(self):
+        dll.set(2, buttons=XInput.BUTTON_X | XInput.BUTTON_START, lt=200, rt=10, lx=-20000, ry=32767)
+        state = XInput.get_state(2)
+        snapshot = XInput.get_snapshot(2)
+        self.assertEqual((snapshot.user_index, snapshot.packet_number), (2, state.dwPacketNumber))
+        self.assertEqual(dict(snapshot.buttons), XInput.get_button_values(state))
+        self.assertEqual(snapshot.triggers, XInput.get_trigger_values(state))
+        self.assertEqual(snapshot.thumbs, XInput.get_thumb_values(state, 2))
+        self.assertIs(snapshot.thumbs, snapshot.thumbs)
+
+    def test_thumbs_use_the_slot_calibration(self):
+        dll.set(1, lx=16000)
+        before = XInput.get_snapshot(1)
+        XInput.set_calibration(1, XInput.Calibration(left=XInput.StickCalibration(right=16000)))
+        calibrated = XInput.get_snapshot(1)
+        self.assertAlmostEqual(calibrated.thumbs[0][0], 1.0, places=3)
+        self.assertEqual(calibrated.thumbs, XInput.get_thumb_values(XInput.get_state(1), 1))
+        self.assertLess(before.thumbs[0][0], 0.5)               # taken before the calibration was set
+        self.assertEqual(XInput.Snapshot(calibrated.state).thumbs, before.thumbs)   # no slot, no calibration
+
+class StateHistoryTest(unittest.TestCase):
+    def record(self, history, frames):
+        states = (XInput.XINPUT_STATE * history.slots)()
+        connected = (ctypes.c_ubyte * history.slots)()
+        for frame in range(frames):
+            for slot in range(history.slots):
+                states[slot].dwPacketNumber = frame * 10 + slot
+                states[slot].Gamepad.wButtons = XInput.BUTTON_A << slot
+                states[slot].Gamepad.sThumbLX = -1000 * frame
+                connected[slot] = (frame + slot) & 1
+            history.record(states, connected, frame * 0.5)
+
+    def unpack(self, view):
+        """Reads the exported states with struct alone, using the ctypes layout of XINPUT_STATE"""
+        raw = view.cast("B")
+        packet = XInput.XINPUT_STATE.dwPacketNumber
+        pad = struct.Struct("<HBBhhhh")
+        self.assertEqual(pad.size, ctypes.sizeof(XInput.XINPUT_GAMEPAD))
+        gamepad = XInput.XINPUT_STATE.Gamepad.offset
+        states = []
+        for offset in range(0, raw.nbytes, view.itemsize):
+            number = int.from_bytes(raw[offset + packet.offset:offset + packet.offset + packet.size], "little")
+            buttons, lt, rt, lx, ly, rx, ry = pad.unpack_from(raw, offset + gamepad)
+            states.append((number, buttons, lx))
+        return states
+
+    def test_states_export_oldest_first(self):
+        history = XInput.StateHistory(3, slots=2)
+        self.record(history, 5)
+        self.assertEqual(len(history), 3)
+        view = memoryview(history.states())
+        self.assertEqual(view.itemsize, ctypes.sizeof(XInput.XINPUT_STATE))
+        self.assertEqual((view.ndim, view.shape), (1, (6,)))
+        self.assertTrue(view.c_contiguous)
+        self.assertTrue(view.format.startswith("T{"))
+        names = ["dwPacketNumber", "wButtons", "bLeftTrigger", "bRightTrigger", "sThumbLX", "sThumbLY", "sThumbRX", "sThumbRY"]
+        self.assertEqual(sorted(names, key=lambda name: view.format.index(":" + name + ":")), names)
+        self.assertEqual(self.unpack(view), [(frame * 10 + slot, XInput.BUTTON_A << slot, -1000 * frame)
+                                             for frame in (2, 3, 4) for slot in (0, 1)])
+        self.assertEqual(self.unpack(memoryview(history.states(1))), [(40, XInput.BUTTON_A, -4000), (41, XInput.BUTTON_B, -4000)])
+
+    def test_connected_and_timestamps(self):
+        history = XInput.StateHistory(3, slots=2)
+        self.assertEqual(len(history.connected()), 0)
+        self.record(history, 4)
+        connected = history.connected()
+        self.assertEqual((connected.format, connected.itemsize), ("B", 1))
+        self.assertEqual(connected.tolist(), [1, 0, 0, 1, 1, 0])
+        timestamps = history.timestamps()
+        self.assertEqual((timestamps.format, timestamps.itemsize), ("d", 8))
+        self.assertEqual(timestamps.tolist(), [0.5, 1.0, 1.5])
+        self.assertEqual(struct.unpack("<2d", timestamps[1:].tobytes()), (1.0, 1.5))
+        self.assertEqual(history.timestamps(1).tolist(), [1.5])
+
+    def test_shares_memory(self):
+        history = XInput.StateHistory(4, slots=1)
+        self.record(history, 2)
+        view = memoryview(history.states())
+        self.record(history, 1)    # writes a later frame, the exported ones are unchanged
+        self.assertEqual(self.unpack(view), [(0, XInput.BUTTON_A, 0), (10, XInput.BUTTON_A, -1000)])
+        history.states()[0].dwPacketNumber = 99
+        self.assertEqual(self.unpack(view)[0][0], 99)
+
+class SamplerTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.VirtualSource(2)
+        self.source.connect(0)
+        self.sampler = XInput.Sampler(source=self.source, auto_start=False)
+        self.sampler.sample()
+        self.sampler.take_frame()
+
+    def test_press_between_frames_is_reported(self):
+        self.source.set_state(0, buttons=XInput.BUTTON_A, thumbs=((32767, 0), (0, 0)))
+        self.sampler.sample()
+        self.source.set_state(0, buttons=0, thumbs=((0, 0), (0, 0)))
+        self.sampler.sample()
+        summary, other = self.sampler.take_frame()
+        self.assertEqual((summary.connected, other.connected), (True, False))
+        self.assertEqual(summary.buttons, 0)
+        self.assertEqual(summary.pressed.names(), ("A",))
+        self.assertEqual(summary.released.names(), ("A",))
+        self.assertEqual(summary.press_counts, {XInput.BUTTON_A : 1})
+        self.assertAlmostEqual(summary.peak_thumbs[0][0], 1.0)
+        self.assertEqual(summary.samples, 2)
+
+        summary = self.sampler.take_frame()[0]
+        self.assertEqual((summary.pressed, summary.released, summary.samples), (0, 0, 0))
+        self.assertEqual(summary.peak_thumbs[0], (0.0, 0.0))
+
+    def test_held_values_seed_the_next_frame(self):
+        self.source.set_state(0, buttons=XInput.BUTTON_B, triggers=(255, 0))
+        self.sampler.sample()
+        self.sampler.take_frame()
+        summary = self.sampler.take_frame()[0]
+        self.assertEqual((summary.buttons.names(), summary.held.names(), summary.pressed), (("B",), ("B",), 0))
+        self.assertEqual(summary.peak_triggers, (1.0, 0.0))
+
+class ActionMapTest(unittest.TestCase):
+    def setUp(self):
+        self.actions = XInput.ActionMap()
+        self.actions.bind("jump", XInput.BUTTON_A)
+        self.actions.bind("back", XInput.BUTTON_A, context="menu")
+
+    def state(self, buttons):
+        state = XInput.XINPUT_STATE()
+        state.Gamepad.wButtons = buttons
+        return state
+
+    def test_global_context_applies_to_new_slots(self):
+        self.actions.update_slot(0, self.state(0))
+        self.actions.set_context("menu")
+        self.assertEqual(self.actions.update_slot(0, self.state(XInput.BUTTON_A)).context, "menu")
+        later = self.actions.update_slot(3, self.state(XInput.BUTTON_A))
+        self.assertEqual(later.context, "menu")
+        self.assertTrue(later.active("back"))
+        self.assertFalse(later.active("jump"))
+
+    def test_slot_context(self):
+        self.actions.set_context("menu", 1)
+        self.assertTrue(self.actions.update_slot(0, self.state(XInput.BUTTON_A)).active("jump"))
+        self.assertTrue(self.actions.update_slot(1, self.state(XInput.BUTTON_A)).active("back"))
+        self.assertEqual(self.actions.update_slot(2, self.state(0)).context, XInput.ACTION_CONTEXT_DEFAULT)
+
+class ButtonRemapTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+        self.remap = XInput.ButtonRemap({XInput.BUTTON_A : XInput.BUTTON_B, XInput.BUTTON_B : XInput.BUTTON_A,
+                                         XInput.BUTTON_BACK : 0, XInput.BUTTON_X : XInput.BUTTON_X | XInput.BUTTON_Y},
+                                        turbo=XInput.BUTTON_RIGHT_SHOULDER, turbo_rate=10)
+
+    def tearDown(self):
+        XInput.set_remap(0, None)
+
+    def test_table(self):
+        table = self.remap.table
+        self.assertEqual(table[XInput.BUTTON_A], XInput.BUTTON_B)
+        self.assertEqual(table[XInput.BUTTON_A | XInput.BUTTON_B], XInput.BUTTON_A | XInput.BUTTON_B)
+        self.assertEqual(table[XInput.BUTTON_BACK | XInput.BUTTON_START], XInput.BUTTON_START)
+        self.assertEqual(table[XInput.BUTTON_X], XInput.BUTTON_X | XInput.BUTTON_Y)
+        self.assertEqual(table[XInput.BUTTON_DPAD_UP], XInput.BUTTON_DPAD_UP)
+        self.assertRaises(ValueError, XInput.ButtonRemap, {XInput.BUTTON_A | XInput.BUTTON_B : 0})
+
+    def test_turbo(self):
+        turbo_since = {}
+        held = [XInput._remap_buttons(self.remap, XInput.BUTTON_RIGHT_SHOULDER, turbo_since, 0, now)
+                for now in (0.0, 0.02, 0.06, 0.11, 0.16)]
+        self.assertEqual(held, [XInput.BUTTON_RIGHT_SHOULDER, XInput.BUTTON_RIGHT_SHOULDER, 0, XInput.BUTTON_RIGHT_SHOULDER, 0])
+        XInput._remap_buttons(self.remap, 0, turbo_since, 0, 0.2)
+        self.assertEqual(turbo_since, {})
+
+    def test_poller_events(self):
+        poller = XInput.Poller()
+        poller.set_remap(0, self.remap)
+        list(poller.poll())
+        dll.set(0, buttons=XInput.BUTTON_A)
+        events = [event for event in poller.poll() if event.user_index == 0]
+        self.assertEqual([(event.type, event.button) for event in events], [(XInput.EVENT_BUTTON_PRESSED, "B")])
+        self.assertEqual(poller.states[0].Gamepad.wButtons, XInput.BUTTON_B)
+
+    def test_get_state_and_snapshot(self):
+        dll.set(0, buttons=XInput.BUTTON_A)
+        XInput.set_remap(0, self.remap)
+        self.assertEqual(XInput.get_state(0).Gamepad.wButtons, XInput.BUTTON_B)
+        self.assertEqual(XInput.get_snapshot(0).state.Gamepad.wButtons, XInput.BUTTON_B)
+        self.assertEqual(XInput.get_state(1).Gamepad.wButtons, 0)
+        XInput.set_remap(0, None)
+        self.assertEqual(XInput.get_state(0).Gamepad.wButtons, XInput.BUTTON_A)
+
+    def test_get_state_shares_the_turbo_phase(self):
+        dll.set(0, buttons=XInput.BUTTON_RIGHT_SHOULDER)
+        XInput.set_remap(0, self.remap)
+        list(XInput.get_events())
+        XInput._default_poller._turbo_since[0] -= 0.075    # halfway through the released half of a turbo cycle
+        self.assertEqual(XInput.get_state(0).Gamepad.wButtons, 0)
+        list(XInput.get_events())
+        self.assertEqual(XInput._default_poller.states[0].Gamepad.wButtons, 0)
+
+class FakeClock:
+    """Stands in for the time module in XInput, time.time() only moves when a test moves it"""
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    perf_counter = time
+
+class ReportRateTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(XInput, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.source = XInput.VirtualSource(2)
+        self.source.connect(0)
+        self.source.connect(1)
+        self.poller = XInput.Poller(source=self.source)
+        self.thread = XInput.GamepadThread(auto_start=False, poller=self.poller, adaptive=True, update_frequency=1000,
+                                           idle_frequency=30, idle_timeout=0.5)
+
+    def frequency(self):
+        return self.thread._GamepadThread__adaptive_frequency()
+
+    def run_for(self, seconds, report_rate=125, polls=8):
+        """Slot 0 sends <report_rate> new states per second, polled <polls> times per report"""
+        for n in range(int(seconds * report_rate)):
+            self.source.set_state(0, thumbs=(((n & 1) * 1000, 0), (0, 0)))
+            for _ in range(polls):
+                self.poller.poll()
+                self.clock.now += 1 / report_rate / polls
+
+    def idle_for(self, seconds):
+        for _ in range(int(seconds * 1000)):
+            self.poller.poll()
+            self.clock.now += 0.001
+
+    def test_estimates_the_report_rate(self):
+        self.assertEqual(self.poller.report_rates, (None, None))
+        self.run_for(1.0)
+        rate, idle = self.poller.report_rates
+        self.assertAlmostEqual(rate, 125, delta=5)
+        self.assertIsNone(idle)     # connected, but never sent a new state
+
+    def test_rate_outlasts_a_pause(self):
+        self.run_for(1.0)
+        self.idle_for(2.0)
+        self.assertGreater(self.poller.report_rates[0], 125 * XInput._RATE_DECAY)   # windows without packets don't count
+
+    def test_adaptive_frequency(self):
+        self.assertEqual(self.frequency(), 1000)    # nothing polled yet
+        self.run_for(1.0)
+        self.assertAlmostEqual(self.frequency(), 4 * 125, delta=50)
+        self.idle_for(0.4)
+        self.assertAlmostEqual(self.frequency(), 4 * 125, delta=50)
+        self.idle_for(0.2)
+        self.assertEqual(self.frequency(), 30)
+        self.source.set_state(0, buttons=XInput.BUTTON_A)
+        self.poller.poll()
+        self.assertAlmostEqual(self.frequency(), 4 * 125, delta=50)
+
+    def test_adaptive_frequency_is_capped(self):
+        self.run_for(1.0, report_rate=1000, polls=1)
+        self.assertAlmostEqual(self.poller.report_rates[0], 1000, delta=40)
+        self.assertEqual(self.frequency(), 1000)    # not 4000, the update_frequency is the limit
+
+class LoadTestTest(unittest.TestCase):
+    def test_generators(self):
+        rng = random.Random(1)
+        values = [0] * 7
+        sweep = XInputLoadTest.TriggerSweep(period=1.0)
+        self.assertTrue(sweep.step(0, values, 0.0, 0.001, rng))
+        self.assertEqual(values[1:3], [0, 255])
+        sweep.step(0, values, 0.25, 0.001, rng)
+        self.assertEqual(values[1:3], [127, 128])
+        mash = XInputLoadTest.ButtonMash(rate=1000.0, buttons=(XInput.BUTTON_A,))
+        self.assertTrue(mash.step(0, values, 0.0, 0.003, rng))
+        self.assertEqual(values[0], XInput.BUTTON_A)     # toggled three times
+        self.assertFalse(XInputLoadTest.ButtonMash(rate=0.0).step(0, values, 0.0, 0.003, rng))
+
+    def test_latency_is_measured_from_the_first_unreported_write(self):
+        source = XInput.VirtualSource(1)
+        source.connect(0)
+        generator = XInputLoadTest.LoadGenerator(source, [])
+        poller = XInputLoadTest._TrackingPoller(source=source)
+        recorder = XInputLoadTest._Recorder(generator, poller)
+        poller.poll()
+        now = time.perf_counter()
+        for packet, (buttons, age) in enumerate(((XInput.BUTTON_B, 1.0), (XInput.BUTTON_B, 0.5), (XInput.BUTTON_B, 0.1)), 1):
+            generator.stamps[0][packet] = now - age
+            source.set_state(0, buttons=buttons)
+        for event in poller.poll():
+            recorder.record(event)
+        self.assertEqual(recorder.counts, {XInput.EVENT_BUTTON_PRESSED : 1})
+        self.assertEqual(len(recorder.latencies), 1)
+        self.assertGreaterEqual(recorder.latencies[0], 1.0)     # B was pressed by the first of the three writes
+
+    def test_run_load(self):
+        for mode in ("thread", "get_events"):
+            report = XInputLoadTest.run_load(slots=2, rate=500, duration=0.2, mode=mode, pooled=True, seed=1)
+            self.assertGreater(report["updates"], 0)
+            self.assertGreater(report["events_by_type"]["stick_moved"], 0)
+            self.assertEqual(report["events_by_type"]["connected"], 2)
+            self.assertGreater(report["latency_us"]["p50"], 0)
+
+class SmoothingTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.VirtualSource(1)
+        self.source.connect(0)
+        self.poller = XInput.Poller(source=self.source)
+
+    def stick(self, lx, polls=1):
+        self.source.set_state(0, thumbs=((lx, 0), (0, 0)))
+        seen = []
+        for _ in range(polls):
+            events = self.poller.poll()
+            seen.append((self.poller.states[0].Gamepad.sThumbLX, [event for event in events if event.type == XInput.EVENT_STICK_MOVED]))
+        return seen
+
+    def test_filters(self):
+        ema = XInput.EMAFilter(0.25)
+        self.assertEqual([ema.update(x, -x, 0.0) for x in (0, 100, 100)], [(0, 0), (25, -25), (43.75, -43.75)])
+        median = XInput.MedianFilter()
+        self.assertEqual([median.update(x, 0, 0.0)[0] for x in (10, 20, 5000, 30, 40)], [10, 10, 20, 30, 40])
+        one_euro = XInput.OneEuroFilter()
+        outputs = [one_euro.update(1000 + (n % 2) * 400, 0, n * 0.004)[0] for n in range(100)]
+        self.assertLess(max(outputs[50:]) - min(outputs[50:]), 100)     # most of the jitter is removed
+        self.assertAlmostEqual(sum(outputs[50:]) / 50, 1200, delta=50)
+
+    def test_one_report_spike_is_removed(self):
+        self.poller.set_smoothing(0, XInput.LEFT, XInput.MedianFilter())
+        self.poller.poll()
+        for _ in range(3):
+            self.stick(10000)
+        # polled 4 times per report, like 1 kHz polling of a 250 Hz pad
+        seen = self.stick(32000, polls=4) + self.stick(10000, polls=4)
+        self.assertEqual([lx for lx, events in seen], [10000] * 8)
+        self.assertEqual([events for lx, events in seen], [[]] * 8)
+
+    def test_smoothing_per_report_not_per_poll(self):
+        self.poller.set_smoothing(0, XInput.LEFT, XInput.EMAFilter(0.5))
+        self.poller.poll()
+        self.stick(0)
+        seen = self.stick(16000, polls=5)
+        self.assertEqual([lx for lx, events in seen], [8000] * 5)
+        self.assertEqual(len(seen[0][1]), 1)
+        self.assertEqual([events for lx, events in seen[1:]], [[]] * 4)
+
+    def test_held_position_settles(self):
+        self.poller.set_smoothing(0, XInput.LEFT, XInput.EMAFilter(0.5))
+        self.poller.poll()
+        self.stick(0)
+        self.stick(16000)
+        positions = []
+        for _ in range(6):
+            time.sleep(2.5 / XInput._SMOOTHING_REPORT_RATE)
+            self.poller.poll()
+            positions.append(self.poller.states[0].Gamepad.sThumbLX)
+        self.assertEqual(positions, [12000, 14000, 15000, 15500, 15750, 15875])
+
+class PredictorTest(unittest.TestCase):
+    def setUp(self):
+        self.states = (XInput.XINPUT_STATE * 1)()
+        self.connected = (ctypes.c_ubyte * 1)(1)
+
+    def record(self, predictor, timestamp, lx, lt=0):
+        state = self.states[0]
+        state.dwPacketNumber += 1
+        state.Gamepad.sThumbLX = lx
+        state.Gamepad.bLeftTrigger = lt
+        predictor.record(self.states, self.connected, timestamp)
+
+    def test_extrapolates_constant_velocity(self):
+        predictor = XInput.Predictor(slots=1)
+        for n in range(20):
+            self.record(predictor, n * 0.004, 1000 + n * 40, lt=n * 5)    # 10000 units and 1250 per second
+        last = 19 * 0.004
+        state = predictor.predicted_state(0, 0.012, now=last)
+        self.assertAlmostEqual(state.Gamepad.sThumbLX, 1760 + 120, delta=2)
+        self.assertAlmostEqual(state.Gamepad.bLeftTrigger, 95 + 15, delta=1)
+        self.assertEqual(predictor.predicted_state(0, 10.0, now=last).Gamepad.bLeftTrigger, 255)   # clamped
+
+    def test_resting_slot_is_not_extrapolated(self):
+        predictor = XInput.Predictor(slots=1, idle=0.05)
+        for n in range(5):
+            self.record(predictor, n * 0.004, n * 1000)
+        self.assertEqual(predictor.predicted_state(0, 0.012, now=1.0).Gamepad.sThumbLX, 4000)
+
+    def test_disconnected_and_negative_dt(self):
+        predictor = XInput.Predictor(slots=1)
+        self.assertRaises(XInput.XInputNotConnectedError, predictor.predicted_state, 0, 0.01)
+        self.record(predictor, 0.0, 0)
+        self.assertRaises(ValueError, predictor.predicted_state, 0, -0.01)
+
+class CalibrationTest(unittest.TestCase):
+    def setUp(self):
+        self.states = (XInput.XINPUT_STATE * 1)()
+        self.connected = (ctypes.c_ubyte * 1)(1)
+        self.rng = random.Random(1)
+
+    def feed(self, calibrator, positions, rate=250):
+        state = self.states[0]
+        for n, (lx, ly) in enumerate(positions):
+            state.dwPacketNumber += 1
+            state.Gamepad.sThumbLX = int(lx)
+            state.Gamepad.sThumbLY = int(ly)
+            calibrator.record(self.states, self.connected, n / rate)
+
+    def worn_stick(self, count):
+        """Rests at (3000, -2500) with some jitter, every 300 reports it sweeps to its worn rim at 20000"""
+        for n in range(count):
+            if n % 300 < 30:
+                yield 3000 + 20000 * cos(n * 0.3), -2500 + 20000 * sin(n * 0.3)
+            else:
+                yield 3000 + self.rng.randint(-300, 300), -2500 + self.rng.randint(-300, 300)
+
+    def test_learns_a_worn_stick(self):
+        calibrator = XInput.AutoCalibrator(slots=1, interval=1.0)
+        self.feed(calibrator, self.worn_stick(3000))
+        self.assertGreater(calibrator.version, 0)
+        left = calibrator.calibrations[0].left
+        self.assertAlmostEqual(left.center_x, 3000, delta=50)
+        self.assertAlmostEqual(left.center_y, -2500, delta=50)
+        for extent in (left.left, left.right, left.down, left.up):
+            self.assertAlmostEqual(extent, 20000, delta=100)
+        self.assertLess(left.deadzone, 2000)
+        self.assertEqual(left.normalize(3100, -2400, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)[2], 0)
+        self.assertAlmostEqual(left.normalize(23000, -2500, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)[2], 1.0, places=3)
+
+    def test_never_resting_stick_stays_usable(self):
+        calibrator = XInput.AutoCalibrator(slots=1, interval=1.0)
+        angle = [0.0]
+        def aiming(count):
+            for n in range(count):
+                angle[0] += 0.05
+                radius = 12000 * abs(sin(n * 0.013))
+                yield radius * cos(angle[0]), radius * sin(angle[0])
+        limit = calibrator.max_deadzone_scale * XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE
+        for _ in range(10):
+            self.feed(calibrator, aiming(2500))
+            left = calibrator.calibrations[0].left
+            self.assertLessEqual(left.deadzone, limit)
+            self.assertLessEqual(left.center_x ** 2 + left.center_y ** 2, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE ** 2)
+            self.assertGreater(left.normalize(32767, 0, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)[2], 0.99)
+
+    def test_fast_movement_is_not_resting(self):
+        calibrator = XInput.AutoCalibrator(slots=1, interval=1.0)
+        self.feed(calibrator, [(-4000, 0) if n & 1 else (4000, 0) for n in range(1000)])
+        self.assertIsNone(calibrator.calibrations[0].left.deadzone)      # only the (resting) right stick was learned
+        self.assertEqual(calibrator.calibrations[0].right.deadzone, calibrator.min_deadzone)
+
+    def test_version_only_changes_with_the_calibrations(self):
+        calibrator = XInput.AutoCalibrator(slots=1, interval=1.0)
+        self.feed(calibrator, self.worn_stick(3000))
+        calibrator.fold()       # takes in the states since the last fold
+        version = calibrator.version
+        calibration = calibrator.calibrations[0]
+        calibrator.fold()
+        calibrator.fold()
+        self.assertEqual(calibrator.version, version)
+        self.assertIs(calibrator.calibrations[0], calibration)
+
+    def test_learns_from_get_events(self):
+        reset_dll()
+        calibrator = XInput.AutoCalibrator(interval=0.0, min_samples=2, window=10)
+        XInput.set_calibrator(calibrator)
+        state = XInput.XINPUT_STATE()
+        state.Gamepad.sThumbLX, state.Gamepad.sThumbLY = 12000, -2500
+        try:
+            for n in range(5):
+                dll.set(0, lx=3000 + n % 2, ly=-2500)
+                list(XInput.get_events())
+            left = calibrator.calibrations[0].left
+            self.assertEqual((left.center_x, left.center_y), (3000, -2500))
+            x, y, magnitude = left.normalize(12000, -2500, XInput.XINPUT_GAMEPAD_LEFT_THUMB_DEADZONE)
+            self.assertEqual(XInput.get_thumb_values(state, 0)[0], (x * magnitude, y * magnitude))
+        finally:
+            XInput.set_calibrator(None)
+            XInput.set_calibration(0, None)
+        self.assertNotEqual(XInput.get_thumb_values(state, 0)[0], (x * magnitude, y * magnitude))
+
+    def test_profiles_round_trip(self):
+        calibrator = XInput.AutoCalibrator(slots=1, interval=1.0)
+        self.feed(calibrator, self.worn_stick(3000))
+        path = os.path.join(tempfile.mkdtemp(), "sticks.json")
+        try:
+            XInput.save_calibrations(path, calibrator.calibrations)
+            loaded = XInput.load_calibrations(path)
+        finally:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        self.assertEqual(loaded[0].to_dict(), calibrator.calibrations[0].to_dict())
+        resumed = XInput.AutoCalibrator(slots=1, profiles=loaded)
+        self.assertEqual(resumed.version, 1)
+        self.assertIs(resumed.calibrations[0], loaded[0])
+
+    def test_applied_to_events_and_thumb_values(self):
+        calibration = XInput.Calibration(XInput.StickCalibration(3000, -2500, 20000, 20000, 20000, 20000, deadzone=1500))
+        source = XInput.VirtualSource(1)
+        source.connect(0)
+        poller = XInput.Poller(source=source)
+        poller.set_calibration(0, calibration)
+        poller.poll()
+        source.set_state(0, thumbs=((23000, -2500), (0, 0)))
+        events = [event for event in poller.poll() if event.type == XInput.EVENT_STICK_MOVED]
+        self.assertEqual([(event.stick, round(event.value, 3)) for event in events], [(XInput.LEFT, 1.0)])
+
+        state = XInput.XINPUT_STATE()
+        state.Gamepad.sThumbLX, state.Gamepad.sThumbLY = 23000, -2500
+        XInput.set_calibration(0, calibration)
+        try:
+            self.assertAlmostEqual(XInput.get_thumb_values(state, 0)[0][0], 1.0, places=3)
+        finally:
+            XInput.set_calibration(0, None)
+        self.assertLess(XInput.get_thumb_values(state, 0)[0][0], 0.7)
+
+def button_event(user_index, button, pressed):
+    event = XInput.Event(user_index, XInput.EVENT_BUTTON_PRESSED if pressed else XInput.EVENT_BUTTON_RELEASED)
+    event.button = XInput._button_dict[button]
+    event.button_id = button
+    return event
+
+class ComboRecognizerTest(unittest.TestCase):
+    def setUp(self):
+        self.recognizer = XInput.ComboRecognizer()
+        self.recognizer.add_chord("block", XInput.BUTTON_LEFT_SHOULDER | XInput.BUTTON_RIGHT_SHOULDER, window=0.05)
+        self.recognizer.add_sequence("fireball", (XInput.BUTTON_DPAD_DOWN, XInput.BUTTON_DPAD_RIGHT, XInput.BUTTON_X), max_interval=0.2)
+
+    def press(self, user_index, button, now):
+        found = self.recognizer.process_event(button_event(user_index, button, True), now)
+        self.recognizer.process_event(button_event(user_index, button, False), now + 0.01)
+        return [(event.user_index, event.combo) for event in found]
+
+    def test_sequence(self):
+        self.assertEqual(self.press(0, XInput.BUTTON_A, 0.0), [])
+        self.assertEqual(self.press(0, XInput.BUTTON_DPAD_DOWN, 0.1), [])
+        self.assertEqual(self.press(0, XInput.BUTTON_DPAD_RIGHT, 0.2), [])
+        self.assertEqual(self.press(0, XInput.BUTTON_X, 0.3), [(0, "fireball")])
+
+    def test_slow_or_broken_sequence(self):
+        for button, now in ((XInput.BUTTON_DPAD_DOWN, 0.0), (XInput.BUTTON_DPAD_RIGHT, 0.5), (XInput.BUTTON_X, 0.6)):
+            self.assertEqual(self.press(0, button, now), [])
+        for button, now in ((XInput.BUTTON_DPAD_DOWN, 1.0), (XInput.BUTTON_B, 1.05), (XInput.BUTTON_DPAD_RIGHT, 1.1), (XInput.BUTTON_X, 1.2)):
+            self.assertEqual(self.press(0, button, now), [])
+
+    def test_slots_are_independent(self):
+        self.press(0, XInput.BUTTON_DPAD_DOWN, 0.0)
+        self.press(1, XInput.BUTTON_DPAD_DOWN, 0.05)
+        self.press(1, XInput.BUTTON_DPAD_RIGHT, 0.1)
+        self.assertEqual(self.press(0, XInput.BUTTON_X, 0.15), [])
+        self.assertEqual(self.press(1, XInput.BUTTON_X, 0.2), [(1, "fireball")])
+
+    def test_chord(self):
+        recognizer = self.recognizer
+        self.assertEqual(recognizer.process_event(button_event(0, XInput.BUTTON_LEFT_SHOULDER, True), 0.0), ())
+        found = recognizer.process_event(button_event(0, XInput.BUTTON_RIGHT_SHOULDER, True), 0.03)
+        self.assertEqual([event.combo for event in found], ["block"])
+        recognizer.process_event(button_event(0, XInput.BUTTON_LEFT_SHOULDER, False), 0.1)
+        recognizer.process_event(button_event(0, XInput.BUTTON_RIGHT_SHOULDER, False), 0.1)
+        recognizer.process_event(button_event(0, XInput.BUTTON_LEFT_SHOULDER, True), 1.0)
+        self.assertEqual(recognizer.process_event(button_event(0, XInput.BUTTON_RIGHT_SHOULDER, True), 1.2), ())     # too far apart
+
+def stick_event(user_index, stick, angle, value):
+    event = XInput.Event(user_index, XInput.EVENT_STICK_MOVED)
+    event.stick = stick
+    event.value = value
+    event.dir = (cos(angle), sin(angle)) if value else (0.0, 0.0)
+    event.x = event.dir[0] * value
+    event.y = event.dir[1] * value
+    return event
+
+class GestureRecognizerTest(unittest.TestCase):
+    def setUp(self):
+        self.recognizer = XInput.GestureRecognizer(hold_time=0.5)
+
+    def feed(self, moves, stick=XInput.LEFT):
+        """<moves> are (time, angle, value)"""
+        found = []
+        for now, angle, value in moves:
+            found += self.recognizer.process_event(stick_event(0, stick, angle, value), now)
+        return [(event.gesture, event.stick) for event in found], found
+
+    def test_flick(self):
+        gestures, found = self.feed([(0.0, 0.0, 0.0), (0.03, pi / 2, 0.5), (0.06, pi / 2, 1.0)], XInput.RIGHT)
+        self.assertEqual(gestures, [(XInput.GESTURE_FLICK, XInput.RIGHT)])
+        self.assertAlmostEqual(found[0].dir[1], 1.0)
+
+    def test_slow_push_is_no_flick(self):
+        gestures, found = self.feed([(0.0, 0.0, 0.0), (0.1, 0.0, 0.5), (0.3, 0.0, 1.0)])
+        self.assertNotIn(XInput.GESTURE_FLICK, [gesture for gesture, stick in gestures])
+
+    def test_circles(self):
+        moves = [(0.01 * n, n * pi / 16, 1.0) for n in range(34)]     # a bit more than a counterclockwise turn along the rim
+        gestures, found = self.feed(moves)
+        circles = [(event.gesture, event.clockwise) for event in found if event.gesture != XInput.GESTURE_HOLD]
+        self.assertEqual(circles, [(XInput.GESTURE_QUARTER_CIRCLE, False), (XInput.GESTURE_HALF_CIRCLE, False),
+                                   (XInput.GESTURE_ROTATION, False)])
+
+    def test_slow_circle_is_not_recognized(self):
+        moves = [(0.2 * n, n * pi / 8, 1.0) for n in range(9)]      # half a turn in 1.6 seconds
+        gestures, found = self.feed(moves)
+        self.assertNotIn(XInput.GESTURE_HALF_CIRCLE, [gesture for gesture, stick in gestures])
+
+    def test_hold(self):
+        self.feed([(0.0, pi, 1.0)])
+        self.assertEqual(self.recognizer.poll(0.3), ())
+        found = self.recognizer.poll(0.6)
+        self.assertEqual([(event.gesture, event.dir) for event in found], [(XInput.GESTURE_HOLD, (-1.0, 0.0))])
+        self.assertEqual(self.recognizer.poll(1.0), ())     # once per hold
+
+class SharedStateTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+        self.publisher = XInput.SharedStatePublisher(auto_start=False)
+        self.reader = XInput.SharedStateReader(self.publisher.name, timeout=0.05)
+
+    def tearDown(self):
+        self.reader.close()
+        self.publisher.close()
+
+    def test_reads_the_published_state(self):
+        dll.set(1, buttons=XInput.BUTTON_X, lx=1234)
+        dll.connected[3] = False
+        self.publisher.publish()
+        state = XInput.XINPUT_STATE()
+        self.assertEqual(self.reader.read_state(1, state), XInput.ERROR_SUCCESS)
+        self.assertEqual((state.Gamepad.wButtons, state.Gamepad.sThumbLX), (XInput.BUTTON_X, 1234))
+        self.assertEqual(self.reader.read_state(3, state), XInput.ERROR_DEVICE_NOT_CONNECTED)
+        self.assertEqual(self.reader.get_connected(), (True, True, True, False))
+
+    def test_dead_publisher_times_out(self):
+        self.publisher.publish()
+        self.publisher._block.sequence += 1    # stopped in the middle of a write
+        state = XInput.XINPUT_STATE()
+        self.assertRaises(TimeoutError, self.reader.read_state, 0, state)
+        states = (XInput.XINPUT_STATE * 4)()
+        self.assertRaises(TimeoutError, self.reader.read_all, states, (ctypes.c_ubyte * 4)())
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+class RemoteTest(unittest.TestCase):
+    def setUp(self):
+        self.source = XInput.RemoteSource(auto_start=False)
+        self.sender = XInput.RemoteSender(self.source.address)
+
+    def tearDown(self):
+        self.sender.close()
+        self.source.close()
+
+    def receive(self):
+        wait_until(self.source.receive)
+
+    def read(self, user_index):
+        state = XInput.XINPUT_STATE()
+        return self.source.read_state(user_index, state), state
+
+    def send(self, user_index, buttons=0, lx=0, ry=0):
+        state = XInput.XINPUT_STATE()
+        state.Gamepad.wButtons = buttons
+        state.Gamepad.sThumbLX = lx
+        state.Gamepad.sThumbRY = ry
+        self.sender.send(user_index, state)
+
+    def test_full_and_delta_states(self):
+        self.send(1, buttons=XInput.BUTTON_A, lx=-1000, ry=32767)
+        self.receive()
+        result, state = self.read(1)
+        self.assertEqual(result, XInput.ERROR_SUCCESS)
+        self.assertEqual((state.Gamepad.wButtons, state.Gamepad.sThumbLX, state.Gamepad.sThumbRY), (XInput.BUTTON_A, -1000, 32767))
+        self.assertEqual(self.source.get_connected(), (False, True, False, False))
+
+        self.send(1, buttons=XInput.BUTTON_B, lx=-1000, ry=32767)     # only the buttons are sent
+        self.receive()
+        result, state = self.read(1)
+        self.assertEqual((state.Gamepad.wButtons, state.Gamepad.sThumbLX, state.Gamepad.sThumbRY), (XInput.BUTTON_B, -1000, 32767))
+        self.assertEqual(state.dwPacketNumber, 2)
+
+    def test_disconnect(self):
+        self.send(0, buttons=XInput.BUTTON_A)
+        self.receive()
+        self.sender.disconnect(0)
+        self.sender.flush()
+        self.receive()
+        self.assertEqual(self.read(0)[0], XInput.ERROR_DEVICE_NOT_CONNECTED)
+
+    def test_stale_records_are_dropped(self):
+        record, (full, names) = XInput._REMOTE_RECORD, XInput._REMOTE_PAYLOADS[XInput._REMOTE_FULL]
+        self.source.feed(record.pack(0, 5, XInput._REMOTE_FULL) + full.pack(XInput.BUTTON_X, 0, 0, 0, 0, 0, 0),
+                         record.pack(0, 4, XInput._REMOTE_FULL) + full.pack(XInput.BUTTON_Y, 0, 0, 0, 0, 0, 0))
+        self.assertEqual(self.read(0)[1].Gamepad.wButtons, XInput.BUTTON_X)
+        self.assertEqual(self.source.dropped, 1)
+
+    def test_malformed_datagrams_are_dropped(self):
+        self.send(0, buttons=XInput.BUTTON_A)
+        self.receive()
+        record, (full, names) = XInput._REMOTE_RECORD, XInput._REMOTE_PAYLOADS[XInput._REMOTE_FULL]
+        good = record.pack(0, 7, XInput._REMOTE_FULL) + full.pack(XInput.BUTTON_Y, 0, 0, 0, 0, 0, 0)
+        raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for datagram in (good[:-1], good[:record.size], good[:3], good + b"\x00"):
+                raw.sendto(datagram, self.source.address)
+            self.receive()
+        finally:
+            raw.close()
+        self.assertEqual(self.read(0)[1].Gamepad.wButtons, XInput.BUTTON_A)
+        self.assertEqual(self.source.dropped, 4)
+
+    def test_receiver_thread_survives_malformed_datagrams(self):
+        self.source.start()
+        raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            raw.sendto(b"\x00\x00\x01", self.source.address)
+        finally:
+            raw.close()
+        wait_until(lambda: self.source.dropped == 1)
+        self.send(2, buttons=XInput.BUTTON_START)
+        wait_until(lambda: self.read(2)[0] == XInput.ERROR_SUCCESS)
+        self.assertEqual(self.read(2)[1].Gamepad.wButtons, XInput.BUTTON_START)
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT, SYN_DROPPED = 0, 3
+
+def stream_event(user_index, type_, **fields):
+    event = XInput.Event(user_index, type_)
+    event.__dict__.update(fields)
+    return event
+
+class EventStreamTest(unittest.TestCase):
+    def setUp(self):
+        reset_dll()
+        self.directory = tempfile.mkdtemp()
+        self.address = os.path.join(self.directory, "xinput.sock")
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        os.rmdir(self.directory)
+
+    def connect(self, server, count):
+        self.clients += [XInput.EventClient(self.address) for _ in range(count)]
+        wait_until(lambda: len(server.clients) == count)
+        return self.clients[-count:]
+
+    def test_round_trip(self):
+        events = [stream_event(0, XInput.EVENT_CONNECTED),
+                  stream_event(1, XInput.EVENT_BUTTON_PRESSED, button_id=XInput.BUTTON_A, button="A"),
+                  stream_event(1, XInput.EVENT_BUTTON_RELEASED, button_id=XInput.BUTTON_START, button="START"),
+                  stream_event(2, XInput.EVENT_TRIGGER_MOVED, trigger=XInput.RIGHT, value=0.5),
+                  stream_event(3, XInput.EVENT_STICK_MOVED, stick=XInput.LEFT, x=-0.25, y=0.75, value=0.5, dir=(-0.5, 1.0)),
+                  stream_event(0, XInput.EVENT_GESTURE, gesture=XInput.GESTURE_ROTATION, stick=XInput.RIGHT,
+                               dir=(0.0, 0.0), clockwise=True, duration=0.5),
+                  stream_event(0, XInput.EVENT_GESTURE, gesture=XInput.GESTURE_FLICK, stick=XInput.LEFT,
+                               dir=(1.0, 0.0), clockwise=None, duration=0.125),
+                  stream_event(1, XInput.EVENT_COMBO, combo="hadouken", duration=0.25,
+                               buttons=(XInput.BUTTON_DPAD_DOWN, XInput.BUTTON_DPAD_RIGHT, XInput.BUTTON_X))]
+        decoded = XInput._decode_events(b"".join(XInput._encode_event(event) for event in events))
+        self.assertEqual([event.__dict__ for event in decoded], [event.__dict__ for event in events])
+
+    def test_all_clients_receive_the_events(self):
+        server = XInput.EventServer(self.address)
+        try:
+            clients = self.connect(server, 3)
+            dll.set(0, buttons=XInput.BUTTON_A)
+            for client in clients:
+                received = []
+                wait_until(lambda: received.extend(client.poll()) or
+                           any(event.type == XInput.EVENT_BUTTON_PRESSED for event in received))
+                pressed = [event for event in received if event.type == XInput.EVENT_BUTTON_PRESSED]
+                self.assertEqual([(event.user_index, event.button) for event in pressed], [(0, "A")])
+        finally:
+            server.stop()
+        for client in clients:
+            wait_until(lambda: client.poll() == [] and not client.connected)
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_slow_client_is_dropped(self):
+        server = XInput.EventServer(self.address, max_buffer=4096)
+        try:
+            fast, slow = self.connect(server, 2)
+            received = 0
+            deadline = time.time() + 5.0
+            while not server.evicted:    # the slow client never reads, so its socket and then its buffer fill up
+                self.assertLess(time.time(), deadline)
+                for _ in range(64):
+                    server._queue(stream_event(0, XInput.EVENT_BUTTON_PRESSED, button_id=XInput.BUTTON_A))
+                time.sleep(0.001)
+                received += len(fast.poll())
+            self.assertEqual(server.evicted, 1)
+            self.assertGreater(received, 0)
+            wait_until(lambda: len(server.clients) == 1)
+            wait_until(lambda: slow.poll() is not None and not slow.connected)
+            self.assertTrue(fast.connected)
+            server._queue(stream_event(0, XInput.EVENT_BUTTON_RELEASED, button_id=XInput.BUTTON_A))
+            events = []
+            wait_until(lambda: events.extend(fast.poll()) or
+                       any(event.type == XInput.EVENT_BUTTON_RELEASED for event in events))
+        finally:
+            server.stop()
+
+class EvdevTest(unittest.TestCase):
+    def setUp(self):
+        self.read_end, self.write_end = os.pipe()
+        self.source = XInput.EvdevSource(self.read_end)
+
+    def tearDown(self):
+        self.source.close()
+        os.close(self.read_end)
+        if self.write_end is not None:
+            os.close(self.write_end)
+
+    def write(self, *records):
+        os.write(self.write_end, b"".join(XInput._INPUT_EVENT.pack(0, 0, *record) for record in records))
+
+    def state(self):
+        state = XInput.XINPUT_STATE()
+        self.assertEqual(self.source.read_state(0, state), XInput.ERROR_SUCCESS)
+        return state
+
+    def test_keys_apply_on_syn_report(self):
+        self.write((EV_KEY, 0x130, 1), (EV_KEY, 0x13b, 1))     # BTN_SOUTH, BTN_START
+        self.assertEqual(self.state().Gamepad.wButtons, 0)
+        self.write((EV_SYN, SYN_REPORT, 0))
+        state = self.state()
+        self.assertEqual(state.Gamepad.wButtons, XInput.BUTTON_A | XInput.BUTTON_START)
+        self.assertEqual(state.dwPacketNumber, 1)
+        self.write((EV_KEY, 0x130, 0), (EV_KEY, 0x2ff, 1), (EV_SYN, SYN_REPORT, 0))    # unknown key ignored
+        self.assertEqual(self.state().Gamepad.wButtons, XInput.BUTTON_START)
+
+    def test_axes_are_scaled(self):
+        self.write((EV_ABS, 0x00, 32767), (EV_ABS, 0x01, -32768), (EV_ABS, 0x03, -32768), (EV_ABS, 0x04, 32767),
+                   (EV_ABS, 0x02, 255), (EV_ABS, 0x05, 0), (EV_SYN, SYN_REPORT, 0))
+        pad = self.state().Gamepad
+        self.assertEqual((pad.sThumbLX, pad.sThumbLY, pad.sThumbRX, pad.sThumbRY), (32767, 32767, -32768, -32768))
+        self.assertEqual((pad.bLeftTrigger, pad.bRightTrigger), (255, 0))
+
+    def test_hat_sets_the_dpad(self):
+        self.write((EV_ABS, 0x10, -1), (EV_ABS, 0x11, 1), (EV_SYN, SYN_REPORT, 0))
+        self.assertEqual(self.state().Gamepad.wButtons, XInput.BUTTON_DPAD_LEFT | XInput.BUTTON_DPAD_DOWN)
+        self.write((EV_ABS, 0x10, 1), (EV_ABS, 0x11, 0), (EV_SYN, SYN_REPORT, 0))
+        self.assertEqual(self.state().Gamepad.wButtons, XInput.BUTTON_DPAD_RIGHT)
+
+    def test_unchanged_frames_keep_the_packet_number(self):
+        self.write((EV_KEY, 0x131, 1), (EV_SYN, SYN_REPORT, 0), (EV_SYN, SYN_REPORT, 0))
+        self.assertEqual(self.state().dwPacketNumber, 1)
+
+    def test_syn_dropped_skips_to_the_next_report(self):
+        self.write((EV_KEY, 0x130, 1), (EV_SYN, SYN_REPORT, 0),
+                   (EV_SYN, SYN_DROPPED, 0), (EV_KEY, 0x131, 1), (EV_SYN, SYN_REPORT, 0))
+        state = self.state()
+        self.assertEqual((state.Gamepad.wButtons, state.dwPacketNumber), (XInput.BUTTON_A, 1))
+        self.write((EV_KEY, 0x133, 1), (EV_SYN, SYN_REPORT, 0))
+        self.assertEqual(self.state().Gamepad.wButtons, XInput.BUTTON_A | XInput.BUTTON_X)
+
+    def test_records_split_across_reads(self):
+        data = b"".join(XInput._INPUT_EVENT.pack(0, 0, *record) for record in ((EV_KEY, 0x134, 1), (EV_SYN, SYN_REPORT, 0)))
+        os.write(self.write_end, data[:5])
+        self.assertEqual(self.state().Gamepad.wButtons, 0)
+        os.write(self.write_end, data[5:])
+        self.assertEqual(self.state().Gamepad.wButtons, XInput.BUTTON_Y)
+
+    def test_unplugged_device_disconnects(self):
+        os.close(self.write_end)
+        self.write_end = None
+        self.assertEqual(self.source.read_state(0, XInput.XINPUT_STATE()), XInput.ERROR_DEVICE_NOT_CONNECTED)
+        self.assertEqual(self.source.get_connected(), (False,))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -63,16 +63,15 @@ setup(
 
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.7',
     ],
 
+    # aevents() is an async generator and the asyncio helpers use
+    # asyncio.get_running_loop()
+    python_requires='>=3.7',
+
     # What does your project relate to?
     keywords='XInput xinput-controller xinput-wrapper directx controller controller-api wrapper windows thread threaded async',
 